@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+"""
+Benchmark: taille des payloads et nombre de requêtes pour une liste de transactions,
+avec l'ancien StockSerializer imbriqué (historique complet) et le StockSummarySerializer.
+
+Les données de test sont créées dans une transaction annulée à la fin: la base n'est pas modifiée.
+"""
+
+import json
+import os
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'boursex_api.settings')
+django.setup()
+
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework import serializers
+
+from core.models import Stock, StockPriceHistory, Transaction
+from core.serializers import StockPriceHistorySerializer, TransactionSerializer
+
+STOCKS = 50
+HISTORY_PER_STOCK = 200
+TRANSACTIONS = 50
+
+
+class LegacyStockSerializer(serializers.ModelSerializer):
+    """Ancienne forme: historique complet imbriqué dans chaque titre"""
+    price_history = StockPriceHistorySerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Stock
+        fields = ['id', 'symbol', 'name', 'current_price', 'volume', 'last_updated', 'price_history']
+
+
+class LegacyTransactionSerializer(serializers.ModelSerializer):
+    stock = LegacyStockSerializer(read_only=True)
+
+    class Meta:
+        model = Transaction
+        fields = ['id', 'stock', 'transaction_type', 'quantity', 'price', 'total_amount', 'timestamp']
+
+
+def measure(label, serializer_class, queryset):
+    with CaptureQueriesContext(connection) as queries:
+        data = serializer_class(queryset, many=True).data
+    size = len(json.dumps(data, default=str))
+    print(f'{label:<10} {len(queries.captured_queries):>6} requêtes {size / 1024:>10.1f} KiB')
+    return len(queries.captured_queries), size
+
+
+def run():
+    user = User.objects.create_user(username='benchmark_payloads_user', password='benchmark')
+    stocks = Stock.objects.bulk_create([
+        Stock(symbol=f'BNCH{i}', name=f'Benchmark {i}', current_price=Decimal('100.00'))
+        for i in range(STOCKS)
+    ])
+    StockPriceHistory.objects.bulk_create([
+        StockPriceHistory(stock=stock, price=Decimal('100.00'))
+        for stock in stocks for _ in range(HISTORY_PER_STOCK)
+    ])
+    Transaction.objects.bulk_create([
+        Transaction(
+            user=user, stock=stocks[i % STOCKS], transaction_type='BUY',
+            quantity=Decimal('1'), price=Decimal('100.00'), total_amount=Decimal('100.00'),
+        )
+        for i in range(TRANSACTIONS)
+    ])
+
+    print(f'{TRANSACTIONS} transactions, {STOCKS} titres, {HISTORY_PER_STOCK} points d\'historique par titre')
+    legacy_queries, legacy_size = measure(
+        'avant', LegacyTransactionSerializer, Transaction.objects.filter(user=user)
+    )
+    slim_queries, slim_size = measure(
+        'après', TransactionSerializer, Transaction.objects.filter(user=user).select_related('stock')
+    )
+    print(f'Réduction: {legacy_queries - slim_queries} requêtes, payload {legacy_size / slim_size:.0f}x plus petit')
+
+
+if __name__ == '__main__':
+    with transaction.atomic():
+        run()
+        transaction.set_rollback(True)
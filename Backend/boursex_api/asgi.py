@@ -0,0 +1,18 @@
+"""
+ASGI config for boursex_api project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Under ASGI the price stream (/api/stream/prices/) uses an async generator, so
+connected clients do not hold a worker thread each.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'boursex_api.settings')
+
+application = get_asgi_application()
@@ -69,6 +69,17 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'OPTIONS': {
+            # SQLite has no SELECT ... FOR UPDATE: take the write lock when the
+            # atomic block starts so concurrent trades queue instead of failing
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+        # File-backed test database: the shared-cache in-memory default fails
+        # concurrent writers immediately instead of waiting on the lock
+        'TEST': {
+            'NAME': os.path.join(BASE_DIR, 'test_db.sqlite3'),
+        },
     }
 }
 
@@ -141,6 +152,57 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Cache shared between the API and the market tick process (run_market)
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', os.path.join(BASE_DIR, 'cache')),
+    }
+}
+
+# Market tick scheduler (python manage.py run_market)
+MARKET_TICK_INTERVAL = float(os.getenv('MARKET_TICK_INTERVAL', '5'))
+MARKET_TICK_MODEL = os.getenv('MARKET_TICK_MODEL', 'gbm')
+MARKET_FLUSH_EVERY = int(os.getenv('MARKET_FLUSH_EVERY', '1'))
+
+# Price stream (GET /api/stream/prices/): ticks kept for Last-Event-ID resume,
+# heartbeat and poll periods, and how long a connection stays open before the
+# client is asked to reconnect (frees WSGI workers)
+MARKET_STREAM_BUFFER = int(os.getenv('MARKET_STREAM_BUFFER', '300'))
+MARKET_STREAM_HEARTBEAT = float(os.getenv('MARKET_STREAM_HEARTBEAT', '15'))
+MARKET_STREAM_POLL_INTERVAL = float(os.getenv('MARKET_STREAM_POLL_INTERVAL', '0.5'))
+MARKET_STREAM_MAX_DURATION = float(os.getenv('MARKET_STREAM_MAX_DURATION', '300'))
+
+# Admin dashboard statistics snapshot: refreshed every ADMIN_STATS_REFRESH_INTERVAL
+# seconds by `python manage.py refresh_dashboard_stats --interval 60`; a read
+# recomputes it when it is older than ADMIN_STATS_MAX_AGE
+ADMIN_STATS_REFRESH_INTERVAL = float(os.getenv('ADMIN_STATS_REFRESH_INTERVAL', '60'))
+ADMIN_STATS_MAX_AGE = int(os.getenv('ADMIN_STATS_MAX_AGE', '300'))
+
+# Seconds a serialized stock list / quote is kept per market version
+# (a new version is written by every price update)
+STOCK_CACHE_TTL = int(os.getenv('STOCK_CACHE_TTL', '300'))
+
+# Per-user event stream (GET /api/stream/events/, long-poll GET /api/events/):
+# how long events stay available for resume, poll/heartbeat periods, and the
+# maximum duration of an SSE connection or of a long-poll wait
+USER_EVENTS_TTL = int(os.getenv('USER_EVENTS_TTL', '600'))
+USER_EVENTS_POLL_INTERVAL = float(os.getenv('USER_EVENTS_POLL_INTERVAL', '1'))
+USER_EVENTS_HEARTBEAT = float(os.getenv('USER_EVENTS_HEARTBEAT', '15'))
+USER_EVENTS_MAX_DURATION = float(os.getenv('USER_EVENTS_MAX_DURATION', '300'))
+USER_EVENTS_LONG_POLL_TIMEOUT = float(os.getenv('USER_EVENTS_LONG_POLL_TIMEOUT', '25'))
+
+# Gamification is processed by `python manage.py run_gamification_worker`;
+# set GAMIFICATION_ASYNC=False to process it inline (no worker needed)
+GAMIFICATION_ASYNC = os.getenv('GAMIFICATION_ASYNC', 'True').lower() == 'true'
+
+# Seconds between checkpoints of the live leaderboards to the Leaderboard table
+LEADERBOARD_CHECKPOINT_INTERVAL = float(os.getenv('LEADERBOARD_CHECKPOINT_INTERVAL', '60'))
+
+# gamification_summary cache: seconds an entry is fresh, then served stale while it is rebuilt
+GAMIFICATION_SUMMARY_FRESH = int(os.getenv('GAMIFICATION_SUMMARY_FRESH', '30'))
+GAMIFICATION_SUMMARY_STALE = int(os.getenv('GAMIFICATION_SUMMARY_STALE', '300'))
+
 # Simple JWT settings (optional tweaks)
 from datetime import timedelta
 SIMPLE_JWT = {
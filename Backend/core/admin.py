@@ -4,14 +4,17 @@ from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 import json
 from .models import (
-    UserProfile, Stock, StockPriceHistory, Portfolio,
+    UserProfile, Stock, StockPriceHistory, PriceCandle, Portfolio,
     Transaction, Mission, UserMission, Watchlist,
     Badge, UserBadge, Leaderboard, Achievement,
-    UserAchievement, DailyStreak, Notification
+    UserAchievement, DailyStreak, Notification, NotificationReceipt, GamificationEvent,
+    DailyTradingStats, DashboardStats
 )
+from . import data_versions, market_engine, summary_cache
 
 # Enhanced User Admin with inline UserProfile
 class UserProfileInline(admin.StackedInline):
@@ -138,14 +141,27 @@ class StockAdmin(admin.ModelAdmin):
         return '-'
     price_change.short_description = 'Price Change'
     
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and 'current_price' in form.changed_data:
+            # Prix fixé à la main: même chemin qu'un tick (historique, bougies, snapshot, version)
+            market_engine.persist_ticks(
+                [obj], [(timezone.now(), [float(obj.current_price)])], last_prices=[form.initial['current_price']]
+            )
+        else:
+            transaction.on_commit(data_versions.bump_market)
+    
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        transaction.on_commit(data_versions.bump_market)
+    
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        transaction.on_commit(data_versions.bump_market)
+    
     def update_prices(self, request, queryset):
-        # Simulate price updates
-        import random
-        for stock in queryset:
-            change_percent = random.uniform(-0.05, 0.05)  # ±5% change
-            new_price = stock.current_price * (1 + change_percent)
-            stock.current_price = round(new_price, 2)
-            stock.save()
+        # Simulate price updates (±5% change)
+        market_engine.apply_tick('uniform', queryset=queryset, low=-0.05, high=0.05)
         self.message_user(request, f"Updated prices for {queryset.count()} stocks.")
     update_prices.short_description = "Simulate price updates"
 
@@ -156,6 +172,13 @@ class StockPriceHistoryAdmin(admin.ModelAdmin):
     search_fields = ('stock__symbol', 'stock__name')
     ordering = ('-timestamp',)
 
+@admin.register(PriceCandle)
+class PriceCandleAdmin(admin.ModelAdmin):
+    list_display = ('stock', 'interval', 'bucket_start', 'open', 'high', 'low', 'close', 'volume')
+    list_filter = ('interval', 'stock')
+    search_fields = ('stock__symbol',)
+    ordering = ('-bucket_start',)
+
 @admin.register(Portfolio)
 class PortfolioAdmin(admin.ModelAdmin):
     list_display = ['user', 'stock', 'quantity', 'average_price', 'created_at']
@@ -241,10 +264,42 @@ class NotificationAdmin(admin.ModelAdmin):
     
     def mark_as_read(self, request, queryset):
         queryset.update(is_read=True)
+        summary_cache.invalidate(*queryset.filter(user__isnull=False).order_by().values_list('user_id', flat=True).distinct())
         self.message_user(request, f"{queryset.count()} notifications marquées comme lues.")
     mark_as_read.short_description = "Marquer comme lu"
     
     def mark_as_unread(self, request, queryset):
         queryset.update(is_read=False)
+        summary_cache.invalidate(*queryset.filter(user__isnull=False).order_by().values_list('user_id', flat=True).distinct())
         self.message_user(request, f"{queryset.count()} notifications marquées comme non lues.")
     mark_as_unread.short_description = "Marquer comme non lu"
+
+@admin.register(NotificationReceipt)
+class NotificationReceiptAdmin(admin.ModelAdmin):
+    list_display = ['user', 'notification', 'is_read', 'is_dismissed', 'updated_at']
+    list_filter = ['is_read', 'is_dismissed']
+    search_fields = ['user__username', 'notification__title']
+
+@admin.register(GamificationEvent)
+class GamificationEventAdmin(admin.ModelAdmin):
+    list_display = ['user', 'event_type', 'status', 'attempts', 'created_at', 'processed_at']
+    list_filter = ['status', 'event_type']
+    search_fields = ['user__username']
+    readonly_fields = ['payload', 'result', 'error', 'created_at', 'claimed_at', 'processed_at']
+
+@admin.register(DailyTradingStats)
+class DailyTradingStatsAdmin(admin.ModelAdmin):
+    list_display = ['day', 'user', 'stock', 'buy_count', 'sell_count', 'notional', 'realized_pl']
+    list_filter = ['day']
+    search_fields = ['user__username', 'stock__symbol']
+    date_hierarchy = 'day'
+    list_select_related = ['user', 'stock']
+    readonly_fields = ['day', 'user', 'stock', 'buy_count', 'sell_count', 'volume', 'notional', 'realized_pl']
+
+@admin.register(DashboardStats)
+class DashboardStatsAdmin(admin.ModelAdmin):
+    list_display = ['computed_at', 'total_transactions', 'total_volume']
+    readonly_fields = [
+        'computed_at', 'total_transactions', 'buy_transactions', 'sell_transactions',
+        'total_volume', 'total_quantity', 'data',
+    ]
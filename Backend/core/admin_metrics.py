@@ -0,0 +1,283 @@
+"""
+Statistiques du tableau de bord admin, matérialisées dans une ligne DashboardStats.
+
+Chaque section est calculée en une requête d'agrégats conditionnels (Count(filter=Q)).
+Les totaux des transactions et la série par jour lisent le cumul DailyTradingStats,
+tenu à jour dans la transaction de chaque trade (un trade validé après un rafraîchissement
+est compté au suivant, quel que soit son id); les fenêtres récentes (24 h, 7 jours)
+lisent l'index sur la date. Les vues lisent la ligne; elle est
+rafraîchie par `python manage.py refresh_dashboard_stats` (ou à la lecture si elle est
+plus ancienne que ADMIN_STATS_MAX_AGE).
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Avg, Count, DecimalField, F, Q, Sum
+from django.utils import timezone
+
+from . import trading_stats
+from .models import (
+    Badge, DailyTradingStats, DashboardStats, Mission, Stock, Transaction, UserBadge, UserMission, UserProfile,
+)
+from .serializers import BadgeSerializer, StockSerializer
+
+SNAPSHOT_ID = 1
+DAILY_SERIES_DAYS = 30
+
+
+def user_metrics(now):
+    week = now - timedelta(days=7)
+    row = User.objects.aggregate(
+        total=Count('id'),
+        active=Count('id', filter=Q(is_active=True)),
+        staff=Count('id', filter=Q(is_staff=True)),
+        new_week=Count('id', filter=Q(date_joined__gte=week)),
+        avg_level=Avg('userprofile__level'),
+        avg_balance=Avg('userprofile__balance'),
+        total_balance=Sum('userprofile__balance'),
+    )
+    return {
+        'total': row['total'],
+        'active': row['active'],
+        'staff': row['staff'],
+        'new_week': row['new_week'],
+        'avg_level': round(float(row['avg_level'] or 0), 2),
+        'avg_balance': float(row['avg_balance'] or 0),
+        'total_balance': float(row['total_balance'] or 0),
+    }
+
+
+def transaction_totals():
+    """Totaux de toutes les transactions, lus dans le cumul quotidien"""
+    return DailyTradingStats.objects.aggregate(
+        buys=Sum('buy_count'),
+        sells=Sum('sell_count'),
+        notional=Sum('notional'),
+        quantity=Sum('volume'),
+    )
+
+
+def recent_transaction_metrics(now):
+    day = now - timedelta(hours=24)
+    return Transaction.objects.filter(timestamp__gte=now - timedelta(days=7)).aggregate(
+        last_24h=Count('id', filter=Q(timestamp__gte=day)),
+        last_week=Count('id'),
+    )
+
+
+def daily_transaction_metrics(now):
+    """Trades, montant et P/L réalisé par jour sur DAILY_SERIES_DAYS jours"""
+    today = timezone.localdate(now)
+    return [
+        {
+            'day': row['day'].isoformat(),
+            'buy_transactions': row['buys'],
+            'sell_transactions': row['sells'],
+            'volume': float(row['notional']),
+            'realized_pl': float(row['realized_pl']),
+        }
+        for row in trading_stats.daily_totals(today - timedelta(days=DAILY_SERIES_DAYS - 1), today)
+    ]
+
+
+def stock_metrics():
+    row = Stock.objects.aggregate(
+        total=Count('id'),
+        avg_price=Avg('current_price'),
+        total_market_cap=Sum(F('current_price') * F('volume'), output_field=DecimalField()),
+    )
+    top_stocks = Stock.objects.order_by('-current_price')[:5]
+    return {
+        'total': row['total'],
+        'avg_price': float(row['avg_price'] or 0),
+        'total_market_cap': float(row['total_market_cap'] or 0),
+        'top_stocks': StockSerializer(top_stocks, many=True).data,
+    }
+
+
+def mission_metrics():
+    missions = Mission.objects.aggregate(total=Count('id'), active=Count('id', filter=Q(is_active=True)))
+    assignments = UserMission.objects.aggregate(
+        total=Count('id'), completed=Count('id', filter=Q(is_completed=True))
+    )
+    return {
+        'total': missions['total'],
+        'active': missions['active'],
+        'assigned': assignments['total'],
+        'completed': assignments['completed'],
+    }
+
+
+def badge_metrics(now):
+    awards = UserBadge.objects.aggregate(
+        total=Count('id'),
+        last_24h=Count('id', filter=Q(earned_at__gte=now - timedelta(hours=24))),
+        last_week=Count('id', filter=Q(earned_at__gte=now - timedelta(days=7))),
+    )
+    popular = Badge.objects.annotate(earned_count=Count('userbadge')).order_by('-earned_count', 'id')[:5]
+    return {
+        'total': Badge.objects.count(),
+        'awarded': awards['total'],
+        'awarded_24h': awards['last_24h'],
+        'awarded_week': awards['last_week'],
+        'popular': [
+            {**BadgeSerializer(badge).data, 'earned_count': badge.earned_count} for badge in popular
+        ],
+    }
+
+
+def top_performers():
+    profiles = UserProfile.objects.select_related('user')
+    return {
+        'top_traders': [
+            {'username': profile.user.username, 'trading_score': float(profile.trading_score), 'level': profile.level}
+            for profile in profiles.order_by('-trading_score')[:5]
+        ],
+        'top_levels': [
+            {'username': profile.user.username, 'level': profile.level, 'xp': profile.xp}
+            for profile in profiles.order_by('-level', '-xp')[:5]
+        ],
+    }
+
+
+def refresh(full=False):
+    """Recalcule l'instantané; `full` reconstruit d'abord le cumul depuis les transactions"""
+    if full:
+        trading_stats.rebuild()
+    now = timezone.now()
+    with transaction.atomic():
+        snapshot = DashboardStats.objects.select_for_update().filter(pk=SNAPSHOT_ID).first()
+        if snapshot is None:
+            snapshot = DashboardStats(pk=SNAPSHOT_ID)
+        totals = transaction_totals()
+        snapshot.buy_transactions = totals['buys'] or 0
+        snapshot.sell_transactions = totals['sells'] or 0
+        snapshot.total_transactions = snapshot.buy_transactions + snapshot.sell_transactions
+        snapshot.total_volume = totals['notional'] or Decimal('0')
+        snapshot.total_quantity = totals['quantity'] or Decimal('0')
+        snapshot.data = {
+            'users': user_metrics(now),
+            'recent_transactions': recent_transaction_metrics(now),
+            'daily_transactions': daily_transaction_metrics(now),
+            'stocks': stock_metrics(),
+            'missions': mission_metrics(),
+            'badges': badge_metrics(now),
+            'top_performers': top_performers(),
+        }
+        snapshot.computed_at = now
+        snapshot.save()
+    return snapshot
+
+
+def get_snapshot():
+    """Dernier instantané (une ligne); recalculé s'il manque ou a dépassé ADMIN_STATS_MAX_AGE"""
+    snapshot = DashboardStats.objects.filter(pk=SNAPSHOT_ID).first()
+    if snapshot is None or timezone.now() - snapshot.computed_at > timedelta(seconds=settings.ADMIN_STATS_MAX_AGE):
+        snapshot = refresh()
+    return snapshot
+
+
+def dashboard(snapshot):
+    """Réponse du tableau de bord: les deux formats lus par les écrans admin"""
+    data = snapshot.data
+    users, recent = data['users'], data['recent_transactions']
+    missions, badges = data['missions'], data['badges']
+    return {
+        'users': {
+            'total': users['total'],
+            'active': users['active'],
+            'staff': users['staff'],
+            'new_this_week': users['new_week'],
+            'avg_level': users['avg_level'],
+            'avg_balance': users['avg_balance'],
+            'total_balance': users['total_balance'],
+        },
+        'trading': {
+            'total_stocks': data['stocks']['total'],
+            'total_transactions': snapshot.total_transactions,
+            'recent_transactions': recent['last_week'],
+        },
+        'gamification': {
+            'total_missions': missions['total'],
+            'active_missions': missions['active'],
+        },
+        'user_stats': {
+            'total_users': users['total'],
+            'active_users': users['active'],
+            'new_users_week': users['new_week'],
+            'avg_balance': users['avg_balance'],
+        },
+        'trading_stats': {
+            'total_transactions': snapshot.total_transactions,
+            'total_volume': float(snapshot.total_volume),
+            'recent_transactions': recent['last_24h'],
+        },
+        'gamification_stats': {
+            'total_badges': badges['total'],
+            'total_missions': missions['total'],
+            'active_missions': missions['active'],
+            'recent_badges': badges['awarded_24h'],
+        },
+        'top_performers': data['top_performers'],
+        'computed_at': snapshot.computed_at.isoformat(),
+    }
+
+
+def user_stats(snapshot):
+    users = snapshot.data['users']
+    return {
+        'total_users': users['total'],
+        'active_users': users['active'],
+        'staff_users': users['staff'],
+        'new_users_week': users['new_week'],
+        'avg_level': users['avg_level'],
+        'avg_balance': users['avg_balance'],
+        'total_balance': users['total_balance'],
+    }
+
+
+def stock_stats(snapshot):
+    stocks = snapshot.data['stocks']
+    return {
+        'total_stocks': stocks['total'],
+        'total_market_cap': stocks['total_market_cap'],
+        'avg_price': stocks['avg_price'],
+        'top_stocks': stocks['top_stocks'],
+    }
+
+
+def transaction_stats(snapshot):
+    return {
+        'total_transactions': snapshot.total_transactions,
+        'total_volume': float(snapshot.total_volume),
+        'buy_transactions': snapshot.buy_transactions,
+        'sell_transactions': snapshot.sell_transactions,
+        'recent_transactions': snapshot.data['recent_transactions']['last_24h'],
+        'daily': snapshot.data.get('daily_transactions', []),
+    }
+
+
+def mission_stats(snapshot):
+    missions = snapshot.data['missions']
+    completion_rate = missions['completed'] / missions['assigned'] * 100 if missions['assigned'] else 0
+    return {
+        'total_missions': missions['total'],
+        'active_missions': missions['active'],
+        'total_user_missions': missions['assigned'],
+        'completed_missions': missions['completed'],
+        'completion_rate': round(completion_rate, 2),
+    }
+
+
+def badge_stats(snapshot):
+    badges = snapshot.data['badges']
+    return {
+        'total_badges': badges['total'],
+        'total_user_badges': badges['awarded'],
+        'recent_badges': badges['awarded_week'],
+        'popular_badges': badges['popular'],
+    }
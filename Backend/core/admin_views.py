@@ -2,12 +2,12 @@ from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from django.contrib.auth.models import User
-from django.db.models import Q, Count, Sum, Avg
-from django.utils import timezone
-from datetime import timedelta
+from django.db import transaction
+from django.db.models import F
 from .models import *
 from .serializers import *
-import random
+from . import admin_metrics, data_versions, market_engine, mission_assignment, price_models, summary_cache, user_events
+from .pagination import CreatedAtCursorPagination, DateJoinedCursorPagination, TimestampCursorPagination
 from decimal import Decimal
 
 class IsAdminUser(permissions.BasePermission):
@@ -24,6 +24,7 @@ class AdminUserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all().select_related('userprofile')
     serializer_class = UserSerializer
     permission_classes = [IsAdminUser]
+    pagination_class = DateJoinedCursorPagination
     filterset_fields = ['is_active', 'is_staff']
     search_fields = ['username', 'email', 'first_name', 'last_name']
     ordering_fields = ['username', 'date_joined']
@@ -33,32 +34,14 @@ class AdminUserViewSet(viewsets.ModelViewSet):
             return UserCreateUpdateSerializer
         return UserDetailSerializer
     
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        summary_cache.invalidate(serializer.instance.id)
+    
     @action(detail=False, methods=['get'])
     def stats(self, request):
         """Get comprehensive user statistics"""
-        total_users = User.objects.count()
-        active_users = User.objects.filter(is_active=True).count()
-        staff_users = User.objects.filter(is_staff=True).count()
-        
-        # Recent activity
-        last_week = timezone.now() - timedelta(days=7)
-        new_users_week = User.objects.filter(date_joined__gte=last_week).count()
-        
-        # Profile stats
-        profiles = UserProfile.objects.all()
-        avg_level = profiles.aggregate(avg_level=Avg('level'))['avg_level'] or 0
-        avg_balance = profiles.aggregate(avg_balance=Avg('balance'))['avg_balance'] or 0
-        total_balance = profiles.aggregate(total_balance=Sum('balance'))['total_balance'] or 0
-        
-        return Response({
-            'total_users': total_users,
-            'active_users': active_users,
-            'staff_users': staff_users,
-            'new_users_week': new_users_week,
-            'avg_level': round(avg_level, 2),
-            'avg_balance': float(avg_balance),
-            'total_balance': float(total_balance),
-        })
+        return Response(admin_metrics.user_stats(admin_metrics.get_snapshot()))
     
     @action(detail=True, methods=['post'])
     def toggle_active(self, request, pk=None):
@@ -91,35 +74,21 @@ class AdminUserViewSet(viewsets.ModelViewSet):
         user.save()
         return Response({'message': f'Password reset for {user.username}'})
 
-class AdminStockViewSet(viewsets.ModelViewSet):
+class AdminStockViewSet(data_versions.MarketWriteMixin, viewsets.ModelViewSet):
     """
     Admin ViewSet for managing stocks with full CRUD operations
     """
     queryset = Stock.objects.all()
     serializer_class = StockSerializer
     permission_classes = [IsAdminUser]
-    search_fields = ['symbol', 'name', 'sector']
-    ordering_fields = ['symbol', 'current_price', 'market_cap']
+    search_fields = ['symbol', 'name']
+    ordering_fields = ['symbol', 'current_price', 'volume']
     
     @action(detail=False, methods=['post'])
     def bulk_update_prices(self, request):
         """Update all stock prices with random fluctuations"""
-        stocks = Stock.objects.all()
-        updated_count = 0
-        
-        for stock in stocks:
-            # Random price change between -5% and +5%
-            change_percent = random.uniform(-0.05, 0.05)
-            new_price = float(stock.current_price) * (1 + change_percent)
-            stock.current_price = max(Decimal('0.01'), Decimal(str(round(new_price, 2))))
-            stock.save()
-            
-            # Create price history entry
-            StockPriceHistory.objects.create(
-                stock=stock,
-                price=stock.current_price
-            )
-            updated_count += 1
+        # Random price change between -5% and +5%
+        updated_count = len(market_engine.apply_tick('uniform', low=-0.05, high=0.05))
         
         return Response({
             'message': f'Updated {updated_count} stock prices',
@@ -136,141 +105,7 @@ class AdminStockViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def stats(self, request):
         """Get stock market statistics"""
-        total_stocks = Stock.objects.count()
-        total_market_cap = Stock.objects.aggregate(total_cap=Sum('market_cap'))['total_cap'] or 0
-        avg_price = Stock.objects.aggregate(avg_price=Avg('current_price'))['avg_price'] or 0
-        
-        # Top performers
-        top_gainers = Stock.objects.order_by('-current_price')[:5]
-        
-        return Response({
-            'total_stocks': total_stocks,
-            'total_market_cap': float(total_market_cap),
-            'avg_price': float(avg_price),
-            'top_stocks': StockSerializer(top_gainers, many=True).data
-        })
-
-class AdminTransactionViewSet(viewsets.ModelViewSet):
-    """
-    Admin ViewSet for managing transactions
-    """
-    queryset = Transaction.objects.all().select_related('user', 'stock')
-    serializer_class = TransactionSerializer
-    permission_classes = [IsAdminUser]
-    filterset_fields = ['transaction_type', 'user', 'stock']
-    search_fields = ['user__username', 'stock__symbol']
-    ordering_fields = ['timestamp', 'amount', 'price']
-    
-    @action(detail=False, methods=['get'])
-    def stats(self, request):
-        """Get transaction statistics"""
-        total_transactions = Transaction.objects.count()
-        total_volume = Transaction.objects.aggregate(
-            total_volume=Sum('quantity')
-        )['total_volume'] or 0
-        
-        # Recent activity
-        last_24h = timezone.now() - timedelta(hours=24)
-        recent_transactions = Transaction.objects.filter(timestamp__gte=last_24h).count()
-        
-        # Buy vs Sell ratio
-        buy_count = Transaction.objects.filter(transaction_type='buy').count()
-        sell_count = Transaction.objects.filter(transaction_type='sell').count()
-        
-        return Response({
-            'total_transactions': total_transactions,
-            'total_volume': total_volume,
-            'recent_transactions': recent_transactions,
-            'buy_transactions': buy_count,
-            'sell_transactions': sell_count,
-        })
-
-class AdminMissionViewSet(viewsets.ModelViewSet):
-    """
-    Admin ViewSet for managing missions
-    """
-    queryset = Mission.objects.all()
-    serializer_class = MissionSerializer
-    permission_classes = [IsAdminUser]
-    filterset_fields = ['is_active', 'difficulty']
-    search_fields = ['title', 'description']
-    ordering_fields = ['title', 'xp_reward', 'created_at']
-    
-    @action(detail=False, methods=['post'])
-    def create_daily_missions(self, request):
-        """Create daily missions for all users"""
-        missions = Mission.objects.filter(is_active=True)
-        users = User.objects.filter(is_active=True)
-        created_count = 0
-        
-        for user in users:
-            for mission in missions.order_by('?')[:3]:  # Random 3 missions per user
-                user_mission, created = UserMission.objects.get_or_create(
-                    user=user,
-                    mission=mission,
-                    defaults={
-                        'assigned_date': timezone.now().date(),
-                        'is_completed': False,
-                        'progress': 0
-                    }
-                )
-                if created:
-                    created_count += 1
-        
-        return Response({
-            'message': f'Created {created_count} daily missions',
-            'created_count': created_count
-        })
-    
-    @action(detail=False, methods=['get'])
-    def stats(self, request):
-        """Get mission statistics"""
-        total_missions = Mission.objects.count()
-        active_missions = Mission.objects.filter(is_active=True).count()
-        total_user_missions = UserMission.objects.count()
-        completed_missions = UserMission.objects.filter(is_completed=True).count()
-        
-        completion_rate = (completed_missions / total_user_missions * 100) if total_user_missions > 0 else 0
-        
-        return Response({
-            'total_missions': total_missions,
-            'active_missions': active_missions,
-            'total_user_missions': total_user_missions,
-            'completed_missions': completed_missions,
-            'completion_rate': round(completion_rate, 2)
-        })
-
-class AdminBadgeViewSet(viewsets.ModelViewSet):
-    """
-    Admin ViewSet for managing badges
-    """
-    queryset = Badge.objects.all()
-    serializer_class = BadgeSerializer
-    permission_classes = [IsAdminUser]
-    search_fields = ['name', 'description']
-    ordering_fields = ['name', 'created_at']
-    
-    @action(detail=False, methods=['get'])
-    def stats(self, request):
-        """Get badge statistics"""
-        total_badges = Badge.objects.count()
-        total_user_badges = UserBadge.objects.count()
-        
-        # Most earned badges
-        popular_badges = Badge.objects.annotate(
-            earned_count=Count('userbadge')
-        ).order_by('-earned_count')[:5]
-        
-        # Recent badge earnings
-        last_week = timezone.now() - timedelta(days=7)
-        recent_badges = UserBadge.objects.filter(earned_date__gte=last_week).count()
-        
-        return Response({
-            'total_badges': total_badges,
-            'total_user_badges': total_user_badges,
-            'recent_badges': recent_badges,
-            'popular_badges': BadgeSerializer(popular_badges, many=True).data
-        })
+        return Response(admin_metrics.stock_stats(admin_metrics.get_snapshot()))
 
 class AdminNotificationViewSet(viewsets.ModelViewSet):
     """
@@ -279,10 +114,18 @@ class AdminNotificationViewSet(viewsets.ModelViewSet):
     queryset = Notification.objects.all().select_related('user')
     serializer_class = NotificationSerializer
     permission_classes = [IsAdminUser]
+    pagination_class = CreatedAtCursorPagination
     filterset_fields = ['notification_type', 'is_read']
     search_fields = ['title', 'message', 'user__username']
     ordering_fields = ['created_at', 'notification_type']
     
+    def create(self, request, *args, **kwargs):
+        # The serializer has no user field: a plain create would write a broadcast row
+        return Response(
+            {'error': 'Use the broadcast action to notify all users'},
+            status=status.HTTP_405_METHOD_NOT_ALLOWED
+        )
+    
     @action(detail=False, methods=['post'])
     def broadcast(self, request):
         """Send notification to all users"""
@@ -296,73 +139,23 @@ class AdminNotificationViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        users = User.objects.filter(is_active=True)
-        notifications = []
-        
-        for user in users:
-            notifications.append(Notification(
-                user=user,
-                title=title,
-                message=message,
-                notification_type=notification_type
-            ))
-        
-        Notification.objects.bulk_create(notifications)
+        # Une seule ligne (user=NULL), fusionnée dans le fil de chaque utilisateur à la lecture
+        notification = Notification.objects.create(
+            user=None,
+            title=title,
+            message=message,
+            notification_type=notification_type
+        )
+        summary_cache.invalidate_all()
+        user_events.publish(user_events.BROADCAST, 'notification', user_events.notification_data(notification), unread_delta=1)
+        recipients = User.objects.filter(is_active=True).count()
         
         return Response({
-            'message': f'Broadcast sent to {len(notifications)} users',
-            'sent_count': len(notifications)
+            'message': f'Broadcast sent to {recipients} users',
+            'sent_count': recipients,
+            'notification_id': notification.id
         })
 
-@api_view(['GET'])
-@permission_classes([IsAdminUser])
-def admin_dashboard_stats(request):
-    """Get comprehensive admin dashboard statistics"""
-    # User stats
-    total_users = User.objects.count()
-    active_users = User.objects.filter(is_active=True).count()
-    staff_users = User.objects.filter(is_staff=True).count()
-    
-    # Recent activity
-    last_week = timezone.now() - timedelta(days=7)
-    new_users_week = User.objects.filter(date_joined__gte=last_week).count()
-    
-    # Profile stats
-    profiles = UserProfile.objects.all()
-    avg_level = profiles.aggregate(avg_level=Avg('level'))['avg_level'] or 0
-    avg_balance = profiles.aggregate(avg_balance=Avg('balance'))['avg_balance'] or 0
-    total_balance = profiles.aggregate(total_balance=Sum('balance'))['total_balance'] or 0
-    
-    # Stock stats
-    total_stocks = Stock.objects.count()
-    total_transactions = Transaction.objects.count()
-    recent_transactions = Transaction.objects.filter(timestamp__gte=last_week).count()
-    
-    # Mission stats
-    total_missions = Mission.objects.count()
-    active_missions = Mission.objects.filter(is_active=True).count()
-    
-    return Response({
-        'users': {
-            'total': total_users,
-            'active': active_users,
-            'staff': staff_users,
-            'new_this_week': new_users_week,
-            'avg_level': round(avg_level, 2),
-            'avg_balance': float(avg_balance),
-            'total_balance': float(total_balance)
-        },
-        'trading': {
-            'total_stocks': total_stocks,
-            'total_transactions': total_transactions,
-            'recent_transactions': recent_transactions
-        },
-        'gamification': {
-            'total_missions': total_missions,
-            'active_missions': active_missions
-        }
-    })
-
 @api_view(['POST'])
 @permission_classes([IsAdminUser])
 def admin_bulk_actions(request):
@@ -403,37 +196,54 @@ def admin_bulk_actions(request):
 def admin_market_simulation(request):
     """Simulate market events"""
     event_type = request.data.get('type', 'random_fluctuation')
-    intensity = float(request.data.get('intensity', 0.1))  # 10% by default
-    
-    stocks = Stock.objects.all()
-    updated_count = 0
+    model = request.data.get('model', 'uniform')
+    seed = request.data.get('seed')
+    try:
+        intensity = float(request.data.get('intensity', 0.1))  # 10% by default
+        steps = int(request.data.get('steps', 1))
+        seed = int(seed) if seed is not None else None
+    except (TypeError, ValueError):
+        return Response({'error': 'intensity, steps and seed must be numbers'}, status=status.HTTP_400_BAD_REQUEST)
     
-    for stock in stocks:
+    if model == 'uniform':
         if event_type == 'bull_market':
             # Positive market movement
-            change = random.uniform(0, intensity)
+            params = {'low': 0, 'high': intensity}
         elif event_type == 'bear_market':
             # Negative market movement
-            change = random.uniform(-intensity, 0)
+            params = {'low': -intensity, 'high': 0}
         else:
             # Random fluctuation
-            change = random.uniform(-intensity, intensity)
-        
-        new_price = float(stock.current_price) * (1 + change)
-        stock.current_price = max(Decimal('0.01'), Decimal(str(round(new_price, 2))))
-        stock.save()
-        
-        # Create price history
-        StockPriceHistory.objects.create(
-            stock=stock,
-            price=stock.current_price
+            params = {'low': -intensity, 'high': intensity}
+    else:
+        # Stochastic models: optional tuning parameters (dt in years)
+        try:
+            params = {
+                key: float(request.data[key])
+                for key in ('dt', 'jump_intensity', 'jump_mean', 'jump_std', 'reversion_speed')
+                if key in request.data
+            }
+        except (TypeError, ValueError):
+            return Response({'error': 'Model parameters must be numbers'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    if not 1 <= steps <= 10000:
+        return Response(
+            {'error': 'steps must be between 1 and 10000'},
+            status=status.HTTP_400_BAD_REQUEST
         )
-        updated_count += 1
+    
+    rng = price_models.make_rng(seed)
+    try:
+        updated_count = len(market_engine.apply_tick(model, steps, rng=rng, **params))
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     
     return Response({
         'message': f'Market simulation completed: {event_type}',
         'updated_stocks': updated_count,
-        'intensity': intensity
+        'intensity': intensity,
+        'model': model,
+        'steps': steps
     })
 
 @api_view(['POST'])
@@ -453,15 +263,15 @@ def admin_assign_badge(request):
         badge = Badge.objects.get(id=badge_id)
         users = User.objects.filter(id__in=user_ids)
         
-        assigned_count = 0
-        for user in users:
-            user_badge, created = UserBadge.objects.get_or_create(
-                user=user,
-                badge=badge,
-                defaults={'earned_date': timezone.now()}
-            )
-            if created:
-                assigned_count += 1
+        assigned_ids = []
+        with transaction.atomic():
+            for user in users:
+                user_badge, created = UserBadge.objects.get_or_create(user=user, badge=badge)
+                if created:
+                    assigned_ids.append(user.id)
+            UserProfile.objects.filter(user_id__in=assigned_ids).update(badge_count=F('badge_count') + 1)
+        summary_cache.invalidate(*assigned_ids)
+        assigned_count = len(assigned_ids)
         
         return Response({
             'message': f'Assigned badge "{badge.name}" to {assigned_count} users',
@@ -498,6 +308,7 @@ class AdminTransactionViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Transaction.objects.all().select_related('user', 'stock')
     serializer_class = TransactionSerializer
     permission_classes = [IsAdminUser]
+    pagination_class = TimestampCursorPagination
     filterset_fields = ['transaction_type', 'user', 'stock']
     search_fields = ['user__username', 'stock__symbol']
     ordering_fields = ['timestamp', 'total_amount']
@@ -505,23 +316,7 @@ class AdminTransactionViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=False, methods=['get'])
     def stats(self, request):
         """Get transaction statistics"""
-        total_transactions = Transaction.objects.count()
-        total_volume = Transaction.objects.aggregate(total=Sum('total_amount'))['total'] or 0
-        buy_transactions = Transaction.objects.filter(transaction_type='BUY').count()
-        sell_transactions = Transaction.objects.filter(transaction_type='SELL').count()
-        
-        # Recent activity (last 24 hours)
-        recent_transactions = Transaction.objects.filter(
-            timestamp__gte=timezone.now() - timedelta(hours=24)
-        ).count()
-        
-        return Response({
-            'total_transactions': total_transactions,
-            'total_volume': float(total_volume),
-            'buy_transactions': buy_transactions,
-            'sell_transactions': sell_transactions,
-            'recent_transactions': recent_transactions,
-        })
+        return Response(admin_metrics.transaction_stats(admin_metrics.get_snapshot()))
 
 class AdminMissionViewSet(viewsets.ModelViewSet):
     """
@@ -538,20 +333,19 @@ class AdminMissionViewSet(viewsets.ModelViewSet):
         """Assign mission to specific users"""
         mission = self.get_object()
         user_ids = request.data.get('user_ids', [])
-        
-        created_count = 0
-        for user_id in user_ids:
-            try:
-                user = User.objects.get(id=user_id)
-                user_mission, created = UserMission.objects.get_or_create(
-                    user=user,
-                    mission=mission
-                )
-                if created:
-                    created_count += 1
-            except User.DoesNotExist:
-                continue
-                
+        try:
+            if not isinstance(user_ids, list):
+                raise TypeError
+            user_ids = [int(user_id) for user_id in user_ids]
+        except (TypeError, ValueError):
+            return Response({'error': 'user_ids must be a list of user ids'}, status=status.HTTP_400_BAD_REQUEST)
+        # Ids inconnus ignorés
+        user_ids = list(User.objects.filter(id__in=user_ids).values_list('id', flat=True))
+        
+        created_count = mission_assignment.assign_to_user_ids(mission, user_ids)
+        
+        # Missions affichées par le tableau de bord
+        data_versions.bump_users(*user_ids)
         return Response({
             'message': f'Assigned mission to {created_count} users',
             'created_count': created_count
@@ -560,28 +354,35 @@ class AdminMissionViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['post'])
     def create_daily_missions(self, request):
         """Create daily missions for all users"""
-        active_missions = Mission.objects.filter(
-            mission_type='DAILY',
-            is_active=True
-        )
+        missions_per_user = request.data.get('missions_per_user')
+        if missions_per_user is not None:
+            try:
+                missions_per_user = int(missions_per_user)
+            except (TypeError, ValueError):
+                missions_per_user = 0
+            if missions_per_user < 1:
+                return Response(
+                    {'error': 'missions_per_user must be a positive integer'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
         
-        users = User.objects.filter(is_active=True)
-        created_count = 0
+        # Couples (utilisateur, mission) manquants insérés par lots
+        created_count = mission_assignment.assign(
+            User.objects.filter(is_active=True),
+            Mission.objects.filter(mission_type='DAILY', is_active=True).values_list('id', flat=True),
+            missions_per_user=missions_per_user,
+        )
         
-        for user in users:
-            for mission in active_missions:
-                user_mission, created = UserMission.objects.get_or_create(
-                    user=user,
-                    mission=mission,
-                    defaults={'progress': 0.0}
-                )
-                if created:
-                    created_count += 1
-                    
+        data_versions.bump_all_users()
         return Response({
             'message': f'Created {created_count} daily mission assignments',
             'created_count': created_count
         })
+    
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        """Get mission statistics"""
+        return Response(admin_metrics.mission_stats(admin_metrics.get_snapshot()))
 
 class AdminBadgeViewSet(viewsets.ModelViewSet):
     """
@@ -599,99 +400,40 @@ class AdminBadgeViewSet(viewsets.ModelViewSet):
         badge = self.get_object()
         user_ids = request.data.get('user_ids', [])
         
-        awarded_count = 0
-        for user_id in user_ids:
-            try:
-                user = User.objects.get(id=user_id)
+        awarded_ids = []
+        with transaction.atomic():
+            for user in User.objects.filter(id__in=user_ids):
                 user_badge, created = UserBadge.objects.get_or_create(
                     user=user,
                     badge=badge
                 )
                 if created:
-                    # Add XP bonus
-                    profile = user.userprofile
-                    profile.xp += badge.xp_bonus
-                    profile.save()
-                    awarded_count += 1
-            except User.DoesNotExist:
-                continue
+                    awarded_ids.append(user.id)
+            # Add XP bonus
+            UserProfile.objects.filter(user_id__in=awarded_ids).update(
+                xp=F('xp') + badge.xp_bonus,
+                badge_count=F('badge_count') + 1,
+            )
+        summary_cache.invalidate(*awarded_ids)
+        awarded_count = len(awarded_ids)
                 
         return Response({
             'message': f'Awarded badge to {awarded_count} users',
             'awarded_count': awarded_count
         })
+    
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        """Get badge statistics"""
+        return Response(admin_metrics.badge_stats(admin_metrics.get_snapshot()))
 
 @api_view(['GET'])
 @permission_classes([IsAdminUser])
 def admin_dashboard_stats(request):
     """
-    Get comprehensive dashboard statistics for admin
+    Get comprehensive dashboard statistics for admin (from the DashboardStats snapshot)
     """
-    # User stats
-    total_users = User.objects.count()
-    active_users = User.objects.filter(is_active=True).count()
-    new_users_week = User.objects.filter(
-        date_joined__gte=timezone.now() - timedelta(days=7)
-    ).count()
-    
-    # Trading stats
-    total_transactions = Transaction.objects.count()
-    total_volume = Transaction.objects.aggregate(total=Sum('total_amount'))['total'] or 0
-    avg_balance = UserProfile.objects.aggregate(avg=Avg('balance'))['avg'] or 0
-    
-    # Gamification stats
-    total_badges = Badge.objects.count()
-    total_missions = Mission.objects.count()
-    active_missions = Mission.objects.filter(is_active=True).count()
-    
-    # Recent activity
-    recent_transactions = Transaction.objects.filter(
-        timestamp__gte=timezone.now() - timedelta(hours=24)
-    ).count()
-    
-    recent_badges = UserBadge.objects.filter(
-        earned_at__gte=timezone.now() - timedelta(hours=24)
-    ).count()
-    
-    # Top performers
-    top_traders = UserProfile.objects.order_by('-trading_score')[:5]
-    top_levels = UserProfile.objects.order_by('-level', '-xp')[:5]
-    
-    return Response({
-        'user_stats': {
-            'total_users': total_users,
-            'active_users': active_users,
-            'new_users_week': new_users_week,
-            'avg_balance': float(avg_balance)
-        },
-        'trading_stats': {
-            'total_transactions': total_transactions,
-            'total_volume': float(total_volume),
-            'recent_transactions': recent_transactions
-        },
-        'gamification_stats': {
-            'total_badges': total_badges,
-            'total_missions': total_missions,
-            'active_missions': active_missions,
-            'recent_badges': recent_badges
-        },
-        'top_performers': {
-            'top_traders': [
-                {
-                    'username': profile.user.username,
-                    'trading_score': float(profile.trading_score),
-                    'level': profile.level
-                } for profile in top_traders
-            ],
-            'top_levels': [
-                {
-                    'username': profile.user.username,
-                    'level': profile.level,
-                    'xp': profile.xp
-                } for profile in top_levels
-            ]
-        }
-    })
+    return Response(admin_metrics.dashboard(admin_metrics.get_snapshot()))
 
 @api_view(['POST'])
 @permission_classes([IsAdminUser])
@@ -733,6 +475,7 @@ def bulk_user_operations(request):
         return Response({'error': 'Invalid operation'}, 
                        status=status.HTTP_400_BAD_REQUEST)
     
+    summary_cache.invalidate(*users.values_list('id', flat=True))
     return Response({
         'message': f'Successfully performed {operation} on {affected_count} users',
         'affected_count': affected_count
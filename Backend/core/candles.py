@@ -0,0 +1,99 @@
+"""
+Agrégation incrémentale des ticks de prix en bougies OHLCV (1m, 5m, 1h, 1d).
+"""
+
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import transaction
+from django.db.models import Q
+
+from .models import PriceCandle
+
+INTERVAL_SECONDS = {
+    '1m': 60,
+    '5m': 5 * 60,
+    '1h': 60 * 60,
+    '1d': 24 * 60 * 60,
+}
+
+
+def bucket_start(timestamp, interval):
+    """Début (UTC) de l'intervalle contenant le timestamp"""
+    epoch = int(timestamp.timestamp())
+    return datetime.fromtimestamp(epoch - epoch % INTERVAL_SECONDS[interval], tz=dt_timezone.utc)
+
+
+def aggregate_ticks(rows):
+    """Regroupe des ticks (stock_id, timestamp, price, volume) triés par date en bougies"""
+    buckets = {}
+    for stock_id, timestamp, price, volume in rows:
+        for interval in INTERVAL_SECONDS:
+            key = (stock_id, interval, bucket_start(timestamp, interval))
+            candle = buckets.get(key)
+            if candle is None:
+                buckets[key] = {'open': price, 'high': price, 'low': price, 'close': price, 'volume': volume}
+            else:
+                candle['high'] = max(candle['high'], price)
+                candle['low'] = min(candle['low'], price)
+                candle['close'] = price
+                candle['volume'] += volume
+    return buckets
+
+
+def _locked_candles(bucket_filter, stock_ids):
+    candles = PriceCandle.objects.select_for_update().filter(bucket_filter, stock_id__in=stock_ids)
+    return {(candle.stock_id, candle.interval, candle.bucket_start): candle for candle in candles}
+
+
+def _empty_candle(key, price):
+    stock_id, interval, start = key
+    return PriceCandle(
+        stock_id=stock_id, interval=interval, bucket_start=start,
+        open=price, high=price, low=price, close=price, volume=0,
+    )
+
+
+def record_ticks(rows, replace=False):
+    """Fusionne des ticks dans les bougies existantes en un nombre constant de requêtes.
+
+    Par défaut les ticks sont supposés plus récents que les bougies existantes (clôture
+    écrasée, extrêmes fusionnés). Avec replace=True, OHLC est recalculé à partir des seuls
+    ticks fournis (reconstruction d'intervalles complets) et le volume existant est conservé.
+    """
+    buckets = aggregate_ticks(rows)
+    if not buckets:
+        return 0
+
+    stock_ids = {stock_id for stock_id, _, _ in buckets}
+    starts_by_interval = {}
+    for _, interval, start in buckets:
+        starts_by_interval.setdefault(interval, set()).add(start)
+    bucket_filter = Q()
+    for interval, starts in starts_by_interval.items():
+        bucket_filter |= Q(interval=interval, bucket_start__in=starts)
+
+    with transaction.atomic():
+        existing = _locked_candles(bucket_filter, stock_ids)
+        missing = [key for key in buckets if key not in existing]
+        if missing:
+            # Bougies manquantes insérées à vide (ignorées si un autre processus vient de les
+            # créer), puis relues sous verrou: toutes passent par la même fusion
+            PriceCandle.objects.bulk_create(
+                [_empty_candle(key, buckets[key]['open']) for key in missing], ignore_conflicts=True
+            )
+            existing = _locked_candles(bucket_filter, stock_ids)
+        to_update = []
+        for key, values in buckets.items():
+            candle = existing[key]
+            if replace:
+                candle.open = values['open']
+                candle.high = values['high']
+                candle.low = values['low']
+            else:
+                candle.high = max(candle.high, values['high'])
+                candle.low = min(candle.low, values['low'])
+            candle.close = values['close']
+            candle.volume += values['volume']
+            to_update.append(candle)
+        PriceCandle.objects.bulk_update(to_update, ['open', 'high', 'low', 'close', 'volume'])
+    return len(buckets)
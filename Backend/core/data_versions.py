@@ -0,0 +1,107 @@
+"""
+Versions des données servies en lecture, pour les GET conditionnels (ETag / Last-Modified).
+
+La version du marché change à chaque écriture de prix; celle d'un utilisateur à chaque
+modification de son profil, portefeuille, transactions, missions ou gamification. Une
+version est l'horodatage (ns) de la dernière modification: elle croît, sert directement
+de Last-Modified et ne revient jamais à une valeur passée si le cache est vidé.
+Une vue calcule son ETag à partir d'une seule lecture groupée du cache, avant toute
+requête ou sérialisation, et répond 304 si le client a déjà cette version.
+"""
+
+import hashlib
+import time
+from functools import wraps
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.request import Request
+
+MARKET_KEY = 'versions:market'
+USER_KEY = 'versions:user:{}'
+# Changée pour invalider les versions de tous les utilisateurs (diffusion, reconstruction)
+USERS_GENERATION_KEY = 'versions:users'
+
+
+def bump_market():
+    """À appeler après chaque écriture de prix (après le commit); retourne la nouvelle version"""
+    version = time.time_ns()
+    cache.set(MARKET_KEY, version, None)
+    return version
+
+
+def bump_users(*user_ids):
+    now = time.time_ns()
+    cache.set_many({USER_KEY.format(user_id): now for user_id in user_ids}, None)
+
+
+def bump_all_users():
+    cache.set(USERS_GENERATION_KEY, time.time_ns(), None)
+
+
+def current_versions(user=None):
+    """Versions dont dépend une réponse: marché, et utilisateur si fourni (une lecture)"""
+    keys = [MARKET_KEY]
+    if user is not None:
+        keys += [USER_KEY.format(user.id), USERS_GENERATION_KEY]
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        # Inconnue (premier accès ou cache vidé): partir de maintenant
+        now = time.time_ns()
+        for key in missing:
+            cache.add(key, now, None)
+        found.update(cache.get_many(missing))
+    return [found[key] for key in keys]
+
+
+def conditional_get(per_user=False):
+    """Décorateur de vue DRF (sous @api_view ou sur une méthode de ViewSet).
+
+    Calcule l'ETag à partir du chemin complet et des versions, répond 304 si
+    If-None-Match / If-Modified-Since correspondent, sinon ajoute ETag et Last-Modified.
+    Les versions lues sont exposées à la vue dans `request.data_versions` (marché en premier).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # Fonction vue: (request, ...); méthode de ViewSet: (self, request, ...)
+            request = next(arg for arg in args[:2] if isinstance(arg, Request))
+            if request.method not in ('GET', 'HEAD'):
+                return view(*args, **kwargs)
+            user = request.user if per_user else None
+            if user is not None and not user.is_authenticated:
+                return view(*args, **kwargs)
+
+            versions = request.data_versions = current_versions(user)
+            key = f'{request.get_full_path()}|{user.id if user else ""}|{"-".join(map(str, versions))}'
+            etag = f'"{hashlib.md5(key.encode()).hexdigest()}"'
+            last_modified = max(versions) // 1_000_000_000
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = view(*args, **kwargs)
+            if response.status_code in (200, 304):
+                response['ETag'] = etag
+                response['Last-Modified'] = http_date(last_modified)
+                response['Cache-Control'] = 'private, no-cache' if per_user else 'no-cache'
+            return response
+        return wrapper
+    return decorator
+
+
+class MarketWriteMixin:
+    """ViewSet qui modifie des titres: la version du marché change après chaque écriture"""
+
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        transaction.on_commit(bump_market)
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        transaction.on_commit(bump_market)
+
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        transaction.on_commit(bump_market)
@@ -0,0 +1,74 @@
+"""
+File d'attente durable (outbox) pour la gamification: les trades enregistrent un
+événement dans la même transaction, le worker (run_gamification_worker) les traite.
+"""
+
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import GamificationEvent
+
+MAX_ATTEMPTS = 3
+# Un événement réservé depuis plus longtemps est considéré abandonné (worker arrêté)
+CLAIM_TIMEOUT = timedelta(minutes=5)
+
+
+def enqueue(user, event_type='TRADE', payload=None):
+    """Ajoute un événement à traiter; à appeler dans la transaction qui le produit"""
+    return GamificationEvent.objects.create(user=user, event_type=event_type, payload=payload or {})
+
+
+def claim_batch(limit=100):
+    """Réserve jusqu'à `limit` événements en attente pour ce worker"""
+    now = timezone.now()
+    claimable = Q(status='PENDING') | Q(status='PROCESSING', claimed_at__lt=now - CLAIM_TIMEOUT)
+    with transaction.atomic():
+        ids = list(
+            GamificationEvent.objects.select_for_update(skip_locked=True)
+            .filter(claimable)
+            .order_by('id')
+            .values_list('id', flat=True)[:limit]
+        )
+        GamificationEvent.objects.filter(id__in=ids).update(
+            status='PROCESSING', claimed_at=now, attempts=F('attempts') + 1
+        )
+    return list(GamificationEvent.objects.filter(id__in=ids).select_related('user'))
+
+
+def process_events(events):
+    """Traite les événements réservés; un seul passage du moteur par utilisateur"""
+    from gamification_engine import process_post_transaction_gamification
+
+    by_user = {}
+    for event in events:
+        by_user.setdefault(event.user_id, []).append(event)
+
+    processed = failed = 0
+    for user_events in by_user.values():
+        ids = [event.id for event in user_events]
+        try:
+            result = process_post_transaction_gamification(user_events[0].user)
+        except Exception as e:
+            retry = [event.id for event in user_events if event.attempts < MAX_ATTEMPTS]
+            GamificationEvent.objects.filter(id__in=retry).update(status='PENDING', error=str(e))
+            GamificationEvent.objects.filter(id__in=ids).exclude(id__in=retry).update(
+                status='FAILED', error=str(e), processed_at=timezone.now()
+            )
+            failed += len(ids)
+            continue
+        GamificationEvent.objects.filter(id__in=ids).update(
+            status='DONE', result=result, error='', processed_at=timezone.now()
+        )
+        processed += len(ids)
+    return processed, failed
+
+
+def process_pending(limit=100):
+    """Réserve et traite un lot; retourne (traités, en échec)"""
+    events = claim_batch(limit)
+    if not events:
+        return 0, 0
+    return process_events(events)
@@ -0,0 +1,127 @@
+"""
+Reconstruction des classements: chaque type est calculé et classé par la base
+(RANK() OVER (ORDER BY score DESC)) puis écrit en un seul bulk_create.
+"""
+
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import (
+    Case, DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value, When, Window,
+)
+from django.db.models.functions import Cast, Coalesce, Rank
+from django.utils import timezone
+
+from .models import DailyTradingStats, Leaderboard, Portfolio, UserProfile
+
+SCORE = DecimalField(max_digits=20, decimal_places=2)
+ZERO = Value(Decimal('0'), output_field=SCORE)
+CENT = Decimal('0.01')
+BATCH_SIZE = 1000
+
+
+def week_bounds(day=None):
+    """(début, fin) de la semaine contenant `day`, comme datetimes"""
+    day = day or timezone.now().date()
+    week_start = day - timedelta(days=day.weekday())
+    week_end = week_start + timedelta(days=6)
+    return (
+        timezone.make_aware(datetime.combine(week_start, datetime.min.time())),
+        timezone.make_aware(datetime.combine(week_end, datetime.max.time())),
+    )
+
+
+def _volume_score(period_start, period_end):
+    """Montant échangé par l'utilisateur sur la période (jours entiers, lu dans le cumul quotidien)"""
+    days = (timezone.localdate(period_start), timezone.localdate(period_end))
+    volume = (
+        DailyTradingStats.objects.filter(user=OuterRef('user'), day__range=days)
+        .order_by()
+        .values('user')
+        .annotate(total=Sum('notional'))
+        .values('total')
+    )
+    return Coalesce(Subquery(volume, output_field=SCORE), ZERO)
+
+
+def _portfolio_value_score():
+    """Liquidités + valeur de marché des positions"""
+    holdings = (
+        Portfolio.objects.filter(user=OuterRef('user'))
+        .order_by()
+        .values('user')
+        .annotate(total=Sum(F('quantity') * F('stock__current_price'), output_field=SCORE))
+        .values('total')
+    )
+    return ExpressionWrapper(F('balance') + Coalesce(Subquery(holdings, output_field=SCORE), ZERO), output_field=SCORE)
+
+
+def score_expression(leaderboard_type, period_start, period_end):
+    """Expression SQL du score d'un profil pour un type de classement"""
+    if leaderboard_type == 'XP':
+        return Cast('xp', SCORE)
+    if leaderboard_type == 'PROFIT':
+        return Cast('total_profit_loss', SCORE)
+    if leaderboard_type == 'TRADES':
+        return Cast('total_trades', SCORE)
+    if leaderboard_type == 'WIN_RATE':
+        return Case(
+            When(total_trades=0, then=ZERO),
+            default=ExpressionWrapper(
+                Cast('successful_trades', SCORE) * 100 / Cast('total_trades', SCORE), output_field=SCORE
+            ),
+            output_field=SCORE,
+        )
+    if leaderboard_type == 'VOLUME':
+        return _volume_score(period_start, period_end)
+    if leaderboard_type == 'PORTFOLIO_VALUE':
+        return _portfolio_value_score()
+    raise ValueError(f'Unknown leaderboard type: {leaderboard_type}')
+
+
+def ranked_scores(leaderboard_type, period_start, period_end):
+    """Lignes (user_id, score, rank) de tous les utilisateurs actifs, classées par la base"""
+    return (
+        UserProfile.objects.filter(user__is_active=True)
+        .annotate(score=score_expression(leaderboard_type, period_start, period_end))
+        .annotate(rank=Window(expression=Rank(), order_by=F('score').desc()))
+        .order_by('rank', 'user_id')
+        .values_list('user_id', 'score', 'rank')
+    )
+
+
+def with_profiles(queryset):
+    """Lignes de classement avec utilisateur et profil (dont badge_count) chargés dans la même requête"""
+    return queryset.select_related('user__userprofile')
+
+
+def build_leaderboard(leaderboard_type, period_start, period_end):
+    """Remplace le classement d'un type pour la période; retourne le nombre de lignes"""
+    rows = [
+        Leaderboard(
+            user_id=user_id,
+            leaderboard_type=leaderboard_type,
+            score=Decimal(score or 0).quantize(CENT),
+            rank=rank,
+            period_start=period_start,
+            period_end=period_end,
+        )
+        for user_id, score, rank in ranked_scores(leaderboard_type, period_start, period_end).iterator(
+            chunk_size=BATCH_SIZE
+        )
+    ]
+    with transaction.atomic():
+        Leaderboard.objects.filter(leaderboard_type=leaderboard_type, period_start=period_start).delete()
+        Leaderboard.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+    return len(rows)
+
+
+def build_all_leaderboards(day=None, types=None):
+    """Reconstruit tous les classements de la semaine; retourne {type: lignes}"""
+    period_start, period_end = week_bounds(day)
+    types = types or [choice for choice, _ in Leaderboard.LEADERBOARD_TYPES]
+    return {
+        leaderboard_type: build_leaderboard(leaderboard_type, period_start, period_end)
+        for leaderboard_type in types
+    }
@@ -0,0 +1,227 @@
+"""
+Classements en direct: un tableau trié (bisect) par type et par semaine, mis à jour
+à chaque trade ou gain d'XP, avec sauvegarde périodique dans la table Leaderboard.
+
+L'état est propre à chaque processus: au démarrage il est rechargé depuis le dernier
+checkpoint (ou recalculé par la base s'il n'y en a pas). Les scores étant absolus, la
+prochaine mise à jour d'un utilisateur corrige un éventuel écart entre processus.
+"""
+
+import threading
+import time
+from bisect import bisect_left, insort
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+from . import leaderboards, trading_stats
+from .models import Leaderboard
+
+# PORTFOLIO_VALUE varie à chaque tick de marché: il reste servi par la reconstruction complète
+LIVE_TYPES = ('XP', 'PROFIT', 'TRADES', 'WIN_RATE', 'VOLUME')
+
+
+class RankedBoard:
+    """Scores triés par (-score, user_id): rang et top-K par recherche dichotomique"""
+
+    def __init__(self, scores=()):
+        self.scores = dict(scores)
+        self.keys = sorted((-score, user_id) for user_id, score in self.scores.items())
+
+    def __len__(self):
+        return len(self.keys)
+
+    def set(self, user_id, score):
+        old = self.scores.get(user_id)
+        if old == score:
+            return
+        if old is not None:
+            del self.keys[bisect_left(self.keys, (-old, user_id))]
+        self.scores[user_id] = score
+        insort(self.keys, (-score, user_id))
+
+    def add(self, user_id, amount):
+        self.set(user_id, self.scores.get(user_id, Decimal('0')) + amount)
+
+    def rank(self, user_id):
+        """Rang de l'utilisateur (ex aequo au même rang, comme RANK()), None s'il est absent"""
+        score = self.scores.get(user_id)
+        if score is None:
+            return None
+        # Premier indice ayant ce score = nombre de scores strictement supérieurs
+        return bisect_left(self.keys, (-score,)) + 1
+
+    def top(self, limit=10):
+        """[(rang, user_id, score)] des `limit` premiers"""
+        entries = []
+        for index, (negative_score, user_id) in enumerate(self.keys[:limit]):
+            if entries and entries[-1][2] == -negative_score:
+                rank = entries[-1][0]
+            else:
+                rank = index + 1
+            entries.append((rank, user_id, -negative_score))
+        return entries
+
+    def ranked(self):
+        """Toutes les lignes (user_id, score, rang)"""
+        return [(user_id, score, rank) for rank, user_id, score in self.top(len(self.keys))]
+
+
+def win_rate(total_trades, successful_trades):
+    if not total_trades:
+        return Decimal('0')
+    return (Decimal(successful_trades) * 100 / Decimal(total_trades)).quantize(leaderboards.CENT)
+
+
+class LiveLeaderboards:
+    """Classements de la semaine en cours pour les types de LIVE_TYPES"""
+
+    def __init__(self, checkpoint_interval=None):
+        self.checkpoint_interval = (
+            settings.LEADERBOARD_CHECKPOINT_INTERVAL if checkpoint_interval is None else checkpoint_interval
+        )
+        self.lock = threading.RLock()
+        self.period = None
+        self.boards = {}
+        self.last_checkpoint = time.monotonic()
+        self.checkpointing = False
+
+    # Chargement
+
+    def load(self):
+        """(Re)charge la semaine en cours depuis le checkpoint, ou depuis la base sans checkpoint"""
+        period_start, period_end = leaderboards.week_bounds()
+        rows = {}
+        for leaderboard_type, user_id, score in Leaderboard.objects.filter(
+            period_start=period_start, leaderboard_type__in=LIVE_TYPES
+        ).values_list('leaderboard_type', 'user_id', 'score').iterator(chunk_size=leaderboards.BATCH_SIZE):
+            rows.setdefault(leaderboard_type, []).append((user_id, score))
+
+        boards = {}
+        for leaderboard_type in LIVE_TYPES:
+            scores = rows.get(leaderboard_type)
+            if scores is None:
+                scores = [
+                    (user_id, Decimal(score or 0).quantize(leaderboards.CENT))
+                    for user_id, score, _ in leaderboards.ranked_scores(leaderboard_type, period_start, period_end)
+                ]
+            boards[leaderboard_type] = RankedBoard(scores)
+
+        with self.lock:
+            self.period = (period_start, period_end)
+            self.boards = boards
+            self.last_checkpoint = time.monotonic()
+
+    def is_loaded(self):
+        return self.period is not None
+
+    def _current_boards(self):
+        """Tableaux de la semaine en cours, rechargés au changement de semaine"""
+        if self.period is None or self.period[0] != leaderboards.week_bounds()[0]:
+            self.load()
+        return self.boards
+
+    # Mises à jour
+
+    def update_profile(self, user_id, xp=None, total_profit_loss=None, total_trades=None, successful_trades=None):
+        """Applique les nouvelles valeurs du profil (ignoré tant que rien n'est chargé)"""
+        if not self.is_loaded():
+            return
+        with self.lock:
+            boards = self._current_boards()
+            if xp is not None:
+                boards['XP'].set(user_id, Decimal(xp))
+            if total_profit_loss is not None:
+                boards['PROFIT'].set(user_id, Decimal(total_profit_loss))
+            if total_trades is not None:
+                boards['TRADES'].set(user_id, Decimal(total_trades))
+                boards['WIN_RATE'].set(user_id, win_rate(total_trades, successful_trades or 0))
+        self.maybe_checkpoint()
+
+    def record_trade(self, user_id, **profile):
+        """Trade exécuté (après le commit): volume de la semaine et valeurs du profil"""
+        if not self.is_loaded():
+            return
+        with self.lock:
+            self._current_boards()
+            period_start, period_end = self.period
+        # Volume absolu lu dans le cumul quotidien, comme les autres scores: les processus
+        # et les checkpoints convergent au lieu de cumuler chacun une somme partielle
+        volume = trading_stats.user_totals(
+            user_id, timezone.localdate(period_start), timezone.localdate(period_end)
+        )['notional']
+        with self.lock:
+            if self.period[0] == period_start:
+                self.boards['VOLUME'].set(user_id, Decimal(volume).quantize(leaderboards.CENT))
+        self.update_profile(user_id, **profile)
+
+    # Lecture
+
+    def top(self, leaderboard_type, limit=10):
+        with self.lock:
+            return self._current_boards()[leaderboard_type].top(limit)
+
+    def rank_of(self, leaderboard_type, user_id):
+        """(rang, score) de l'utilisateur, (None, None) s'il n'est pas classé"""
+        with self.lock:
+            board = self._current_boards()[leaderboard_type]
+            return board.rank(user_id), board.scores.get(user_id)
+
+    # Sauvegarde
+
+    def checkpoint(self):
+        """Écrit les classements en mémoire dans la table Leaderboard"""
+        with self.lock:
+            if self.period is None:
+                return 0
+            period_start, period_end = self.period
+            rows = [
+                Leaderboard(
+                    user_id=user_id, leaderboard_type=leaderboard_type, score=score, rank=rank,
+                    period_start=period_start, period_end=period_end,
+                )
+                for leaderboard_type, board in self.boards.items()
+                for user_id, score, rank in board.ranked()
+            ]
+            self.last_checkpoint = time.monotonic()
+        with transaction.atomic():
+            Leaderboard.objects.bulk_create(
+                rows,
+                batch_size=leaderboards.BATCH_SIZE,
+                update_conflicts=True,
+                unique_fields=['user', 'leaderboard_type', 'period_start'],
+                update_fields=['score', 'rank', 'period_end', 'updated_at'],
+            )
+        return len(rows)
+
+    def maybe_checkpoint(self):
+        """Lance un checkpoint en arrière-plan si l'intervalle est écoulé"""
+        with self.lock:
+            due = time.monotonic() - self.last_checkpoint >= self.checkpoint_interval
+            if not due or self.checkpointing:
+                return
+            self.checkpointing = True
+        threading.Thread(target=self._background_checkpoint, daemon=True).start()
+
+    def _background_checkpoint(self):
+        try:
+            self.checkpoint()
+        finally:
+            self.checkpointing = False
+            connections.close_all()
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_service():
+    """Instance partagée du processus"""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = LiveLeaderboards()
+    return _service
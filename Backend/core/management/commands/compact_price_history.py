@@ -0,0 +1,63 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.candles import bucket_start, record_ticks
+from core.models import Stock, StockPriceHistory
+
+
+class Command(BaseCommand):
+    help = 'Roll raw price ticks older than N days into candles and delete them in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help='Keep raw ticks for this many days')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows deleted per DELETE statement')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be compacted')
+
+    def handle(self, *args, **options):
+        if options['days'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--days and --batch-size must be positive')
+
+        # Aligné sur un début de journée: chaque bougie reconstruite est complète
+        cutoff = bucket_start(timezone.now() - timedelta(days=options['days']), '1d')
+        total_rows = 0
+
+        for stock in Stock.objects.only('id', 'symbol'):
+            old_ticks = StockPriceHistory.objects.filter(stock=stock, timestamp__lt=cutoff)
+            if options['dry_run']:
+                count = old_ticks.count()
+                total_rows += count
+                self.stdout.write(f'{stock.symbol}: {count} tick(s) before {cutoff:%Y-%m-%d}')
+                continue
+
+            total_rows += self.rollup(stock, old_ticks)
+            self.delete_in_batches(old_ticks, options['batch_size'])
+
+        verb = 'Would compact' if options['dry_run'] else 'Compacted'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {total_rows} tick(s) older than {cutoff:%Y-%m-%d}'))
+
+    def rollup(self, stock, old_ticks):
+        """Fusionne les ticks bruts jour par jour dans les bougies: les extrêmes et le volume
+        déjà écrits par les trades sont conservés"""
+        rows = old_ticks.order_by('timestamp').values_list('timestamp', 'price').iterator(chunk_size=2000)
+        day, day_rows, count = None, [], 0
+        for timestamp, price in rows:
+            tick_day = bucket_start(timestamp, '1d')
+            if day_rows and tick_day != day:
+                record_ticks(day_rows)
+                day_rows = []
+            day = tick_day
+            day_rows.append((stock.id, timestamp, price, 0))
+            count += 1
+        if day_rows:
+            record_ticks(day_rows)
+        return count
+
+    def delete_in_batches(self, queryset, batch_size):
+        """Supprime par lots de clés primaires pour limiter la durée des verrous"""
+        while True:
+            ids = list(queryset.order_by('timestamp').values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                break
+            StockPriceHistory.objects.filter(pk__in=ids).delete()
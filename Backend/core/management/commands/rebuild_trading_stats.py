@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import summary_cache, trading_stats
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily trading statistics rollup from the transaction log'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=trading_stats.BATCH_SIZE,
+                            help='Transactions read and rows written per batch')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive')
+
+        started = time.monotonic()
+        rows = trading_stats.rebuild(batch_size=options['batch_size'])
+        # Les statistiques hebdomadaires des résumés sont lues dans le cumul
+        summary_cache.invalidate_all()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {rows} daily trading stats rows in {time.monotonic() - started:.2f}s'
+        ))
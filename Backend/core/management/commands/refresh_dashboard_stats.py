@@ -0,0 +1,37 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import admin_metrics
+
+
+class Command(BaseCommand):
+    help = 'Refresh the admin dashboard statistics snapshot (once, or every --interval seconds)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0,
+                            help=f'Seconds between refreshes (0 = refresh once; '
+                                 f'suggested: {settings.ADMIN_STATS_REFRESH_INTERVAL})')
+        parser.add_argument('--full', action='store_true',
+                            help='Rebuild the daily trading rollup first (after deleting transactions)')
+
+    def handle(self, *args, **options):
+        if options['interval'] < 0:
+            raise CommandError('--interval must not be negative')
+
+        full = options['full']
+        try:
+            while True:
+                started = time.monotonic()
+                snapshot = admin_metrics.refresh(full=full)
+                full = False
+                self.stdout.write(
+                    f'Dashboard stats refreshed in {time.monotonic() - started:.2f}s '
+                    f'({snapshot.total_transactions} transactions)'
+                )
+                if not options['interval']:
+                    break
+                time.sleep(max(0.0, options['interval'] - (time.monotonic() - started)))
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping...')
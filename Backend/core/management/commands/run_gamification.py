@@ -0,0 +1,142 @@
+import os
+import time
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core.models import Transaction
+
+CHECKPOINT_KEY = 'gamification:run:checkpoint'
+
+
+def _init_worker():
+    """Chaque worker ouvre ses propres connexions (celles héritées du parent sont fermées)"""
+    connections.close_all()
+
+
+def _process_chunk(user_ids):
+    from gamification_engine import process_users_chunk
+
+    return process_users_chunk(user_ids)
+
+
+class Command(BaseCommand):
+    help = 'Re-evaluate badges, achievements and levels for all (or recently active) users in parallel'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help='Users per chunk sent to a worker')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Worker processes (1 = run in this process)')
+        parser.add_argument('--since', help='Only users active since this ISO datetime')
+        parser.add_argument('--incremental', action='store_true',
+                            help='Only users active since the last successful run (stored checkpoint)')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1 or options['workers'] < 1:
+            raise CommandError('--chunk-size and --workers must be positive')
+
+        since = None
+        if options['since']:
+            since = parse_datetime(options['since'])
+            if since is None:
+                raise CommandError(f"Invalid --since datetime: {options['since']}")
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+        elif options['incremental']:
+            since = cache.get(CHECKPOINT_KEY)
+
+        started_at = timezone.now()
+        users = User.objects.all()
+        if since is not None:
+            users = users.filter(
+                Q(id__in=Transaction.objects.filter(timestamp__gte=since).values('user_id'))
+                | Q(last_login__gte=since)
+            )
+            self.stdout.write(f'Users active since {since.isoformat()}')
+
+        self.totals = {'processed': 0, 'badges_awarded': 0, 'achievements_awarded': 0, 'level_ups': 0}
+        self.failed_users = 0
+        self.failed_chunks = 0
+        self.clock = time.monotonic()
+
+        chunks = self.chunked(users, options['chunk_size'])
+        if options['workers'] == 1:
+            for chunk in chunks:
+                try:
+                    self.report(chunk, _process_chunk(chunk), None)
+                except Exception as e:
+                    self.report(chunk, None, e)
+        else:
+            self.run_pool(chunks, options['workers'])
+
+        elapsed = time.monotonic() - self.clock
+        self.stdout.write(
+            f"{self.totals['processed']} user(s) in {elapsed:.1f}s "
+            f"({self.totals['processed'] / elapsed if elapsed else 0:.0f} users/s): "
+            f"{self.totals['badges_awarded']} badge(s), {self.totals['achievements_awarded']} achievement(s), "
+            f"{self.totals['level_ups']} level up(s)"
+        )
+
+        if self.failed_users or self.failed_chunks:
+            raise CommandError(
+                f'{self.failed_users} user(s) and {self.failed_chunks} chunk(s) failed; checkpoint not advanced'
+            )
+        # Le prochain --incremental reprend à partir du début de cette exécution
+        cache.set(CHECKPOINT_KEY, started_at, None)
+        self.stdout.write(self.style.SUCCESS(f'Checkpoint set to {started_at.isoformat()}'))
+
+    def chunked(self, users, size):
+        """Lots d'identifiants lus page par page (id > dernier id).
+
+        Chaque page est lue entièrement: aucun curseur ne reste ouvert pendant que les
+        workers écrivent (sous SQLite, un curseur ouvert bloquerait leurs commits).
+        """
+        last_id = 0
+        while True:
+            chunk = list(users.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:size])
+            if not chunk:
+                return
+            yield chunk
+            last_id = chunk[-1]
+
+    def run_pool(self, chunks, workers):
+        """Garde au plus 2 lots en vol par worker pour ne pas matérialiser toute la liste"""
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            pending = {}
+            for chunk in chunks:
+                pending[pool.submit(_process_chunk, chunk)] = chunk
+                if len(pending) >= workers * 2:
+                    self.collect(pending, FIRST_COMPLETED)
+            self.collect(pending, ALL_COMPLETED)
+
+    def collect(self, pending, return_when):
+        done, _ = wait(pending, return_when=return_when)
+        for future in done:
+            chunk = pending.pop(future)
+            error = future.exception()
+            self.report(chunk, None if error else future.result(), error)
+
+    def report(self, chunk, summary, error):
+        label = f'users {chunk[0]}-{chunk[-1]}'
+        if error is not None:
+            self.failed_chunks += 1
+            self.stderr.write(f'Chunk {label} failed: {error}')
+            return
+        for key in self.totals:
+            self.totals[key] += summary[key]
+        if summary['errors']:
+            self.failed_users += len(summary['errors'])
+            user_id, message = summary['errors'][0]
+            self.stderr.write(f"Chunk {label}: {len(summary['errors'])} user(s) failed (user {user_id}: {message})")
+
+        elapsed = time.monotonic() - self.clock
+        self.stdout.write(
+            f"Processed {self.totals['processed']} user(s) "
+            f"({self.totals['processed'] / elapsed if elapsed else 0:.0f} users/s)"
+        )
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import gamification_queue
+
+
+class Command(BaseCommand):
+    help = 'Consume pending gamification events (trades) from the outbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Events claimed per batch')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Drain the queue once and exit')
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS('Gamification worker started'))
+        total = 0
+        try:
+            while True:
+                processed, failed = gamification_queue.process_pending(options['batch_size'])
+                total += processed
+                if failed:
+                    self.stderr.write(f'{failed} event(s) failed')
+                if processed and options['verbosity'] > 1:
+                    self.stdout.write(f'Processed {processed} event(s)')
+                if not processed and not failed:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping worker...')
+
+        self.stdout.write(self.style.SUCCESS(f'Worker stopped after {total} event(s)'))
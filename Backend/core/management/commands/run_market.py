@@ -0,0 +1,51 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.market_engine import MarketTicker
+from core import price_models
+
+
+class Command(BaseCommand):
+    help = 'Run the background market tick loop and publish price snapshots to the cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=settings.MARKET_TICK_INTERVAL,
+                            help='Seconds between ticks')
+        parser.add_argument('--model', default=settings.MARKET_TICK_MODEL,
+                            choices=sorted(price_models.PRICE_MODELS), help='Price model')
+        parser.add_argument('--flush-every', type=int, default=settings.MARKET_FLUSH_EVERY,
+                            help='Number of ticks buffered before writing to the database')
+        parser.add_argument('--seed', type=int, default=None, help='Seed for reproducible runs')
+        parser.add_argument('--ticks', type=int, default=0, help='Stop after N ticks (0 = run forever)')
+
+    def handle(self, *args, **options):
+        if options['interval'] <= 0:
+            raise CommandError('--interval must be positive')
+
+        ticker = MarketTicker(
+            model=options['model'],
+            flush_every=options['flush_every'],
+            rng=price_models.make_rng(options['seed']),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Market running: {len(ticker.stocks)} stocks, model={options['model']}, "
+            f"every {options['interval']}s, flush every {ticker.flush_every} tick(s)"
+        ))
+
+        count = 0
+        try:
+            while not options['ticks'] or count < options['ticks']:
+                started = time.monotonic()
+                snapshot = ticker.tick()
+                count += 1
+                if snapshot and options['verbosity'] > 1:
+                    self.stdout.write(f"Tick #{snapshot['sequence']} ({len(snapshot['prices'])} stocks)")
+                time.sleep(max(0.0, options['interval'] - (time.monotonic() - started)))
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping market...')
+        finally:
+            ticker.flush()
+
+        self.stdout.write(self.style.SUCCESS(f'Market stopped after {count} tick(s)'))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from core.models import UserBadge, UserProfile
+
+
+class Command(BaseCommand):
+    help = 'Recompute UserProfile.badge_count from UserBadge rows (backfill or repair drift)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report profiles whose count is wrong')
+
+    def handle(self, *args, **options):
+        counts = (
+            UserBadge.objects.filter(user=OuterRef('user'))
+            .order_by()
+            .values('user')
+            .annotate(total=Count('id'))
+            .values('total')
+        )
+        actual = Coalesce(Subquery(counts), 0)
+        drifted = UserProfile.objects.annotate(actual_badge_count=actual).filter(
+            ~Q(badge_count=actual)
+        )
+
+        if options['dry_run']:
+            for profile in drifted.select_related('user'):
+                self.stdout.write(
+                    f'{profile.user.username}: {profile.badge_count} -> {profile.actual_badge_count}'
+                )
+            self.stdout.write(self.style.SUCCESS(f'{drifted.count()} profile(s) out of sync'))
+            return
+
+        fixed = UserProfile.objects.filter(pk__in=drifted.values('pk')).update(badge_count=actual)
+        self.stdout.write(self.style.SUCCESS(f'Repaired badge_count on {fixed} profile(s)'))
@@ -0,0 +1,196 @@
+"""
+Moteur de ticks de marché: calcule tous les nouveaux prix en une passe vectorisée
+et les persiste avec un nombre constant de requêtes, quel que soit le nombre de titres.
+"""
+
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Stock, StockPriceHistory
+from . import candles, data_versions, price_models, sequences, stock_cache
+
+SNAPSHOT_KEY = 'market:snapshot'
+# Derniers deltas par tick (MARKET_STREAM_BUFFER entrées)
+TICKS_KEY = 'market:ticks'
+SEQUENCE_CHANNEL = 'market'
+
+
+def simulate_market(stocks, model='uniform', steps=1, dt=price_models.TRADING_MINUTE, rng=None, **params):
+    """Génère une matrice (steps, n) de prix pour la liste de stocks"""
+    prices = np.array([float(stock.current_price) for stock in stocks])
+    drift = np.array([float(stock.drift) for stock in stocks])
+    volatility = np.array([float(stock.volatility) for stock in stocks])
+    price_model = price_models.get_model(model, **params)
+    return price_model.simulate(prices, steps, dt, rng, drift=drift, volatility=volatility)
+
+
+def persist_ticks(stocks, ticks, publish=True, last_prices=None):
+    """Écrit une série de ticks [(timestamp, prix)]: un bulk_update des stocks
+    avec les derniers prix et un bulk_create de tout l'historique.
+
+    `last_prices`: derniers prix écrits en base, si current_price porte déjà des prix
+    non persistés (MarketTicker); previous_price est alors calculé à partir d'eux.
+    """
+    if last_prices is not None:
+        for stock, price in zip(stocks, last_prices):
+            stock.current_price = price
+    history = []
+    for timestamp, prices in ticks:
+        for stock, price in zip(stocks, prices):
+            stock.previous_price = stock.current_price
+            stock.current_price = Decimal(f'{price:.2f}')
+            stock.last_updated = timestamp
+            history.append(StockPriceHistory(stock=stock, price=stock.current_price, timestamp=timestamp))
+
+    with transaction.atomic():
+        # bulk_update ne déclenche pas auto_now: last_updated est fixé explicitement
+        Stock.objects.bulk_update(stocks, ['current_price', 'previous_price', 'last_updated'])
+        StockPriceHistory.objects.bulk_create(history)
+        candles.record_ticks((row.stock_id, row.timestamp, row.price, 0) for row in history)
+        # Nouvelle version du marché: liste et cotations resérialisées une fois pour tous les clients
+        transaction.on_commit(lambda: stock_cache.populate(data_versions.bump_market()))
+        if publish:
+            transaction.on_commit(lambda: publish_snapshot(stocks))
+    return stocks
+
+
+def persist_prices(stocks, new_prices, timestamp=None):
+    """Écrit un tick unique pour la liste de stocks"""
+    return persist_ticks(stocks, [(timestamp or timezone.now(), new_prices)])
+
+
+def apply_tick(model='uniform', steps=1, queryset=None, rng=None, **params):
+    """Exécute un tick de marché sur tous les stocks (ou le queryset fourni).
+
+    Avec steps > 1, le chemin complet est simulé et seuls les prix finaux sont persistés.
+    """
+    stocks = list(queryset if queryset is not None else Stock.objects.all())
+    if not stocks:
+        return stocks
+    paths = simulate_market(stocks, model, steps, rng=rng, **params)
+    return persist_prices(stocks, paths[-1])
+
+
+def publish_snapshot(stocks, timestamp=None):
+    """Publie le dernier état des prix dans le cache partagé, avec le delta du tick
+    ajouté au tampon circulaire lu par le flux SSE (reprise par séquence)"""
+    quotes = {
+        stock.symbol: {
+            'id': stock.id,
+            'price': str(stock.current_price),
+            'volume': stock.volume,
+        }
+        for stock in stocks
+    }
+    with transaction.atomic():
+        # Séquence tirée en base: sa ligne reste verrouillée jusqu'au commit, ce qui sérialise
+        # la lecture-écriture du snapshot et du tampon entre run_market et les ticks web
+        sequence = sequences.next_value(SEQUENCE_CHANNEL)
+        values = cache.get_many([SNAPSHOT_KEY, TICKS_KEY])
+        previous = values.get(SNAPSHOT_KEY)
+        previous_prices = previous['prices'] if previous else {}
+        changes = {
+            symbol: quote['price']
+            for symbol, quote in quotes.items()
+            if previous_prices.get(symbol, {}).get('price') != quote['price']
+        }
+        snapshot = {
+            'sequence': sequence,
+            'timestamp': (timestamp or timezone.now()).isoformat(),
+            # Un tick partiel (queryset) ne met à jour que ses titres
+            'prices': {**previous_prices, **quotes},
+        }
+        ticks = values.get(TICKS_KEY, [])[-(settings.MARKET_STREAM_BUFFER - 1):]
+        ticks.append({'sequence': sequence, 'timestamp': snapshot['timestamp'], 'changes': changes})
+        cache.set_many({SNAPSHOT_KEY: snapshot, TICKS_KEY: ticks}, None)
+    return snapshot
+
+
+def get_ticks_since(sequence):
+    """Deltas publiés après `sequence`, ou None si le tampon ne remonte pas jusque-là"""
+    ticks = cache.get(TICKS_KEY, [])
+    if not ticks or ticks[0]['sequence'] > sequence + 1:
+        return None
+    return [tick for tick in ticks if tick['sequence'] > sequence]
+
+
+def get_snapshot():
+    """Dernier snapshot publié, ou None si aucun tick n'a encore eu lieu"""
+    return cache.get(SNAPSHOT_KEY)
+
+
+class MarketTicker:
+    """Boucle de ticks en mémoire avec écritures groupées.
+
+    Les prix évoluent en mémoire à chaque tick et le snapshot est publié immédiatement;
+    la base n'est écrite que tous les `flush_every` ticks.
+    """
+
+    def __init__(self, model='gbm', flush_every=1, dt=price_models.TRADING_MINUTE, rng=None, **params):
+        self.model = price_models.get_model(model, **params)
+        self.flush_every = max(1, flush_every)
+        self.dt = dt
+        self.rng = rng or price_models.make_rng()
+        self.pending = []
+        self.load()
+
+    def load(self):
+        """Recharge la liste des stocks (nouvelles cotations, prix fixés par un admin)"""
+        self.stocks = list(Stock.objects.all())
+        # Prix en base: les ticks en attente ne modifient que les objets en mémoire
+        self.persisted_prices = [stock.current_price for stock in self.stocks]
+        self.prices = np.array([float(stock.current_price) for stock in self.stocks])
+        self.drift = np.array([float(stock.drift) for stock in self.stocks])
+        self.volatility = np.array([float(stock.volatility) for stock in self.stocks])
+
+    def tick(self):
+        """Avance le marché d'un pas et publie le snapshot"""
+        if not self.stocks:
+            self.load()
+            return None
+        self.prices = self.model.simulate(
+            self.prices, 1, self.dt, self.rng, drift=self.drift, volatility=self.volatility
+        )[-1]
+        timestamp = timezone.now()
+        self.pending.append((timestamp, self.prices))
+
+        for stock, price in zip(self.stocks, self.prices):
+            stock.current_price = Decimal(f'{price:.2f}')
+        snapshot = publish_snapshot(self.stocks, timestamp)
+
+        if len(self.pending) >= self.flush_every:
+            self.flush()
+        return snapshot
+
+    def flush(self):
+        """Persiste les ticks en attente puis resynchronise avec la base.
+
+        Un titre dont le prix en base a changé depuis le chargement (admin, update_price)
+        n'est pas écrit: la modification l'emporte et le titre repart de ce prix au rechargement.
+        """
+        if self.pending:
+            with transaction.atomic():
+                current = dict(
+                    Stock.objects.select_for_update()
+                    .filter(pk__in=[stock.pk for stock in self.stocks])
+                    .values_list('pk', 'current_price')
+                )
+                kept = [
+                    i for i, (stock, price) in enumerate(zip(self.stocks, self.persisted_prices))
+                    if current.get(stock.pk) == price
+                ]
+                if kept:
+                    # Le snapshot a déjà été publié à chaque tick
+                    persist_ticks(
+                        [self.stocks[i] for i in kept],
+                        [(timestamp, prices[kept]) for timestamp, prices in self.pending],
+                        publish=False,
+                        last_prices=[self.persisted_prices[i] for i in kept],
+                    )
+            self.pending = []
+        self.load()
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.3 on 2026-10-17 20:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_alter_leaderboard_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stock',
+            name='drift',
+            field=models.DecimalField(decimal_places=4, default=0.05, max_digits=6),
+        ),
+        migrations.AddField(
+            model_name='stock',
+            name='volatility',
+            field=models.DecimalField(decimal_places=4, default=0.25, max_digits=6),
+        ),
+    ]
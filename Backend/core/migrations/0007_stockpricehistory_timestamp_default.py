@@ -0,0 +1,19 @@
+# Generated by Django 5.2.3 on 2026-10-17 20:37
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_stock_price_model_params'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='stockpricehistory',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.3 on 2026-10-17 20:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_pricecandle'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stockpricehistory',
+            index=models.Index(fields=['stock', '-timestamp'], name='core_sph_stock_ts_idx'),
+        ),
+    ]
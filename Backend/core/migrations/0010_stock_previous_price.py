@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-17 20:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_stockpricehistory_stock_timestamp_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stock',
+            name='previous_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-17 20:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_gamificationevent'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='leaderboard',
+            name='leaderboard_type',
+            field=models.CharField(choices=[('XP', 'Experience Points'), ('PROFIT', 'Total Profit'), ('TRADES', 'Trade Count'), ('WIN_RATE', 'Win Rate'), ('VOLUME', 'Trading Volume'), ('PORTFOLIO_VALUE', 'Portfolio Value')], max_length=15),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.3 on 2026-10-17 20:50
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_badge_count(apps, schema_editor):
+    UserProfile = apps.get_model('core', 'UserProfile')
+    UserBadge = apps.get_model('core', 'UserBadge')
+    counts = (
+        UserBadge.objects.filter(user=OuterRef('user'))
+        .order_by()
+        .values('user')
+        .annotate(total=Count('id'))
+        .values('total')
+    )
+    UserProfile.objects.update(badge_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_leaderboard_portfolio_value'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='badge_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_badge_count, migrations.RunPython.noop),
+    ]
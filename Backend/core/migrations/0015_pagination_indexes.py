@@ -0,0 +1,36 @@
+# Generated by Django 5.2.3 on 2026-10-17 21:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_broadcast_notifications'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='core_notif_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['-created_at', '-id'], name='core_notif_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', '-timestamp', '-id'], name='core_tx_user_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['-timestamp', '-id'], name='core_tx_ts_idx'),
+        ),
+        # auth_user appartient à django.contrib.auth: index de la liste admin des utilisateurs
+        migrations.RunSQL(
+            'CREATE INDEX IF NOT EXISTS core_user_joined_idx ON auth_user (date_joined DESC, id DESC)',
+            'DROP INDEX IF EXISTS core_user_joined_idx',
+        ),
+    ]
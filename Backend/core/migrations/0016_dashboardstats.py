@@ -0,0 +1,27 @@
+# Generated by Django 5.2.3 on 2026-10-17 21:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('computed_at', models.DateTimeField()),
+                ('last_transaction_id', models.BigIntegerField(default=0)),
+                ('total_transactions', models.PositiveIntegerField(default=0)),
+                ('buy_transactions', models.PositiveIntegerField(default=0)),
+                ('sell_transactions', models.PositiveIntegerField(default=0)),
+                ('total_volume', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('total_quantity', models.DecimalField(decimal_places=6, default=0, max_digits=20)),
+                ('data', models.JSONField(blank=True, default=dict)),
+            ],
+        ),
+    ]
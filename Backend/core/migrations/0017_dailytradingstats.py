@@ -0,0 +1,34 @@
+# Generated by Django 5.2.3 on 2026-10-17 21:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_dashboardstats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyTradingStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('buy_count', models.PositiveIntegerField(default=0)),
+                ('sell_count', models.PositiveIntegerField(default=0)),
+                ('volume', models.DecimalField(decimal_places=6, default=0, max_digits=20)),
+                ('notional', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('realized_pl', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('stock', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.stock')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'day'], name='core_dts_user_day_idx')],
+                'unique_together': {('day', 'user', 'stock')},
+            },
+        ),
+    ]
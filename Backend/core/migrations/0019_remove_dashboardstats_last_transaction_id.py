@@ -0,0 +1,17 @@
+# Generated by Django 5.2.3 on 2026-10-17 22:02
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_eventsequence'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='dashboardstats',
+            name='last_transaction_id',
+        ),
+    ]
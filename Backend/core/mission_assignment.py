@@ -0,0 +1,67 @@
+"""
+Attribution de missions en masse: les couples (utilisateur, mission) manquants sont
+calculés par lots d'utilisateurs et insérés en un bulk_create par lot.
+
+Par lot: une requête pour les ids d'utilisateurs (parcours de la clé primaire), une qui
+verrouille ces utilisateurs, une pour les attributions existantes et un INSERT. Le verrou
+sérialise deux attributions concurrentes aux mêmes utilisateurs: les lignes insérées sont
+exactement celles calculées, et le nombre retourné est exact. ignore_conflicts reste un filet
+pour les écritures faites hors de ce module (la contrainte unique user/mission reste l'arbitre).
+"""
+
+import random
+
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from .models import UserMission
+
+BATCH_SIZE = 1000
+
+
+def _user_id_batches(users, batch_size):
+    """Ids des utilisateurs par lots, dans l'ordre de la clé primaire"""
+    last_id = 0
+    while True:
+        batch = list(
+            users.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not batch:
+            return
+        yield batch
+        last_id = batch[-1]
+
+
+def assign(users, mission_ids, missions_per_user=None, batch_size=BATCH_SIZE):
+    """Attribue les missions `mission_ids` aux utilisateurs du queryset `users`.
+
+    Avec `missions_per_user`, chaque utilisateur reçoit ce nombre de nouvelles missions,
+    tirées au hasard parmi celles de `mission_ids` qu'il n'a pas encore. Retourne le nombre
+    d'attributions créées.
+    """
+    mission_ids = list(mission_ids)
+    if not mission_ids:
+        return 0
+    created = 0
+    for user_ids in _user_id_batches(users, batch_size):
+        with transaction.atomic():
+            list(User.objects.select_for_update().filter(id__in=user_ids).values_list('id', flat=True))
+            existing = set(
+                UserMission.objects.filter(user_id__in=user_ids, mission_id__in=mission_ids)
+                .values_list('user_id', 'mission_id')
+            )
+            rows = []
+            for user_id in user_ids:
+                missing = [mission_id for mission_id in mission_ids if (user_id, mission_id) not in existing]
+                if missions_per_user is not None and missions_per_user < len(missing):
+                    missing = random.sample(missing, missions_per_user)
+                rows.extend(UserMission(user_id=user_id, mission_id=mission_id, progress=0) for mission_id in missing)
+            if rows:
+                UserMission.objects.bulk_create(rows, batch_size=batch_size, ignore_conflicts=True)
+        created += len(rows)
+    return created
+
+
+def assign_to_user_ids(mission, user_ids, batch_size=BATCH_SIZE):
+    """Attribue une mission à une liste d'ids (les ids inconnus sont ignorés)"""
+    return assign(User.objects.filter(id__in=user_ids), [mission.id], batch_size=batch_size)
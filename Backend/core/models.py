@@ -12,6 +12,8 @@ class UserProfile(models.Model):
     successful_trades = models.IntegerField(default=0)
     # win_rate persisted field removed; computed via serializer now
     trading_score = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    # Nombre de UserBadge, maintenu par les chemins d'attribution (voir sync_badge_counts)
+    badge_count = models.PositiveIntegerField(default=0)
     # Keep in sync with migration 0003 (max_length=6)
     risk_tolerance = models.CharField(max_length=6, choices=[
         ('LOW', 'Low'),
@@ -25,10 +27,6 @@ class UserProfile(models.Model):
     def __str__(self):
         return f"{self.user.username}'s Profile"
     
-    @property
-    def badge_count(self):
-        return UserBadge.objects.filter(user=self.user).count()
-    
     @property
     def next_level_xp(self):
         return self.level * 100
@@ -78,7 +76,12 @@ class Stock(models.Model):
     symbol = models.CharField(max_length=10, unique=True)
     name = models.CharField(max_length=100)
     current_price = models.DecimalField(max_digits=10, decimal_places=2)
+    # Prix avant le dernier tick, pour calculer la variation sans lire l'historique
+    previous_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     volume = models.PositiveIntegerField(default=0)
+    # Paramètres annualisés utilisés par les modèles de prix (core/price_models.py)
+    drift = models.DecimalField(max_digits=6, decimal_places=4, default=0.05)
+    volatility = models.DecimalField(max_digits=6, decimal_places=4, default=0.25)
     last_updated = models.DateTimeField(auto_now=True)
     
     def __str__(self):
@@ -87,10 +90,41 @@ class Stock(models.Model):
 class StockPriceHistory(models.Model):
     stock = models.ForeignKey(Stock, on_delete=models.CASCADE, related_name='price_history')
     price = models.DecimalField(max_digits=10, decimal_places=2)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # default plutôt qu'auto_now_add: les ticks groupés gardent leur horodatage réel
+    timestamp = models.DateTimeField(default=timezone.now)
     
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            # Historique d'un titre du plus récent au plus ancien (history, compaction)
+            models.Index(fields=['stock', '-timestamp'], name='core_sph_stock_ts_idx'),
+        ]
+
+class PriceCandle(models.Model):
+    """Bougies OHLCV agrégées par intervalle à partir des ticks de prix"""
+    INTERVALS = [
+        ('1m', '1 minute'),
+        ('5m', '5 minutes'),
+        ('1h', '1 hour'),
+        ('1d', '1 day'),
+    ]
+    
+    stock = models.ForeignKey(Stock, on_delete=models.CASCADE, related_name='candles')
+    interval = models.CharField(max_length=2, choices=INTERVALS)
+    bucket_start = models.DateTimeField()
+    open = models.DecimalField(max_digits=10, decimal_places=2)
+    high = models.DecimalField(max_digits=10, decimal_places=2)
+    low = models.DecimalField(max_digits=10, decimal_places=2)
+    close = models.DecimalField(max_digits=10, decimal_places=2)
+    # Quantité échangée pendant l'intervalle (alimentée par les trades)
+    volume = models.DecimalField(max_digits=16, decimal_places=6, default=0)
+    
+    class Meta:
+        unique_together = ('stock', 'interval', 'bucket_start')
+        ordering = ['bucket_start']
+    
+    def __str__(self):
+        return f"{self.stock.symbol} {self.interval} @ {self.bucket_start}"
 
 class Portfolio(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -119,6 +153,13 @@ class Transaction(models.Model):
     total_amount = models.DecimalField(max_digits=12, decimal_places=2)
     timestamp = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        indexes = [
+            # Pagination par curseur: historique d'un utilisateur, puis liste admin
+            models.Index(fields=['user', '-timestamp', '-id'], name='core_tx_user_ts_idx'),
+            models.Index(fields=['-timestamp', '-id'], name='core_tx_ts_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.user.username} {self.transaction_type} {self.quantity} {self.stock.symbol}"
 
@@ -215,11 +256,11 @@ class Leaderboard(models.Model):
         # Keep minimal set aligned with migration to avoid schema churn
         ('WIN_RATE', 'Win Rate'),
         ('VOLUME', 'Trading Volume'),
+        ('PORTFOLIO_VALUE', 'Portfolio Value'),
     ]
     
     user = models.ForeignKey(User, on_delete=models.CASCADE)
-    # Align with migration 0003 (max_length=8, score max_digits=12)
-    leaderboard_type = models.CharField(max_length=8, choices=LEADERBOARD_TYPES)
+    leaderboard_type = models.CharField(max_length=15, choices=LEADERBOARD_TYPES)
     score = models.DecimalField(max_digits=12, decimal_places=2)
     rank = models.IntegerField()
     period_start = models.DateTimeField()
@@ -297,7 +338,8 @@ class Notification(models.Model):
         ('SYSTEM', 'System'),
     ]
     
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    # NULL: diffusion à tous les utilisateurs, fusionnée dans chaque fil à la lecture
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
     # Align with migration 0003 (max_length=11 for type, title 200)
     notification_type = models.CharField(max_length=11, choices=NOTIFICATION_TYPES)
     title = models.CharField(max_length=200)
@@ -308,6 +350,101 @@ class Notification(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Pagination par curseur: fil d'un utilisateur (user NULL pour les diffusions), liste admin
+            models.Index(fields=['user', '-created_at', '-id'], name='core_notif_user_created_idx'),
+            models.Index(fields=['-created_at', '-id'], name='core_notif_created_idx'),
+        ]
+    
+    def __str__(self):
+        recipient = self.user.username if self.user_id else 'Tous'
+        return f"{recipient} - {self.title}"
+
+class NotificationReceipt(models.Model):
+    """Lecture ou masquage d'une notification diffusée, créé à l'interaction de l'utilisateur"""
+    notification = models.ForeignKey(Notification, on_delete=models.CASCADE, related_name='receipts')
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    is_read = models.BooleanField(default=False)
+    is_dismissed = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ('notification', 'user')
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.notification.title}"
+
+class GamificationEvent(models.Model):
+    """Outbox durable des événements traités par le worker de gamification"""
+    STATUSES = [
+        ('PENDING', 'Pending'),
+        ('PROCESSING', 'Processing'),
+        ('DONE', 'Done'),
+        ('FAILED', 'Failed'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    event_type = models.CharField(max_length=20, default='TRADE')
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUSES, default='PENDING')
+    result = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            # Le worker lit les événements en attente dans l'ordre d'arrivée
+            models.Index(fields=['status', 'id'], name='core_gevent_status_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.event_type} ({self.status})"
+
+class DailyTradingStats(models.Model):
+    """Cumul quotidien des trades par utilisateur et par titre (mis à jour par chaque trade)"""
+    day = models.DateField()
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    stock = models.ForeignKey(Stock, on_delete=models.CASCADE)
+    buy_count = models.PositiveIntegerField(default=0)
+    sell_count = models.PositiveIntegerField(default=0)
+    # Quantité échangée et montant (notionnel) des achats et ventes
+    volume = models.DecimalField(max_digits=20, decimal_places=6, default=0)
+    notional = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    realized_pl = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    
+    class Meta:
+        unique_together = ('day', 'user', 'stock')
+        indexes = [
+            # Statistiques d'un utilisateur sur une période (la contrainte unique couvre les requêtes par jour)
+            models.Index(fields=['user', 'day'], name='core_dts_user_day_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} {self.stock.symbol} {self.day}"
+
+class DashboardStats(models.Model):
+    """Instantané des statistiques du tableau de bord admin (une ligne, rafraîchie en tâche de fond)"""
+    computed_at = models.DateTimeField()
+    # Totaux des transactions (lus dans le cumul DailyTradingStats)
+    total_transactions = models.PositiveIntegerField(default=0)
+    buy_transactions = models.PositiveIntegerField(default=0)
+    sell_transactions = models.PositiveIntegerField(default=0)
+    total_volume = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    total_quantity = models.DecimalField(max_digits=20, decimal_places=6, default=0)
+    # Autres métriques par section (utilisateurs, titres, missions, badges, meilleurs joueurs)
+    data = models.JSONField(default=dict, blank=True)
+    
+    def __str__(self):
+        return f"Statistiques du {self.computed_at:%Y-%m-%d %H:%M}"
+
+class EventSequence(models.Model):
+    """Compteur de séquence d'un canal d'événements (incrémenté sous verrou de ligne)"""
+    channel = models.CharField(max_length=100, unique=True)
+    value = models.BigIntegerField(default=0)
     
     def __str__(self):
-        return f"{self.user.username} - {self.title}"
+        return f"{self.channel}: {self.value}"
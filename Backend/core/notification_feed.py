@@ -0,0 +1,64 @@
+"""
+Fil de notifications d'un utilisateur: ses notifications personnelles et les diffusions
+(user=NULL) fusionnées à la lecture. Une diffusion est une seule ligne; l'état lu/masqué
+par utilisateur n'existe que sous forme de NotificationReceipt, créé à l'interaction.
+"""
+
+from django.db.models import BooleanField, Case, Exists, F, OuterRef, Q, When
+
+from .models import Notification, NotificationReceipt
+
+
+def feed_for(user):
+    """Notifications visibles par l'utilisateur, annotées avec feed_is_read"""
+    receipts = NotificationReceipt.objects.filter(notification=OuterRef('pk'), user=user)
+    return (
+        Notification.objects.filter(
+            Q(user=user) | Q(user__isnull=True, created_at__gte=user.date_joined)
+        )
+        .exclude(Exists(receipts.filter(is_dismissed=True)))
+        .annotate(
+            feed_is_read=Case(
+                When(user__isnull=True, then=Exists(receipts.filter(is_read=True))),
+                default=F('is_read'),
+                output_field=BooleanField(),
+            )
+        )
+    )
+
+
+def unread_for(user):
+    return feed_for(user).filter(feed_is_read=False)
+
+
+def _upsert_receipts(user, notification_ids, **state):
+    NotificationReceipt.objects.bulk_create(
+        [NotificationReceipt(notification_id=pk, user=user, **state) for pk in notification_ids],
+        update_conflicts=True,
+        unique_fields=['notification', 'user'],
+        update_fields=list(state) + ['updated_at'],
+    )
+
+
+def mark_read(user, notification, is_read=True):
+    """Marque une notification du fil comme lue (ou non lue)"""
+    if notification.user_id is None:
+        _upsert_receipts(user, [notification.pk], is_read=is_read)
+    else:
+        Notification.objects.filter(pk=notification.pk).update(is_read=is_read)
+
+
+def mark_all_read(user):
+    """Marque tout le fil comme lu; retourne le nombre de notifications concernées"""
+    count = Notification.objects.filter(user=user, is_read=False).update(is_read=True)
+    broadcast_ids = list(unread_for(user).filter(user__isnull=True).values_list('pk', flat=True))
+    _upsert_receipts(user, broadcast_ids, is_read=True)
+    return count + len(broadcast_ids)
+
+
+def dismiss(user, notification):
+    """Retire une notification du fil (supprime une notification personnelle)"""
+    if notification.user_id is None:
+        _upsert_receipts(user, [notification.pk], is_dismissed=True)
+    else:
+        notification.delete()
@@ -0,0 +1,27 @@
+"""
+Pagination par curseur (keyset) des listes qui grossissent sans limite.
+
+L'ordre est stable (date puis id) et chaque page filtre sur la position du curseur au
+lieu d'un OFFSET: le coût d'une page ne dépend pas de sa profondeur dans l'historique.
+Les index correspondants sont déclarés sur les modèles (migration 0015).
+"""
+
+from rest_framework.pagination import CursorPagination
+
+
+class NewestFirstCursorPagination(CursorPagination):
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+
+class TimestampCursorPagination(NewestFirstCursorPagination):
+    ordering = ('-timestamp', '-id')
+
+
+class CreatedAtCursorPagination(NewestFirstCursorPagination):
+    ordering = ('-created_at', '-id')
+
+
+class DateJoinedCursorPagination(NewestFirstCursorPagination):
+    ordering = ('-date_joined', '-id')
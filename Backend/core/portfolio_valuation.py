@@ -0,0 +1,42 @@
+"""
+Valorisation du portefeuille: valeur de marché, coût de revient et P/L latent
+calculés par la base en une seule requête annotée.
+"""
+
+from decimal import Decimal
+
+from django.db.models import DecimalField, ExpressionWrapper, F
+
+from .models import Portfolio
+
+AMOUNT = DecimalField(max_digits=20, decimal_places=6)
+
+
+def valued_holdings(user):
+    """Positions de l'utilisateur annotées avec market_value, cost_basis et unrealized_pl"""
+    return (
+        Portfolio.objects.filter(user=user)
+        .select_related('stock')
+        .annotate(
+            market_value=ExpressionWrapper(F('quantity') * F('stock__current_price'), output_field=AMOUNT),
+            cost_basis=ExpressionWrapper(F('quantity') * F('average_price'), output_field=AMOUNT),
+        )
+        .annotate(unrealized_pl=ExpressionWrapper(F('market_value') - F('cost_basis'), output_field=AMOUNT))
+        .order_by('stock__symbol')
+    )
+
+
+def portfolio_totals(holdings):
+    """Totaux sur des positions déjà chargées (aucune requête supplémentaire)"""
+    totals = {'market_value': Decimal('0'), 'cost_basis': Decimal('0'), 'unrealized_pl': Decimal('0')}
+    for holding in holdings:
+        totals['market_value'] += holding.market_value or 0
+        totals['cost_basis'] += holding.cost_basis or 0
+        totals['unrealized_pl'] += holding.unrealized_pl or 0
+    return totals
+
+
+def value_portfolio(user):
+    """Retourne (positions, totaux) en une requête"""
+    holdings = list(valued_holdings(user))
+    return holdings, portfolio_totals(holdings)
@@ -0,0 +1,147 @@
+"""
+Modèles stochastiques de prix pour le simulateur de marché.
+
+Chaque modèle génère en un seul appel une matrice de chemins (steps x stocks) avec NumPy.
+Les paramètres de drift et de volatilité sont annualisés; dt est exprimé en années.
+"""
+
+import numpy as np
+
+MIN_PRICE = 0.01
+# Une minute de cotation (252 jours x 390 minutes)
+TRADING_MINUTE = 1 / (252 * 390)
+
+PRICE_MODELS = {}
+
+
+def register_model(name):
+    """Enregistre une classe de modèle sous le nom donné"""
+    def decorator(cls):
+        cls.name = name
+        PRICE_MODELS[name] = cls
+        return cls
+    return decorator
+
+
+def get_model(name, **params):
+    """Instancie un modèle enregistré, lève ValueError si le nom est inconnu"""
+    try:
+        model_class = PRICE_MODELS[name]
+    except KeyError:
+        raise ValueError(f'Unknown price model: {name}')
+    return model_class(**params)
+
+
+def make_rng(seed=None):
+    """Générateur aléatoire, reproductible si un seed est fourni"""
+    return np.random.default_rng(seed)
+
+
+class PriceModel:
+    """Classe de base: sous-classes implémentent _paths()"""
+    name = None
+
+    def __init__(self, drift=0.05, volatility=0.25, **params):
+        self.drift = drift
+        self.volatility = volatility
+        self.params = params
+        self.validate()
+
+    def validate(self):
+        """Lève ValueError si un paramètre sort de son domaine"""
+        if self.volatility < 0:
+            raise ValueError('volatility must not be negative')
+
+    def simulate(self, prices, steps=1, dt=TRADING_MINUTE, rng=None, drift=None, volatility=None):
+        """Retourne une matrice (steps, n) de prix à partir des prix courants"""
+        if dt <= 0:
+            raise ValueError('dt must be positive')
+        prices = np.asarray(prices, dtype=float)
+        rng = rng or make_rng()
+        mu = np.broadcast_to(self.drift if drift is None else drift, prices.shape)
+        sigma = np.broadcast_to(self.volatility if volatility is None else volatility, prices.shape)
+        paths = self._paths(prices, steps, dt, rng, mu, sigma)
+        return np.maximum(paths, MIN_PRICE)
+
+    def _paths(self, prices, steps, dt, rng, mu, sigma):
+        raise NotImplementedError
+
+
+@register_model('uniform')
+class UniformModel(PriceModel):
+    """Variation uniforme [low, high] par pas (comportement historique du simulateur)"""
+
+    def validate(self):
+        super().validate()
+        if not -1 < self.params.get('low', -0.05) <= self.params.get('high', 0.05):
+            raise ValueError('uniform bounds must satisfy -1 < low <= high')
+
+    def _paths(self, prices, steps, dt, rng, mu, sigma):
+        low = self.params.get('low', -0.05)
+        high = self.params.get('high', 0.05)
+        factors = 1 + rng.uniform(low, high, size=(steps, prices.size))
+        return prices * np.cumprod(factors, axis=0)
+
+
+@register_model('gbm')
+class GeometricBrownianMotion(PriceModel):
+    """Mouvement brownien géométrique avec drift et volatilité par titre"""
+
+    def _log_increments(self, steps, dt, rng, mu, sigma):
+        shocks = rng.standard_normal((steps, mu.size))
+        return (mu - 0.5 * sigma ** 2) * dt + sigma * np.sqrt(dt) * shocks
+
+    def _paths(self, prices, steps, dt, rng, mu, sigma):
+        increments = self._log_increments(steps, dt, rng, mu, sigma)
+        return prices * np.exp(np.cumsum(increments, axis=0))
+
+
+@register_model('jump_diffusion')
+class MertonJumpDiffusion(GeometricBrownianMotion):
+    """GBM + sauts log-normaux arrivant selon un processus de Poisson (Merton)"""
+
+    def validate(self):
+        super().validate()
+        if self.params.get('jump_intensity', 10.0) < 0 or self.params.get('jump_std', 0.05) < 0:
+            raise ValueError('jump_intensity and jump_std must not be negative')
+
+    def _paths(self, prices, steps, dt, rng, mu, sigma):
+        intensity = self.params.get('jump_intensity', 10.0)
+        jump_mean = self.params.get('jump_mean', -0.02)
+        jump_std = self.params.get('jump_std', 0.05)
+
+        # Compensation pour conserver l'espérance du drift
+        compensator = intensity * (np.exp(jump_mean + 0.5 * jump_std ** 2) - 1)
+        increments = self._log_increments(steps, dt, rng, mu - compensator, sigma)
+
+        jump_counts = rng.poisson(intensity * dt, size=increments.shape)
+        jumps = jump_counts * jump_mean + np.sqrt(jump_counts) * jump_std * rng.standard_normal(increments.shape)
+        return prices * np.exp(np.cumsum(increments + jumps, axis=0))
+
+
+@register_model('mean_reverting')
+class OrnsteinUhlenbeck(PriceModel):
+    """Processus d'Ornstein-Uhlenbeck sur le log-prix, retour vers un niveau cible"""
+
+    def validate(self):
+        super().validate()
+        if self.params.get('reversion_speed', 5.0) <= 0:
+            raise ValueError('reversion_speed must be positive')
+        if np.any(np.asarray(self.params.get('long_run_price', 1.0)) <= 0):
+            raise ValueError('long_run_price must be positive')
+
+    def _paths(self, prices, steps, dt, rng, mu, sigma):
+        speed = self.params.get('reversion_speed', 5.0)
+        target = np.log(np.broadcast_to(self.params.get('long_run_price', prices), prices.shape))
+
+        # Discrétisation exacte du processus
+        decay = np.exp(-speed * dt)
+        scale = sigma * np.sqrt((1 - decay ** 2) / (2 * speed))
+        shocks = rng.standard_normal((steps, prices.size))
+
+        log_prices = np.empty((steps, prices.size))
+        current = np.log(prices)
+        for step in range(steps):
+            current = target + (current - target) * decay + scale * shocks[step]
+            log_prices[step] = current
+        return np.exp(log_prices)
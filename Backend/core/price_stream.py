@@ -0,0 +1,223 @@
+"""
+Flux SSE des prix: chaque client reçoit les variations des symboles suivis à partir du
+dernier snapshot publié par market_engine.
+
+Un seul lecteur par processus interroge le cache (thread pour WSGI, tâche asyncio pour
+ASGI) et réveille toutes les connexions à chaque nouveau tick. Chaque connexion compare le
+snapshot aux derniers prix qu'elle a envoyés: un client lent ne fait pas grossir de file,
+il reçoit à son retour un seul delta regroupant les ticks manqués.
+"""
+
+import asyncio
+import json
+import threading
+import time
+import weakref
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+
+from . import market_engine
+
+RETRY_MS = 3000
+HEARTBEAT = ': heartbeat\n\n'
+
+
+def format_event(event, data, event_id=None):
+    lines = [f'id: {event_id}'] if event_id is not None else []
+    # DjangoJSONEncoder: Decimal, dates ou UUID d'un payload ne coupent pas le flux
+    payload = json.dumps(data, separators=(',', ':'), cls=DjangoJSONEncoder)
+    lines += [f'event: {event}', f'data: {payload}']
+    return '\n'.join(lines) + '\n\n'
+
+
+class PriceStream:
+    """État d'une connexion: symboles suivis, dernière séquence et derniers prix envoyés"""
+
+    def __init__(self, symbols=None, last_event_id=None):
+        self.symbols = set(symbols) if symbols else None
+        self.sequence = last_event_id
+        self.sent = {}
+
+    def _subscribed(self, prices):
+        if self.symbols is None:
+            return prices
+        return {symbol: quote for symbol, quote in prices.items() if symbol in self.symbols}
+
+    def opening(self, snapshot):
+        """Événements à l'ouverture: delta depuis Last-Event-ID si le tampon le permet, sinon snapshot complet"""
+        events = [f'retry: {RETRY_MS}\n\n']
+        if snapshot is None:
+            return events
+        prices = self._subscribed(snapshot['prices'])
+        ticks = None
+        if self.sequence is not None and self.sequence <= snapshot['sequence']:
+            ticks = market_engine.get_ticks_since(self.sequence)
+        if ticks is not None:
+            # Reprise: un seul delta regroupant les symboles modifiés depuis la séquence du client
+            changed = {symbol for tick in ticks for symbol in tick['changes']}
+            self.sent = {symbol: quote['price'] for symbol, quote in prices.items()}
+            self.sequence = snapshot['sequence']
+            delta = {symbol: price for symbol, price in self.sent.items() if symbol in changed}
+            if delta:
+                events.append(self._prices_event(snapshot, delta))
+            return events
+        self.sent = {symbol: quote['price'] for symbol, quote in prices.items()}
+        self.sequence = snapshot['sequence']
+        events.append(format_event('snapshot', {
+            'sequence': snapshot['sequence'],
+            'timestamp': snapshot['timestamp'],
+            'prices': prices,
+        }, snapshot['sequence']))
+        return events
+
+    def advance(self, snapshot):
+        """Delta entre le snapshot et ce qui a été envoyé, ou None si rien n'a changé"""
+        self.sequence = snapshot['sequence']
+        delta = {
+            symbol: quote['price']
+            for symbol, quote in self._subscribed(snapshot['prices']).items()
+            if self.sent.get(symbol) != quote['price']
+        }
+        if not delta:
+            return None
+        self.sent.update(delta)
+        return self._prices_event(snapshot, delta)
+
+    def _prices_event(self, snapshot, delta):
+        return format_event('prices', {
+            'sequence': snapshot['sequence'],
+            'timestamp': snapshot['timestamp'],
+            'prices': delta,
+        }, snapshot['sequence'])
+
+
+class TickBroadcaster:
+    """Lecteur unique du snapshot pour les connexions WSGI (threads) du processus"""
+
+    def __init__(self, poll_interval):
+        self.poll_interval = poll_interval
+        self.condition = threading.Condition()
+        self.snapshot = None
+        self.thread = None
+
+    def _ensure_started(self):
+        if self.thread is None:
+            with self.condition:
+                if self.thread is None:
+                    self.snapshot = market_engine.get_snapshot()
+                    self.thread = threading.Thread(target=self._poll, daemon=True)
+                    self.thread.start()
+
+    def _poll(self):
+        while True:
+            snapshot = market_engine.get_snapshot()
+            if snapshot is not None and (self.snapshot is None or snapshot['sequence'] != self.snapshot['sequence']):
+                with self.condition:
+                    self.snapshot = snapshot
+                    self.condition.notify_all()
+            time.sleep(self.poll_interval)
+
+    def wait(self, sequence, timeout):
+        """Snapshot dont la séquence diffère de `sequence`, ou None après `timeout` secondes"""
+        self._ensure_started()
+        with self.condition:
+            self.condition.wait_for(
+                lambda: self.snapshot is not None and self.snapshot['sequence'] != sequence, timeout
+            )
+            if self.snapshot is not None and self.snapshot['sequence'] != sequence:
+                return self.snapshot
+        return None
+
+
+class AsyncTickBroadcaster:
+    """Équivalent asyncio: une tâche de lecture par boucle d'événements"""
+
+    def __init__(self, poll_interval):
+        self.poll_interval = poll_interval
+        self.snapshot = None
+        self.changed = asyncio.Event()
+        self.task = None
+
+    async def _poll(self):
+        while True:
+            snapshot = await cache.aget(market_engine.SNAPSHOT_KEY)
+            if snapshot is not None and (self.snapshot is None or snapshot['sequence'] != self.snapshot['sequence']):
+                self.snapshot = snapshot
+                self.changed.set()
+                self.changed = asyncio.Event()
+            await asyncio.sleep(self.poll_interval)
+
+    async def wait(self, sequence, timeout):
+        if self.task is None:
+            self.snapshot = await cache.aget(market_engine.SNAPSHOT_KEY)
+            self.task = asyncio.get_running_loop().create_task(self._poll())
+        deadline = time.monotonic() + timeout
+        while self.snapshot is None or self.snapshot['sequence'] == sequence:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            try:
+                await asyncio.wait_for(self.changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                return None
+        return self.snapshot
+
+
+_broadcaster = None
+_broadcaster_lock = threading.Lock()
+_async_broadcasters = weakref.WeakKeyDictionary()
+
+
+def get_broadcaster():
+    global _broadcaster
+    if _broadcaster is None:
+        with _broadcaster_lock:
+            if _broadcaster is None:
+                _broadcaster = TickBroadcaster(settings.MARKET_STREAM_POLL_INTERVAL)
+    return _broadcaster
+
+
+def get_async_broadcaster():
+    loop = asyncio.get_running_loop()
+    if loop not in _async_broadcasters:
+        _async_broadcasters[loop] = AsyncTickBroadcaster(settings.MARKET_STREAM_POLL_INTERVAL)
+    return _async_broadcasters[loop]
+
+
+def events(stream, broadcaster=None, heartbeat=None, max_duration=None):
+    """Générateur SSE (WSGI); se termine après max_duration, le client se reconnecte avec Last-Event-ID"""
+    broadcaster = broadcaster or get_broadcaster()
+    heartbeat = heartbeat or settings.MARKET_STREAM_HEARTBEAT
+    deadline = time.monotonic() + (max_duration or settings.MARKET_STREAM_MAX_DURATION)
+    yield from stream.opening(market_engine.get_snapshot())
+    last_write = time.monotonic()
+    while (remaining := deadline - time.monotonic()) > 0:
+        snapshot = broadcaster.wait(stream.sequence, min(heartbeat, remaining))
+        event = stream.advance(snapshot) if snapshot is not None else None
+        if event is not None:
+            yield event
+            last_write = time.monotonic()
+        elif time.monotonic() - last_write >= heartbeat:
+            yield HEARTBEAT
+            last_write = time.monotonic()
+
+
+async def async_events(stream, broadcaster=None, heartbeat=None, max_duration=None):
+    """Générateur SSE asynchrone (ASGI), même protocole que events()"""
+    broadcaster = broadcaster or get_async_broadcaster()
+    heartbeat = heartbeat or settings.MARKET_STREAM_HEARTBEAT
+    deadline = time.monotonic() + (max_duration or settings.MARKET_STREAM_MAX_DURATION)
+    for event in stream.opening(await cache.aget(market_engine.SNAPSHOT_KEY)):
+        yield event
+    last_write = time.monotonic()
+    while (remaining := deadline - time.monotonic()) > 0:
+        snapshot = await broadcaster.wait(stream.sequence, min(heartbeat, remaining))
+        event = stream.advance(snapshot) if snapshot is not None else None
+        if event is not None:
+            yield event
+            last_write = time.monotonic()
+        elif time.monotonic() - last_write >= heartbeat:
+            yield HEARTBEAT
+            last_write = time.monotonic()
@@ -0,0 +1,27 @@
+"""
+Séquences des canaux d'événements (flux utilisateur, ticks du marché).
+
+La valeur vient d'une ligne EventSequence incrémentée en base: deux processus qui publient
+en même temps (API, worker, run_market) obtiennent des séquences distinctes, quel que soit
+le backend de cache. La ligne reste verrouillée jusqu'à la fin de la transaction appelante,
+ce qui sérialise aussi les écritures faites dans le cache sous cette séquence.
+"""
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import EventSequence
+
+
+def next_value(channel):
+    """Séquence suivante du canal (à appeler dans la transaction qui publie l'événement)"""
+    rows = EventSequence.objects.filter(channel=channel)
+    if not rows.update(value=F('value') + 1):
+        try:
+            with transaction.atomic():
+                EventSequence.objects.create(channel=channel, value=1)
+            return 1
+        except IntegrityError:
+            # Compteur créé entre-temps par un autre processus
+            rows.update(value=F('value') + 1)
+    return rows.values_list('value', flat=True).get()
@@ -1,10 +1,10 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from .models import (
-    UserProfile, Stock, StockPriceHistory, Portfolio, 
+    UserProfile, Stock, StockPriceHistory, PriceCandle, Portfolio, 
     Transaction, Mission, UserMission, Watchlist,
     Badge, UserBadge, Leaderboard, Achievement, 
-    UserAchievement, DailyStreak, Notification
+    UserAchievement, DailyStreak, Notification, GamificationEvent
 )
 
 class UserSerializer(serializers.ModelSerializer):
@@ -88,36 +88,80 @@ class StockPriceHistorySerializer(serializers.ModelSerializer):
         model = StockPriceHistory
         fields = ['price', 'timestamp']
 
-class StockSerializer(serializers.ModelSerializer):
-    price_history = StockPriceHistorySerializer(many=True, read_only=True)
+class PriceCandleSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PriceCandle
+        fields = ['bucket_start', 'open', 'high', 'low', 'close', 'volume']
+
+class StockSummarySerializer(serializers.ModelSerializer):
+    """Représentation compacte d'un titre pour les contextes imbriqués"""
+    change = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = Stock
+        fields = ['id', 'symbol', 'name', 'current_price', 'change', 'volume']
+    
+    def get_change(self, obj):
+        if obj.previous_price is None:
+            return None
+        # Même format que current_price (DecimalField sérialisé en chaîne)
+        return str(obj.current_price - obj.previous_price)
+
+class StockSerializer(StockSummarySerializer):
+    """Titre complet; l'historique n'est inclus que sur demande (context include_history).
+
+    L'historique est lu depuis `recent_price_history`, préchargé et tronqué par la vue.
+    """
+    price_history = StockPriceHistorySerializer(source='recent_price_history', many=True, read_only=True)
     
     class Meta:
         model = Stock
-        fields = ['id', 'symbol', 'name', 'current_price', 'volume', 'last_updated', 'price_history']
+        fields = ['id', 'symbol', 'name', 'current_price', 'change', 'volume', 'last_updated', 'price_history']
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if not self.context.get('include_history'):
+            self.fields.pop('price_history')
 
 class PortfolioSerializer(serializers.ModelSerializer):
-    stock = StockSerializer(read_only=True)
+    stock = StockSummarySerializer(read_only=True)
     current_value = serializers.SerializerMethodField()
+    cost_basis = serializers.SerializerMethodField()
     profit_loss = serializers.SerializerMethodField()
     
     class Meta:
         model = Portfolio
-        fields = ['id', 'stock', 'quantity', 'average_price', 'current_value', 'profit_loss', 'created_at']
+        fields = ['id', 'stock', 'quantity', 'average_price', 'current_value', 'cost_basis', 'profit_loss', 'created_at']
+    
+    # Les valeurs viennent des annotations de portfolio_valuation.valued_holdings quand
+    # elles sont présentes, sinon elles sont recalculées à partir de l'objet.
     
     def get_current_value(self, obj):
         try:
+            if hasattr(obj, 'market_value'):
+                return float(obj.market_value)
             return float(obj.quantity) * float(obj.stock.current_price)
         except Exception:
             return 0.0
     
+    def get_cost_basis(self, obj):
+        try:
+            if hasattr(obj, 'cost_basis'):
+                return float(obj.cost_basis)
+            return float(obj.quantity) * float(obj.average_price)
+        except Exception:
+            return 0.0
+    
     def get_profit_loss(self, obj):
         try:
+            if hasattr(obj, 'unrealized_pl'):
+                return float(obj.unrealized_pl)
             return (float(obj.stock.current_price) - float(obj.average_price)) * float(obj.quantity)
         except Exception:
             return 0.0
 
 class TransactionSerializer(serializers.ModelSerializer):
-    stock = StockSerializer(read_only=True)
+    stock = StockSummarySerializer(read_only=True)
     
     class Meta:
         model = Transaction
@@ -136,7 +180,7 @@ class UserMissionSerializer(serializers.ModelSerializer):
         fields = ['id', 'mission', 'is_completed', 'completed_at', 'progress']
 
 class WatchlistSerializer(serializers.ModelSerializer):
-    stock = StockSerializer(read_only=True)
+    stock = StockSummarySerializer(read_only=True)
     
     class Meta:
         model = Watchlist
@@ -178,15 +222,16 @@ class LeaderboardSerializer(serializers.ModelSerializer):
         fields = ['user', 'user_profile', 'leaderboard_type', 'score', 'rank', 'updated_at']
     
     def get_user_profile(self, obj):
+        # Profil préchargé par leaderboards.with_profiles
         try:
-            profile = UserProfile.objects.get(user=obj.user)
-            return {
-                'level': profile.level,
-                'badge_count': profile.badge_count,
-                'trading_score': profile.trading_score
-            }
+            profile = obj.user.userprofile
         except UserProfile.DoesNotExist:
             return None
+        return {
+            'level': profile.level,
+            'badge_count': profile.badge_count,
+            'trading_score': profile.trading_score
+        }
 
 class AchievementSerializer(serializers.ModelSerializer):
     badge = BadgeSerializer(read_only=True)
@@ -211,6 +256,25 @@ class NotificationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Notification
         fields = ['id', 'notification_type', 'title', 'message', 'is_read', 'data', 'created_at']
+    
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # État lu propre à l'utilisateur pour les diffusions (annoté par notification_feed)
+        if hasattr(instance, 'feed_is_read'):
+            data['is_read'] = instance.feed_is_read
+        return data
+
+class GamificationEventSerializer(serializers.ModelSerializer):
+    event_id = serializers.IntegerField(source='id', read_only=True)
+    status = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = GamificationEvent
+        fields = ['event_id', 'event_type', 'status', 'result', 'created_at', 'processed_at']
+    
+    def get_status(self, obj):
+        # Un événement réservé par le worker reste "pending" pour le client
+        return 'pending' if obj.status in ('PENDING', 'PROCESSING') else obj.status.lower()
 
 class GamificationSummarySerializer(serializers.Serializer):
     """Sérialiseur pour le résumé complet de gamification"""
@@ -0,0 +1,71 @@
+"""
+Réponses sérialisées de la liste des titres et des cotations, par version du marché.
+
+Le code qui écrit les prix remplit le cache une fois par tick, après le commit: la liste
+sans historique et une cotation par titre. StockViewSet sert ensuite ces données sans
+requête ni sérialisation. Une variante absente (historique inclus, version remplie par
+un autre chemin d'écriture) est calculée et stockée à la première demande. La version
+fait partie des clés: rien n'est invalidé, les anciennes entrées expirent.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Prefetch
+
+from .models import Stock, StockPriceHistory
+from .serializers import StockSerializer
+
+LIST_KEY = 'stocks:list:{}:{}'
+QUOTE_KEY = 'stocks:quote:{}:{}'
+
+
+def stock_queryset(history_limit=None):
+    """Titres, avec les `history_limit` derniers prix préchargés si demandé"""
+    queryset = Stock.objects.all()
+    if history_limit:
+        # Sliced prefetch: one query returning at most history_limit rows per stock
+        latest = StockPriceHistory.objects.order_by('-timestamp')[:history_limit]
+        queryset = queryset.prefetch_related(
+            Prefetch('price_history', queryset=latest, to_attr='recent_price_history')
+        )
+    return queryset
+
+
+def serialize_stocks(history_limit=None):
+    return StockSerializer(
+        stock_queryset(history_limit), many=True, context={'include_history': bool(history_limit)}
+    ).data
+
+
+def _variant(history_limit):
+    return f'history{history_limit}' if history_limit else 'quotes'
+
+
+def _store(version, data, history_limit=None):
+    entries = {LIST_KEY.format(version, _variant(history_limit)): data}
+    if not history_limit:
+        entries.update((QUOTE_KEY.format(version, quote['id']), quote) for quote in data)
+    cache.set_many(entries, settings.STOCK_CACHE_TTL)
+
+
+def populate(version):
+    """Appelé par les écritures de prix avec la nouvelle version du marché"""
+    _store(version, serialize_stocks())
+
+
+def get_list(version, history_limit=None):
+    """Liste sérialisée pour cette version (calculée et stockée si absente)"""
+    data = cache.get(LIST_KEY.format(version, _variant(history_limit)))
+    if data is None:
+        data = serialize_stocks(history_limit)
+        _store(version, data, history_limit)
+    return data
+
+
+def get_quote(version, stock_id):
+    """Cotation sérialisée d'un titre, ou None si elle n'est pas en cache"""
+    return cache.get(QUOTE_KEY.format(version, stock_id))
+
+
+def store_quote(version, quote):
+    cache.set(QUOTE_KEY.format(version, quote['id']), quote, settings.STOCK_CACHE_TTL)
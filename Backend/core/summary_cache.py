@@ -0,0 +1,141 @@
+"""
+Résumé de gamification matérialisé par utilisateur dans le cache.
+
+Une entrée est fraîche pendant GAMIFICATION_SUMMARY_FRESH secondes, puis servie telle
+quelle pendant GAMIFICATION_SUMMARY_STALE secondes supplémentaires pendant qu'un thread
+la reconstruit (stale-while-revalidate). Les événements qui modifient le résumé (trade,
+badge, achievement, notification, streak) l'invalident explicitement.
+"""
+
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.utils import timezone
+
+from . import data_versions, leaderboards, notification_feed, trading_stats
+from .models import DailyStreak, Leaderboard, UserAchievement, UserBadge, UserProfile
+from .serializers import (
+    DailyStreakSerializer, NotificationSerializer, UserAchievementSerializer, UserBadgeSerializer,
+    UserProfileSerializer,
+)
+
+KEY = 'gamification:summary:{}'
+# Incrémentée pour invalider tous les résumés d'un coup (diffusion, reconstruction des classements)
+GENERATION_KEY = 'gamification:summary:generation'
+REFRESH_LOCK_KEY = 'gamification:summary:refresh:{}'
+RANK_TYPES = ['XP', 'PROFIT', 'TRADES']
+
+
+def build_summary(user):
+    """Calcule le résumé complet (requêtes sargables, une par bloc)"""
+    user_profile, created = UserProfile.objects.get_or_create(user=user)
+    user_badges = UserBadge.objects.filter(user=user).select_related('badge')
+    user_achievements = list(UserAchievement.objects.filter(user=user).select_related('achievement'))
+    daily_streak, created = DailyStreak.objects.get_or_create(user=user)
+    recent_notifications = notification_feed.unread_for(user)[:5]
+
+    week_start, week_end = leaderboards.week_bounds()
+    leaderboard_ranks = {lb_type.lower(): None for lb_type in RANK_TYPES}
+    leaderboard_ranks.update(
+        (lb_type.lower(), rank)
+        for lb_type, rank in Leaderboard.objects.filter(
+            user=user, leaderboard_type__in=RANK_TYPES, period_start=week_start
+        ).values_list('leaderboard_type', 'rank')
+    )
+
+    # Cumul quotidien: au plus sept lignes par titre échangé
+    week_trades = trading_stats.user_totals(user, timezone.localdate(week_start), timezone.localdate(week_end))
+    weekly_stats = {
+        'trades_count': week_trades['trades_count'],
+        # Montant échangé (contrat historique de la clé); le P/L réalisé a sa propre clé
+        'weekly_profit': week_trades['notional'],
+        'weekly_realized_pl': week_trades['realized_pl'],
+        'xp_gained': sum(
+            user_achievement.achievement.reward_xp
+            for user_achievement in user_achievements
+            if user_achievement.earned_at and user_achievement.earned_at >= week_start
+        ),
+    }
+
+    return {
+        'user_profile': UserProfileSerializer(user_profile).data,
+        'badges': UserBadgeSerializer(user_badges, many=True).data,
+        'achievements': UserAchievementSerializer(user_achievements, many=True).data,
+        'daily_streak': DailyStreakSerializer(daily_streak).data,
+        'leaderboard_ranks': leaderboard_ranks,
+        'recent_notifications': NotificationSerializer(recent_notifications, many=True).data,
+        'progress_to_next_level': user_profile.xp_progress,
+        'weekly_stats': weekly_stats,
+    }
+
+
+def _generation():
+    return cache.get(GENERATION_KEY, 0)
+
+
+def refresh(user, generation=None):
+    """Reconstruit et stocke le résumé; retourne les données"""
+    generation = _generation() if generation is None else generation
+    started = time.time()
+    data = build_summary(user)
+    key = KEY.format(user.id)
+    current = cache.get(key)
+    # Invalidé pendant la reconstruction: ne pas stocker un résumé déjà périmé
+    if current is None or current.get('invalidated_at', 0) <= started:
+        cache.set(
+            key,
+            {'data': data, 'built_at': started, 'generation': generation},
+            settings.GAMIFICATION_SUMMARY_FRESH + settings.GAMIFICATION_SUMMARY_STALE,
+        )
+    return data
+
+
+def get_summary(user):
+    """Résumé de l'utilisateur: une lecture de cache si l'entrée est valide"""
+    key = KEY.format(user.id)
+    values = cache.get_many([GENERATION_KEY, key])
+    generation = values.get(GENERATION_KEY, 0)
+    entry = values.get(key)
+    if entry is None or 'data' not in entry or entry['generation'] != generation:
+        return refresh(user, generation)
+    if time.time() - entry['built_at'] > settings.GAMIFICATION_SUMMARY_FRESH:
+        _schedule_refresh(user)
+    return entry['data']
+
+
+def _schedule_refresh(user):
+    """Reconstruit en arrière-plan; un seul thread par utilisateur grâce au verrou du cache"""
+    lock_key = REFRESH_LOCK_KEY.format(user.id)
+    if not cache.add(lock_key, True, settings.GAMIFICATION_SUMMARY_FRESH):
+        return
+    threading.Thread(target=_background_refresh, args=(user, lock_key), daemon=True).start()
+
+
+def _background_refresh(user, lock_key):
+    try:
+        refresh(user)
+    finally:
+        cache.delete(lock_key)
+        connections.close_all()
+
+
+def invalidate(*user_ids):
+    """Invalide le résumé des utilisateurs donnés (marqueur daté plutôt que suppression)"""
+    data_versions.bump_users(*user_ids)
+    marker = {'invalidated_at': time.time()}
+    cache.set_many(
+        {KEY.format(user_id): marker for user_id in user_ids},
+        settings.GAMIFICATION_SUMMARY_FRESH + settings.GAMIFICATION_SUMMARY_STALE,
+    )
+
+
+def invalidate_all():
+    """Invalide tous les résumés (une seule écriture)"""
+    data_versions.bump_all_users()
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 1, None)
@@ -0,0 +1,1509 @@
+import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+import numpy as np
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import (
+    admin_metrics, candles, data_versions, gamification_queue, live_leaderboard, market_engine, mission_assignment,
+    price_models, price_stream, summary_cache, trading_stats, user_events,
+)
+from .leaderboards import build_all_leaderboards
+from .models import (
+    Achievement, Badge, DailyTradingStats, GamificationEvent, Leaderboard, Mission, Notification, NotificationReceipt,
+    Portfolio, PriceCandle, Stock, StockPriceHistory, Transaction, UserBadge, UserMission, UserProfile,
+)
+from .portfolio_valuation import value_portfolio
+from .serializers import StockSummarySerializer
+from .trade_engine import XP_PER_TRADE, TradeError, execute_trade
+
+
+def create_stocks(count, price='100.00'):
+    return Stock.objects.bulk_create([
+        Stock(symbol=f'TST{i}', name=f'Test {i}', current_price=Decimal(price)) for i in range(count)
+    ])
+
+
+class MarketTickTests(TestCase):
+    def tick_queries(self, **kwargs):
+        with CaptureQueriesContext(connection) as queries:
+            stocks = market_engine.apply_tick(rng=price_models.make_rng(1), **kwargs)
+        return len(queries.captured_queries), stocks
+
+    def test_tick_writes_every_stock_in_constant_queries(self):
+        create_stocks(3)
+        few, stocks = self.tick_queries()
+        self.assertEqual(StockPriceHistory.objects.count(), 3)
+
+        # Bougies recréées comme au premier tick (pas de fusion)
+        PriceCandle.objects.all().delete()
+        Stock.objects.bulk_create([
+            Stock(symbol=f'MORE{i}', name=f'More {i}', current_price=Decimal('50.00')) for i in range(20)
+        ])
+        many, stocks = self.tick_queries()
+        self.assertEqual(few, many)
+        self.assertEqual(len(stocks), 23)
+        self.assertEqual(StockPriceHistory.objects.count(), 3 + 23)
+        for stock in Stock.objects.all():
+            self.assertEqual(stock.current_price, stock.price_history.first().price)
+            # Tirage uniforme dans ±5 % par défaut
+            change = abs(stock.current_price - stock.previous_price)
+            self.assertLessEqual(change, stock.previous_price * Decimal('0.05') + Decimal('0.01'))
+
+    def test_multi_step_tick_persists_final_prices(self):
+        stocks = create_stocks(2)
+        expected = market_engine.simulate_market(stocks, 'gbm', steps=50, rng=price_models.make_rng(7))[-1]
+        market_engine.apply_tick('gbm', steps=50, rng=price_models.make_rng(7))
+
+        prices = list(Stock.objects.order_by('id').values_list('current_price', flat=True))
+        self.assertEqual(prices, [Decimal(f'{price:.2f}') for price in expected])
+        # Seul le prix final est historisé
+        self.assertEqual(StockPriceHistory.objects.count(), 2)
+
+    def test_queryset_tick_leaves_other_stocks(self):
+        stocks = create_stocks(3)
+        market_engine.apply_tick(queryset=Stock.objects.filter(pk=stocks[0].pk), low=0.01, high=0.02)
+        self.assertGreater(Stock.objects.get(pk=stocks[0].pk).current_price, Decimal('100.00'))
+        self.assertEqual(
+            list(Stock.objects.exclude(pk=stocks[0].pk).values_list('current_price', flat=True)),
+            [Decimal('100.00')] * 2,
+        )
+
+
+class PriceModelTests(TestCase):
+    PRICES = [10.0, 100.0, 1000.0]
+
+    def test_seeded_paths_are_reproducible(self):
+        for name in price_models.PRICE_MODELS:
+            model = price_models.get_model(name)
+            paths = model.simulate(self.PRICES, 20, rng=price_models.make_rng(42))
+            self.assertEqual(paths.shape, (20, 3), name)
+            self.assertTrue((paths >= price_models.MIN_PRICE).all(), name)
+            self.assertTrue((paths == model.simulate(self.PRICES, 20, rng=price_models.make_rng(42))).all(), name)
+            self.assertFalse((paths == model.simulate(self.PRICES, 20, rng=price_models.make_rng(43))).all(), name)
+
+    def test_model_behaviour(self):
+        rng = price_models.make_rng(0)
+        # Prix plancher
+        crash = price_models.get_model('uniform', low=-0.9, high=-0.9).simulate([0.02], 3, rng=rng)
+        self.assertTrue((crash == price_models.MIN_PRICE).all())
+        # Sans volatilité, le GBM suit exactement son drift
+        flat = price_models.get_model('gbm', drift=0.1, volatility=0.0).simulate([100.0], 1, dt=1.0, rng=rng)
+        self.assertAlmostEqual(flat[-1, 0], 100 * np.exp(0.1))
+        # Retour vers le niveau cible
+        reverting = price_models.get_model('mean_reverting', reversion_speed=50.0, long_run_price=50.0)
+        self.assertAlmostEqual(reverting.simulate([100.0], 200, dt=0.01, rng=rng)[-1, 0], 50.0, delta=10)
+
+    def test_invalid_parameters(self):
+        for name, params in [
+            ('unknown', {}),
+            ('gbm', {'volatility': -0.1}),
+            ('uniform', {'low': 0.1, 'high': -0.1}),
+            ('jump_diffusion', {'jump_intensity': -1.0}),
+            ('mean_reverting', {'reversion_speed': 0.0}),
+        ]:
+            with self.assertRaises(ValueError, msg=name):
+                price_models.get_model(name, **params)
+        with self.assertRaises(ValueError):
+            price_models.get_model('gbm').simulate(self.PRICES, dt=0)
+
+    def test_admin_simulation_endpoint(self):
+        create_stocks(2)
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(username='admin', password='secret', is_staff=True))
+        url = '/api/admin/market-simulation/'
+
+        response = client.post(url, {'model': 'gbm', 'steps': 10, 'seed': 3})
+        self.assertEqual(response.data['updated_stocks'], 2)
+        seeded = list(Stock.objects.values_list('current_price', flat=True))
+        Stock.objects.update(current_price=Decimal('100.00'))
+        client.post(url, {'model': 'gbm', 'steps': 10, 'seed': 3})
+        self.assertEqual(list(Stock.objects.values_list('current_price', flat=True)), seeded)
+
+        for data in ({'model': 'nope'}, {'model': 'mean_reverting', 'reversion_speed': -1},
+                     {'model': 'gbm', 'dt': 'abc'}, {'steps': 'many'}, {'steps': 0}):
+            self.assertEqual(client.post(url, data).status_code, 400, data)
+        self.assertEqual(list(Stock.objects.values_list('current_price', flat=True)), seeded)
+
+
+class MarketTickerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.stocks = create_stocks(3)
+
+    def prices(self):
+        return list(Stock.objects.order_by('id').values_list('current_price', flat=True))
+
+    def test_ticks_buffered_until_flush(self):
+        ticker = market_engine.MarketTicker(model='gbm', flush_every=3, rng=price_models.make_rng(1))
+        ticker.tick()
+        snapshot = ticker.tick()
+        # Publié à chaque tick, écrit en base tous les trois
+        self.assertEqual(snapshot['sequence'], 2)
+        self.assertEqual(StockPriceHistory.objects.count(), 0)
+        self.assertEqual(self.prices(), [Decimal('100.00')] * 3)
+
+        snapshot = ticker.tick()
+        self.assertEqual(StockPriceHistory.objects.count(), 9)
+        self.assertEqual(
+            [str(price) for price in self.prices()],
+            [snapshot['prices'][stock.symbol]['price'] for stock in self.stocks],
+        )
+
+    def test_flush_records_previous_tick_price(self):
+        ticker = market_engine.MarketTicker(model='gbm', flush_every=1, rng=price_models.make_rng(2))
+        ticker.tick()
+        stock = Stock.objects.get(pk=self.stocks[0].pk)
+        self.assertEqual(stock.previous_price, Decimal('100.00'))
+        self.assertNotEqual(stock.current_price, stock.previous_price)
+        self.assertEqual(
+            StockSummarySerializer(stock).data['change'], str(stock.current_price - Decimal('100.00'))
+        )
+
+        # Plusieurs ticks par écriture: prix précédent = avant-dernier tick
+        ticker.flush_every = 2
+        second = ticker.tick()['prices'][stock.symbol]['price']
+        ticker.tick()
+        stock.refresh_from_db()
+        self.assertEqual(str(stock.previous_price), second)
+
+    def test_run_market_is_reproducible_with_seed(self):
+        options = {'ticks': 3, 'seed': 9, 'flush_every': 2, 'interval': 0.001, 'model': 'jump_diffusion'}
+        call_command('run_market', stdout=StringIO(), **options)
+        first = self.prices()
+        self.assertEqual(StockPriceHistory.objects.count(), 9)
+        self.assertEqual(market_engine.get_snapshot()['sequence'], 3)
+
+        Stock.objects.update(current_price=Decimal('100.00'))
+        call_command('run_market', stdout=StringIO(), **options)
+        self.assertEqual(self.prices(), first)
+        self.assertNotEqual(first, [Decimal('100.00')] * 3)
+
+    def test_partial_tick_keeps_other_symbols_in_snapshot(self):
+        market_engine.publish_snapshot(self.stocks)
+        with self.captureOnCommitCallbacks(execute=True):
+            market_engine.apply_tick(queryset=Stock.objects.filter(pk=self.stocks[0].pk), low=0.01, high=0.02)
+
+        snapshot = market_engine.get_snapshot()
+        self.assertEqual(snapshot['prices'].keys(), {'TST0', 'TST1', 'TST2'})
+        self.assertEqual(snapshot['prices']['TST1']['price'], '100.00')
+        self.assertEqual(market_engine.get_ticks_since(1)[0]['changes'].keys(), {'TST0'})
+
+    def test_flush_keeps_price_set_since_load(self):
+        ticker = market_engine.MarketTicker(model='gbm', flush_every=2, rng=price_models.make_rng(4))
+        ticker.tick()
+        # Prix fixé par un admin entre le chargement et l'écriture
+        Stock.objects.filter(pk=self.stocks[0].pk).update(current_price=Decimal('42.00'))
+        ticker.tick()
+
+        prices = self.prices()
+        self.assertEqual(prices[0], Decimal('42.00'))
+        self.assertNotEqual(prices[1:], [Decimal('100.00')] * 2)
+        self.assertFalse(StockPriceHistory.objects.filter(stock=self.stocks[0]).exists())
+        self.assertEqual(StockPriceHistory.objects.count(), 4)
+        # Rechargé: les ticks suivants partent du prix fixé
+        self.assertEqual(ticker.persisted_prices[0], Decimal('42.00'))
+
+
+class ConcurrentSnapshotTests(TransactionTestCase):
+    THREADS = 4
+    TICKS_PER_THREAD = 5
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.stocks = create_stocks(2)
+
+    def publish_many(self, stock, errors):
+        try:
+            for _ in range(self.TICKS_PER_THREAD):
+                market_engine.publish_snapshot([stock])
+        except Exception as e:
+            errors.append(e)
+        finally:
+            connection.close()
+
+    def test_concurrent_publishes_keep_every_tick(self):
+        errors = []
+        threads = [
+            threading.Thread(target=self.publish_many, args=(self.stocks[i % 2], errors)) for i in range(self.THREADS)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        total = self.THREADS * self.TICKS_PER_THREAD
+        ticks = market_engine.get_ticks_since(0)
+        self.assertEqual([tick['sequence'] for tick in ticks], list(range(1, total + 1)))
+        snapshot = market_engine.get_snapshot()
+        self.assertEqual((snapshot['sequence'], snapshot['prices'].keys()), (total, {'TST0', 'TST1'}))
+
+
+class CandleTests(TestCase):
+    def setUp(self):
+        self.stock = create_stocks(1)[0]
+        self.start = datetime(2026, 1, 5, 10, 0, tzinfo=dt_timezone.utc)
+
+    def at(self, seconds, price, volume=0):
+        return (self.stock.id, self.start + timedelta(seconds=seconds), Decimal(price), Decimal(volume))
+
+    def candle(self, interval, offset=0):
+        candle = PriceCandle.objects.get(
+            stock=self.stock, interval=interval, bucket_start=self.start + timedelta(seconds=offset)
+        )
+        return candle.open, candle.high, candle.low, candle.close, candle.volume
+
+    def test_ticks_merge_into_existing_candles(self):
+        candles.record_ticks([self.at(10, '100'), self.at(40, '105', 1), self.at(65, '98', 2)])
+        candles.record_ticks([self.at(90, '110', 3)])
+
+        self.assertEqual(self.candle('1m'), (100, 105, 100, 105, 1))
+        self.assertEqual(self.candle('1m', 60), (98, 110, 98, 110, 5))
+        self.assertEqual(self.candle('5m'), (100, 110, 98, 110, 6))
+        self.assertEqual(PriceCandle.objects.filter(interval='1d').count(), 1)
+
+        # Reconstruction: OHLC recalculé depuis les ticks fournis, volume conservé
+        candles.record_ticks([self.at(0, '90'), self.at(30, '95')], replace=True)
+        self.assertEqual(self.candle('1m'), (90, 95, 90, 95, 1))
+
+    def test_candle_created_concurrently_is_merged(self):
+        candles.record_ticks([self.at(10, '100', 2), self.at(20, '120')])
+        locked_candles = candles._locked_candles
+        reads = []
+
+        def first_read_misses(*args):
+            # Première lecture faite avant que l'autre processus n'ait validé ses bougies
+            reads.append(args)
+            return {} if len(reads) == 1 else locked_candles(*args)
+
+        with mock.patch.object(candles, '_locked_candles', side_effect=first_read_misses):
+            candles.record_ticks([self.at(30, '90', 3)])
+        self.assertEqual(self.candle('1m'), (100, 120, 90, 90, 5))
+        self.assertEqual(PriceCandle.objects.count(), 4)
+
+    def test_trades_add_volume(self):
+        user = User.objects.create_user(username='trader', password='secret')
+        UserProfile.objects.create(user=user, balance=Decimal('10000.00'))
+        execute_trade(user, self.stock, 'BUY', Decimal('3'))
+        execute_trade(user, self.stock, 'SELL', Decimal('1'))
+        self.assertEqual(
+            PriceCandle.objects.filter(stock=self.stock, interval='1d').get().volume, Decimal('4')
+        )
+
+    def test_candles_endpoint(self):
+        candles.record_ticks([self.at(minute * 60, str(100 + minute)) for minute in range(5)])
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(username='viewer', password='secret'))
+        url = f'/api/stocks/{self.stock.id}/candles/'
+
+        response = client.get(url, {'interval': '1m', 'limit': 3})
+        # Les plus récentes, dans l'ordre chronologique
+        self.assertEqual([row['close'] for row in response.data], ['102.00', '103.00', '104.00'])
+        self.assertEqual(len(client.get(url, {'interval': '1m', 'limit': -1}).data), 1)
+        self.assertEqual(client.get(url, {'interval': '1m', 'limit': 'many'}).status_code, 400)
+        self.assertEqual(client.get(url, {'interval': '2m'}).status_code, 400)
+        self.assertEqual(len(client.get(url, {'interval': '5m'}).data), 1)
+
+
+class CompactPriceHistoryTests(TestCase):
+    def setUp(self):
+        self.stock = create_stocks(1)[0]
+        self.old_day = candles.bucket_start(timezone.now() - timedelta(days=40), '1d')
+        StockPriceHistory.objects.bulk_create([
+            StockPriceHistory(stock=self.stock, price=Decimal(price), timestamp=self.old_day + timedelta(hours=hour))
+            for hour, price in ((1, '100'), (2, '120'), (3, '90'), (4, '110'))
+        ] + [StockPriceHistory(stock=self.stock, price=Decimal('130'), timestamp=timezone.now() - timedelta(days=1))])
+        # Bougie du jour déjà alimentée par un trade (volume) avec un OHLC partiel
+        PriceCandle.objects.create(
+            stock=self.stock, interval='1d', bucket_start=self.old_day,
+            open=Decimal('100'), high=Decimal('100'), low=Decimal('100'), close=Decimal('100'), volume=Decimal('5'),
+        )
+
+    def test_old_ticks_rolled_into_candles_and_deleted(self):
+        out = StringIO()
+        call_command('compact_price_history', days=30, batch_size=2, stdout=out)
+        self.assertIn('Compacted 4 tick(s)', out.getvalue())
+        self.assertEqual(list(StockPriceHistory.objects.values_list('price', flat=True)), [Decimal('130')])
+
+        daily = PriceCandle.objects.get(stock=self.stock, interval='1d', bucket_start=self.old_day)
+        self.assertEqual(
+            (daily.open, daily.high, daily.low, daily.close, daily.volume), (100, 120, 90, 110, 5)
+        )
+        old_hours = PriceCandle.objects.filter(interval='1h', bucket_start__lt=self.old_day + timedelta(days=1))
+        self.assertEqual(old_hours.count(), 4)
+
+    def test_trade_extremes_survive_compaction(self):
+        trade_hour = self.old_day + timedelta(hours=2)
+        PriceCandle.objects.filter(interval='1d').update(high=Decimal('150'), low=Decimal('80'))
+        PriceCandle.objects.create(
+            stock=self.stock, interval='1h', bucket_start=trade_hour,
+            open=Decimal('150'), high=Decimal('150'), low=Decimal('150'), close=Decimal('150'), volume=Decimal('5'),
+        )
+        call_command('compact_price_history', days=30, stdout=StringIO())
+
+        daily = PriceCandle.objects.get(stock=self.stock, interval='1d', bucket_start=self.old_day)
+        self.assertEqual((daily.open, daily.high, daily.low, daily.close, daily.volume), (100, 150, 80, 110, 5))
+        hourly = PriceCandle.objects.get(stock=self.stock, interval='1h', bucket_start=trade_hour)
+        self.assertEqual((hourly.open, hourly.high, hourly.low, hourly.volume), (150, 150, 120, 5))
+
+    def test_dry_run_only_reports(self):
+        out = StringIO()
+        call_command('compact_price_history', days=30, dry_run=True, stdout=out)
+        self.assertIn('Would compact 4 tick(s)', out.getvalue())
+        self.assertEqual(StockPriceHistory.objects.count(), 5)
+        with self.assertRaises(CommandError):
+            call_command('compact_price_history', days=0, stdout=out)
+
+
+class PortfolioValuationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='trader', password='secret')
+        UserProfile.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add_holdings(self, stocks, quantity='2', average_price='80.00'):
+        Portfolio.objects.bulk_create([
+            Portfolio(user=self.user, stock=stock, quantity=Decimal(quantity), average_price=Decimal(average_price))
+            for stock in stocks
+        ])
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries.captured_queries)
+
+    def test_value_portfolio_uses_one_query(self):
+        self.add_holdings(create_stocks(5))
+        with self.assertNumQueries(1):
+            holdings, totals = value_portfolio(self.user)
+        self.assertEqual(len(holdings), 5)
+        self.assertEqual(totals['market_value'], Decimal('1000'))
+        self.assertEqual(totals['cost_basis'], Decimal('800'))
+        self.assertEqual(totals['unrealized_pl'], Decimal('200'))
+
+    def test_query_count_independent_of_holdings(self):
+        stocks = create_stocks(12)
+        self.add_holdings(stocks[:2])
+        baseline = {url: self.count_queries(url) for url in ('/api/portfolio/', '/api/me/', '/api/dashboard/')}
+
+        self.add_holdings(stocks[2:])
+        for url, expected in baseline.items():
+            self.assertEqual(self.count_queries(url), expected, url)
+
+    def test_dashboard_portfolio_value(self):
+        self.add_holdings(create_stocks(3))
+        response = self.client.get('/api/dashboard/')
+        self.assertEqual(response.data['portfolio_value'], 600.0)
+
+    def test_valuation_endpoint_totals(self):
+        self.add_holdings(create_stocks(2), quantity='1', average_price='120.00')
+        response = self.client.get('/api/portfolio/valuation/')
+        self.assertEqual(response.data['totals']['unrealized_pl'], -40.0)
+        self.assertEqual(response.data['holdings'][0]['profit_loss'], -20.0)
+
+
+class ConcurrentTradeTests(TransactionTestCase):
+    THREADS = 8
+    TRADES_PER_THREAD = 10
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='busy_trader', password='secret')
+        UserProfile.objects.create(user=self.user, balance=Decimal('10000.00'))
+        self.stock = Stock.objects.create(symbol='CONC', name='Concurrency', current_price=Decimal('10.00'))
+
+    def trade_many(self, trade_type, errors):
+        try:
+            for _ in range(self.TRADES_PER_THREAD):
+                execute_trade(self.user, self.stock, trade_type, Decimal('1'))
+        except Exception as e:
+            errors.append(e)
+        finally:
+            connection.close()
+
+    def run_threads(self, trade_type):
+        errors = []
+        threads = [
+            threading.Thread(target=self.trade_many, args=(trade_type, errors)) for _ in range(self.THREADS)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def test_no_lost_updates_under_concurrent_trades(self):
+        trades = self.THREADS * self.TRADES_PER_THREAD
+        self.run_threads('BUY')
+
+        profile = UserProfile.objects.get(user=self.user)
+        holding = Portfolio.objects.get(user=self.user, stock=self.stock)
+        self.assertEqual(profile.balance, Decimal('10000.00') - trades * Decimal('10.00'))
+        self.assertEqual(profile.total_trades, trades)
+        self.assertEqual(profile.xp, trades * XP_PER_TRADE)
+        self.assertEqual(holding.quantity, trades)
+
+        self.run_threads('SELL')
+
+        profile.refresh_from_db()
+        self.assertEqual(profile.balance, Decimal('10000.00'))
+        self.assertEqual(profile.total_trades, 2 * trades)
+        self.assertFalse(Portfolio.objects.filter(user=self.user).exists())
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 2 * trades)
+
+    def test_rejected_trade_leaves_state_untouched(self):
+        with self.assertRaises(TradeError):
+            execute_trade(self.user, self.stock, 'BUY', Decimal('5000'))
+        profile = UserProfile.objects.get(user=self.user)
+        self.assertEqual(profile.balance, Decimal('10000.00'))
+        self.assertEqual(profile.total_trades, 0)
+        self.assertFalse(Transaction.objects.exists())
+
+
+class GamificationQueueTests(TestCase):
+    ENGINE = 'gamification_engine.process_post_transaction_gamification'
+
+    def setUp(self):
+        self.users = [User.objects.create_user(username=f'queued{i}', password='secret') for i in range(2)]
+        for user in self.users:
+            UserProfile.objects.create(user=user, balance=Decimal('10000.00'))
+        self.stock = create_stocks(1)[0]
+        self.client = APIClient()
+        self.client.force_authenticate(self.users[0])
+
+    def trade(self):
+        return self.client.post('/api/trade/', {'symbol': 'TST0', 'quantity': '1', 'trade_type': 'BUY'})
+
+    def test_claim_marks_events_processing(self):
+        events = [gamification_queue.enqueue(user) for user in self.users]
+        claimed = gamification_queue.claim_batch()
+        self.assertEqual([event.id for event in claimed], [event.id for event in events])
+        self.assertEqual({(event.status, event.attempts) for event in claimed}, {('PROCESSING', 1)})
+        self.assertEqual(gamification_queue.claim_batch(), [])
+
+        # Réservation abandonnée (worker arrêté): reprise après CLAIM_TIMEOUT
+        stale = timezone.now() - gamification_queue.CLAIM_TIMEOUT - timedelta(seconds=1)
+        GamificationEvent.objects.filter(pk=events[0].pk).update(claimed_at=stale)
+        reclaimed = gamification_queue.claim_batch()
+        self.assertEqual([(event.id, event.attempts) for event in reclaimed], [(events[0].id, 2)])
+
+    def test_one_engine_pass_per_user(self):
+        for user in self.users + self.users[:1]:
+            gamification_queue.enqueue(user)
+        with mock.patch(self.ENGINE, return_value={'badges_awarded': 0}) as engine:
+            self.assertEqual(gamification_queue.process_pending(), (3, 0))
+        self.assertEqual(engine.call_count, 2)
+        self.assertEqual(
+            list(GamificationEvent.objects.values_list('status', 'result')), [('DONE', {'badges_awarded': 0})] * 3
+        )
+
+    def test_failed_events_retried_then_marked_failed(self):
+        event = gamification_queue.enqueue(self.users[0])
+        with mock.patch(self.ENGINE, side_effect=RuntimeError('engine down')):
+            for attempt in range(1, gamification_queue.MAX_ATTEMPTS):
+                self.assertEqual(gamification_queue.process_pending(), (0, 1))
+                event.refresh_from_db()
+                self.assertEqual((event.status, event.attempts, event.error), ('PENDING', attempt, 'engine down'))
+            gamification_queue.process_pending()
+        event.refresh_from_db()
+        self.assertEqual(event.status, 'FAILED')
+        self.assertIsNotNone(event.processed_at)
+        self.assertEqual(gamification_queue.process_pending(), (0, 0))
+
+    def test_trade_response_and_worker(self):
+        response = self.trade()
+        gamification = response.data['gamification']
+        self.assertEqual((gamification['event_type'], gamification['status']), ('TRADE', 'pending'))
+
+        with mock.patch(self.ENGINE, return_value={'xp_gained': 0}):
+            call_command('run_gamification_worker', once=True, stdout=StringIO(), stderr=StringIO())
+        event = self.client.get(f"/api/gamification/events/{gamification['event_id']}/").data
+        self.assertEqual((event['status'], event['result']), ('done', {'xp_gained': 0}))
+        # Événement d'un autre utilisateur: invisible
+        other = APIClient()
+        other.force_authenticate(self.users[1])
+        self.assertEqual(other.get(f"/api/gamification/events/{gamification['event_id']}/").status_code, 404)
+
+    @override_settings(GAMIFICATION_ASYNC=False)
+    def test_inline_mode(self):
+        with mock.patch(self.ENGINE, return_value={'xp_gained': 0}):
+            self.assertEqual(self.trade().data['gamification']['status'], 'done')
+
+        # Erreur du moteur: le trade réussit, l'événement reste en attente pour le worker
+        with mock.patch(self.ENGINE, side_effect=RuntimeError('engine down')):
+            response = self.trade()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['gamification']['status'], 'pending')
+        event = GamificationEvent.objects.get(pk=response.data['gamification']['event_id'])
+        self.assertEqual((event.status, event.attempts), ('PENDING', 0))
+        self.assertEqual(Transaction.objects.filter(user=self.users[0]).count(), 2)
+
+
+class GamificationEngineTests(TestCase):
+    def setUp(self):
+        from gamification_engine import GamificationEngine
+
+        self.engine = GamificationEngine()
+        self.user = User.objects.create_user(username='gamer', password='secret')
+        Badge.objects.bulk_create([
+            Badge(name=rule['name'], description=rule['description'], xp_bonus=50)
+            for rule in self.engine.rules if rule['type'] == 'badge'
+        ])
+        Achievement.objects.bulk_create([
+            Achievement(name=rule['name'], description=rule['description'], reward_xp=100, reward_money=Decimal('10.00'))
+            for rule in self.engine.rules if rule['type'] == 'achievement'
+        ])
+
+    def make_trader(self, user, trades, holdings):
+        UserProfile.objects.update_or_create(user=user, defaults={'total_trades': trades, 'total_profit_loss': Decimal('5000')})
+        stocks = create_stocks(holdings) if not Stock.objects.exists() else list(Stock.objects.all()[:holdings])
+        Portfolio.objects.bulk_create([
+            Portfolio(user=user, stock=stock, quantity=Decimal('1'), average_price=Decimal('100.00')) for stock in stocks
+        ])
+        Transaction.objects.create(
+            user=user, stock=stocks[0], transaction_type='BUY',
+            quantity=Decimal('1'), price=Decimal('100.00'), total_amount=Decimal('100.00'),
+        )
+
+    def count_queries(self, user):
+        with CaptureQueriesContext(connection) as queries:
+            result = self.engine.process_user_gamification(user)
+        return len(queries.captured_queries), result
+
+    def test_awards_badges_and_achievements_in_bulk(self):
+        self.make_trader(self.user, trades=60, holdings=5)
+        _, result = self.count_queries(self.user)
+
+        self.assertEqual(result['badges_awarded'], 5)
+        self.assertEqual(result['achievements_awarded'], 4)
+        profile = UserProfile.objects.get(user=self.user)
+        self.assertEqual(profile.xp, 5 * 50 + 4 * 100)
+        self.assertEqual(profile.balance, Decimal('10000.00') + 4 * Decimal('10.00'))
+        self.assertEqual(profile.level, profile.xp // 100 + 1)
+        self.assertEqual(Notification.objects.filter(user=self.user).count(), 9 + 1)  # + passage de niveau
+
+        # Deuxième passage: rien de nouveau
+        _, result = self.count_queries(self.user)
+        self.assertEqual(result['badges_awarded'], 0)
+        self.assertEqual(result['achievements_awarded'], 0)
+
+    def test_query_count_independent_of_awards(self):
+        beginner = User.objects.create_user(username='beginner', password='secret')
+        self.make_trader(beginner, trades=1, holdings=1)
+        self.make_trader(self.user, trades=60, holdings=5)
+
+        few, few_result = self.count_queries(beginner)
+        many, many_result = self.count_queries(self.user)
+        self.assertLess(few_result['badges_awarded'], many_result['badges_awarded'])
+        self.assertEqual(few, many)
+
+    def test_overlapping_evaluation_awards_once(self):
+        from gamification_engine import UserStats
+
+        self.make_trader(self.user, trades=60, holdings=5)
+        # Instantané chargé avant qu'une autre évaluation (worker, endpoint) n'attribue tout
+        stale = UserStats.load(self.user)
+        self.engine.process_user_gamification(self.user)
+        profile = UserProfile.objects.get(user=self.user)
+
+        result = self.engine.process_user_gamification(self.user, stale)
+        self.assertEqual((result['badges_awarded'], result['achievements_awarded']), (0, 0))
+        self.assertEqual(UserProfile.objects.get(user=self.user).xp, profile.xp)
+        self.assertEqual(UserProfile.objects.get(user=self.user).badge_count, 5)
+        self.assertEqual(Notification.objects.filter(user=self.user).count(), 9 + 1)
+
+
+class LeaderboardBuildTests(TestCase):
+    def setUp(self):
+        stock = create_stocks(1)[0]
+        self.users = [User.objects.create_user(username=f'player{i}', password='secret') for i in range(4)]
+        for i, user in enumerate(self.users):
+            UserProfile.objects.create(
+                user=user, xp=[300, 100, 300, 50][i], total_trades=[10, 4, 0, 2][i],
+                successful_trades=[5, 4, 0, 0][i], total_profit_loss=Decimal([10, -5, 0, 20][i]),
+            )
+            Portfolio.objects.create(user=user, stock=stock, quantity=Decimal(i), average_price=Decimal('50.00'))
+            Transaction.objects.create(
+                user=user, stock=stock, transaction_type='BUY',
+                quantity=Decimal(i + 1), price=Decimal('100.00'), total_amount=Decimal(100 * (i + 1)),
+            )
+        # Transactions créées hors de execute_trade: cumul quotidien reconstruit
+        trading_stats.rebuild()
+
+    def ranking(self, leaderboard_type):
+        return list(
+            Leaderboard.objects.filter(leaderboard_type=leaderboard_type)
+            .order_by('rank', 'user_id')
+            .values_list('user__username', 'rank', 'score')
+        )
+
+    def test_builds_every_type_in_constant_queries(self):
+        with CaptureQueriesContext(connection) as few:
+            build_all_leaderboards()
+        for i in range(4, 20):
+            UserProfile.objects.create(user=User.objects.create_user(username=f'player{i}', password='secret'))
+        with CaptureQueriesContext(connection) as many:
+            counts = build_all_leaderboards()
+
+        self.assertEqual(len(few.captured_queries), len(many.captured_queries))
+        self.assertEqual(set(counts), {choice for choice, _ in Leaderboard.LEADERBOARD_TYPES})
+        self.assertTrue(all(count == 20 for count in counts.values()))
+        self.assertEqual(Leaderboard.objects.count(), 20 * len(counts))
+
+    def test_rankings(self):
+        build_all_leaderboards()
+        # Ex aequo: même rang, le suivant saute un rang
+        self.assertEqual([row[:2] for row in self.ranking('XP')], [('player0', 1), ('player2', 1), ('player1', 3), ('player3', 4)])
+        self.assertEqual(self.ranking('PROFIT')[0][:2], ('player3', 1))
+        self.assertEqual(self.ranking('WIN_RATE')[0], ('player1', 1, Decimal('100.00')))
+        self.assertEqual(self.ranking('VOLUME')[0], ('player3', 1, Decimal('400.00')))
+        self.assertEqual(self.ranking('PORTFOLIO_VALUE')[0], ('player3', 1, Decimal('10300.00')))
+
+    def count_queries(self, client, url, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return len(queries.captured_queries), response
+
+    def test_endpoint_query_count_independent_of_rows(self):
+        client = APIClient()
+        client.force_authenticate(self.users[0])
+        badge = Badge.objects.create(name='Trader', description='', badge_type='MILESTONE')
+        UserBadge.objects.create(user=self.users[0], badge=badge)
+        call_command('sync_badge_counts', stdout=StringIO())
+        build_all_leaderboards()
+        few = {
+            url: self.count_queries(client, url, type='XP')[0]
+            for url in ('/api/leaderboard/', '/api/leaderboard/all_leaderboards/')
+        }
+
+        for i in range(4, 20):
+            UserProfile.objects.create(user=User.objects.create_user(username=f'player{i}', password='secret'))
+        build_all_leaderboards()
+        for url, expected in few.items():
+            count, response = self.count_queries(client, url, type='XP')
+            self.assertEqual(count, expected, url)
+            self.assertLessEqual(count, 3, url)
+
+        xp_board = response.data['xp_leaderboard']
+        self.assertEqual(len(xp_board), 10)
+        player0 = next(row for row in xp_board if row['user']['username'] == 'player0')
+        self.assertEqual(player0['user_profile']['badge_count'], 1)
+        self.assertEqual(response.data['user_rank_summary'], {'xp': 1, 'profit': 2, 'trades': 1, 'portfolio_value': 4})
+
+    def test_rebuild_replaces_period(self):
+        build_all_leaderboards()
+        build_all_leaderboards()
+        self.assertEqual(Leaderboard.objects.filter(leaderboard_type='XP').count(), 4)
+
+
+class LiveLeaderboardTests(TestCase):
+    def setUp(self):
+        self.stock = create_stocks(1)[0]
+        self.users = [User.objects.create_user(username=f'live{i}', password='secret') for i in range(3)]
+        for i, user in enumerate(self.users):
+            UserProfile.objects.create(user=user, xp=100 * i)
+        self.service = live_leaderboard.LiveLeaderboards(checkpoint_interval=3600)
+        patcher = mock.patch.object(live_leaderboard, '_service', self.service)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_ranked_board(self):
+        board = live_leaderboard.RankedBoard([(1, Decimal('5')), (2, Decimal('9')), (3, Decimal('5'))])
+        self.assertEqual(board.top(3), [(1, 2, Decimal('9')), (2, 1, Decimal('5')), (2, 3, Decimal('5'))])
+        self.assertEqual(board.rank(3), 2)
+        board.set(3, Decimal('10'))
+        board.add(4, Decimal('1'))
+        self.assertEqual([board.rank(user_id) for user_id in (3, 2, 1, 4)], [1, 2, 3, 4])
+        self.assertIsNone(board.rank(5))
+
+    def test_trade_updates_ranks_without_rebuild(self):
+        self.service.load()
+        self.assertEqual(self.service.rank_of('XP', self.users[0].id), (3, Decimal('0')))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            execute_trade(self.users[0], self.stock, 'BUY', Decimal('3'))
+
+        self.assertEqual(self.service.rank_of('VOLUME', self.users[0].id), (1, Decimal('300.00')))
+        self.assertEqual(self.service.rank_of('TRADES', self.users[0].id), (1, Decimal('1')))
+        self.assertEqual(self.service.rank_of('XP', self.users[0].id), (3, Decimal(XP_PER_TRADE)))
+        self.assertFalse(Leaderboard.objects.exists())
+
+    def test_volume_is_absolute_across_processes(self):
+        self.service.load()
+        other = live_leaderboard.LiveLeaderboards(checkpoint_interval=3600)
+        other.load()
+        with self.captureOnCommitCallbacks(execute=True):
+            execute_trade(self.users[0], self.stock, 'BUY', Decimal('3'))
+
+        # Trade suivant servi par un autre processus: il lit le total de la semaine
+        with mock.patch.object(live_leaderboard, '_service', other):
+            with self.captureOnCommitCallbacks(execute=True):
+                execute_trade(self.users[0], self.stock, 'BUY', Decimal('1'))
+        self.assertEqual(other.rank_of('VOLUME', self.users[0].id), (1, Decimal('400.00')))
+
+        # Prochaine mise à jour de l'utilisateur dans le premier processus: même total absolu
+        self.service.record_trade(self.users[0].id)
+        self.assertEqual(self.service.rank_of('VOLUME', self.users[0].id), (1, Decimal('400.00')))
+        other.checkpoint()
+        self.service.checkpoint()
+        self.assertEqual(
+            Leaderboard.objects.get(user=self.users[0], leaderboard_type='VOLUME').score, Decimal('400.00')
+        )
+
+    def test_checkpoint_and_cold_start(self):
+        self.service.load()
+        self.service.update_profile(self.users[0].id, xp=500)
+        self.assertEqual(self.service.checkpoint(), 3 * len(live_leaderboard.LIVE_TYPES))
+        self.assertEqual(Leaderboard.objects.get(user=self.users[0], leaderboard_type='XP').rank, 1)
+
+        restarted = live_leaderboard.LiveLeaderboards(checkpoint_interval=3600)
+        restarted.load()
+        self.assertEqual(restarted.top('XP', 1), [(1, self.users[0].id, Decimal('500.00'))])
+
+    def test_live_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(self.users[1])
+        response = client.get('/api/leaderboard/live/', {'type': 'XP', 'limit': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([entry['username'] for entry in response.data['entries']], ['live2', 'live1'])
+        self.assertEqual(response.data['my_rank'], 2)
+        self.assertEqual(client.get('/api/leaderboard/live/', {'type': 'PORTFOLIO_VALUE'}).status_code, 400)
+
+
+class BadgeCountTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', password='secret', is_staff=True)
+        self.users = [User.objects.create_user(username=f'holder{i}', password='secret') for i in range(3)]
+        for user in self.users:
+            UserProfile.objects.create(user=user)
+        self.badge = Badge.objects.create(name='Pionnier', description='', badge_type='SPECIAL', xp_bonus=25)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def badge_counts(self):
+        return list(UserProfile.objects.order_by('user_id').values_list('badge_count', flat=True))
+
+    def test_award_paths_increment_counter(self):
+        user_ids = [user.id for user in self.users[:2]]
+        response = self.client.post(f'/api/admin/badges/{self.badge.id}/award_to_users/', {'user_ids': user_ids}, format='json')
+        self.assertEqual(response.data['awarded_count'], 2)
+        # Déjà attribué: pas de double comptage
+        response = self.client.post('/api/admin/assign-badge/', {'badge_id': self.badge.id, 'user_ids': [user.id for user in self.users]}, format='json')
+        self.assertEqual(response.data['assigned_count'], 1)
+
+        self.assertEqual(self.badge_counts(), [1, 1, 1])
+        self.assertEqual(UserProfile.objects.get(user=self.users[0]).xp, 25)
+
+    def test_profile_render_does_not_count_badges(self):
+        client = APIClient()
+        client.force_authenticate(self.users[0])
+        with CaptureQueriesContext(connection) as queries:
+            client.get('/api/me/')
+        self.assertFalse(any('core_userbadge' in query['sql'] for query in queries.captured_queries))
+
+    def test_sync_badge_counts_repairs_drift(self):
+        UserBadge.objects.create(user=self.users[1], badge=self.badge)
+        UserProfile.objects.filter(user=self.users[2]).update(badge_count=5)
+        out = StringIO()
+        call_command('sync_badge_counts', '--dry-run', stdout=out)
+        self.assertIn('2 profile(s) out of sync', out.getvalue())
+        self.assertEqual(self.badge_counts(), [0, 0, 5])
+
+        call_command('sync_badge_counts', stdout=StringIO())
+        self.assertEqual(self.badge_counts(), [0, 1, 0])
+
+
+class GamificationSummaryCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.stock = create_stocks(1)[0]
+        self.user = User.objects.create_user(username='summary', password='secret')
+        UserProfile.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_summary(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/gamification/')
+        self.assertEqual(response.status_code, 200)
+        return len(queries.captured_queries), response.data
+
+    def test_cache_hit_runs_no_query(self):
+        misses, first = self.get_summary()
+        self.assertGreater(misses, 0)
+        hits, second = self.get_summary()
+        self.assertEqual(hits, 0)
+        self.assertEqual(first, second)
+
+    def test_trade_invalidates_summary(self):
+        self.get_summary()
+        with self.captureOnCommitCallbacks(execute=True):
+            execute_trade(self.user, self.stock, 'BUY', Decimal('2'))
+        queries, data = self.get_summary()
+        self.assertGreater(queries, 0)
+        self.assertEqual(data['weekly_stats']['trades_count'], 1)
+        self.assertEqual(data['user_profile']['total_trades'], 1)
+
+    def test_notification_read_invalidates_summary(self):
+        Notification.objects.create(user=self.user, notification_type='SYSTEM', title='Hi', message='Hello')
+        self.assertEqual(len(self.get_summary()[1]['recent_notifications']), 1)
+        self.client.post('/api/notifications/mark_all_read/')
+        self.assertEqual(self.get_summary()[1]['recent_notifications'], [])
+
+    def test_broadcast_invalidates_every_summary(self):
+        self.get_summary()
+        summary_cache.invalidate_all()
+        self.assertGreater(self.get_summary()[0], 0)
+
+    @override_settings(GAMIFICATION_SUMMARY_FRESH=0)
+    def test_stale_entry_served_while_revalidating(self):
+        self.get_summary()
+        with mock.patch.object(summary_cache, '_schedule_refresh') as schedule:
+            time.sleep(0.01)
+            queries, _ = self.get_summary()
+        self.assertEqual(queries, 0)
+        schedule.assert_called_once_with(self.user)
+
+
+class RunGamificationCommandTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.stock = create_stocks(1)[0]
+        Badge.objects.create(name='Premier Pas', description='', badge_type='MILESTONE', xp_bonus=10)
+        self.users = [User.objects.create_user(username=f'batch{i}', password='secret') for i in range(7)]
+        for user in self.users:
+            UserProfile.objects.create(user=user)
+        for user in self.users[:5]:
+            Transaction.objects.create(
+                user=user, stock=self.stock, transaction_type='BUY',
+                quantity=Decimal('1'), price=Decimal('100.00'), total_amount=Decimal('100.00'),
+            )
+
+    def run_command(self, *args):
+        out = StringIO()
+        call_command('run_gamification', *args, stdout=out, stderr=StringIO())
+        return out.getvalue()
+
+    def test_process_pool_run_and_incremental_checkpoint(self):
+        output = self.run_command('--workers', '2', '--chunk-size', '3')
+        self.assertIn('7 user(s)', output)
+        self.assertIn('5 badge(s)', output)
+        self.assertEqual(UserBadge.objects.count(), 5)
+
+        # Rien de nouveau depuis le checkpoint
+        self.assertIn('0 user(s)', self.run_command('--incremental', '--workers', '1'))
+
+        Transaction.objects.create(
+            user=self.users[6], stock=self.stock, transaction_type='BUY',
+            quantity=Decimal('1'), price=Decimal('100.00'), total_amount=Decimal('100.00'),
+        )
+        output = self.run_command('--incremental', '--workers', '1')
+        self.assertIn('1 user(s)', output)
+        self.assertTrue(UserBadge.objects.filter(user=self.users[6]).exists())
+
+
+class BroadcastNotificationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.admin = User.objects.create_user(username='admin', password='secret', is_staff=True)
+        self.users = [User.objects.create_user(username=f'reader{i}', password='secret') for i in range(3)]
+        self.admin_client = APIClient()
+        self.admin_client.force_authenticate(self.admin)
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def broadcast(self, title='Maintenance'):
+        return self.admin_client.post(
+            '/api/admin/notifications/broadcast/', {'title': title, 'message': 'Ce soir'}, format='json'
+        )
+
+    def test_broadcast_writes_one_row(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.broadcast()
+        self.assertEqual(response.data['sent_count'], 4)
+        self.assertEqual(Notification.objects.count(), 1)
+        self.assertEqual(sum('INSERT INTO "core_notification' in query['sql'] for query in queries.captured_queries), 1)
+
+    def test_only_broadcast_action_writes_shared_rows(self):
+        author, other = self.client_for(self.users[0]), self.client_for(self.users[1])
+        with self.captureOnCommitCallbacks(execute=True):
+            response = author.post(
+                '/api/notifications/', {'notification_type': 'SYSTEM', 'title': 'Note', 'message': 'x'}
+            )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Notification.objects.get().user, self.users[0])
+        self.assertEqual(other.get('/api/notifications/').data['results'], [])
+        published = user_events.read_events(user_events.user_channel(self.users[0].id), 0, 1)
+        self.assertEqual([(event['type'], event['unread_delta']) for event in published], [('system', 1)])
+
+        response = self.admin_client.post('/api/admin/notifications/', {'title': 'T', 'message': 'x'}, format='json')
+        self.assertEqual(response.status_code, 405)
+        self.assertEqual(Notification.objects.filter(user__isnull=True).count(), 0)
+
+    def test_feed_merges_broadcast_with_per_user_state(self):
+        Notification.objects.create(user=self.users[0], notification_type='SYSTEM', title='Perso', message='x')
+        notification_id = self.broadcast().data['notification_id']
+        reader, other = self.client_for(self.users[0]), self.client_for(self.users[1])
+
+        self.assertEqual([row['title'] for row in reader.get('/api/notifications/').data['results']], ['Maintenance', 'Perso'])
+        reader.post(f'/api/notifications/{notification_id}/mark_read/')
+        self.assertTrue(reader.get('/api/notifications/').data['results'][0]['is_read'])
+        self.assertFalse(other.get('/api/notifications/').data['results'][0]['is_read'])
+
+        other.delete(f'/api/notifications/{notification_id}/')
+        self.assertEqual(other.get('/api/notifications/').data['results'], [])
+        self.assertTrue(Notification.objects.filter(pk=notification_id).exists())
+        self.assertEqual(NotificationReceipt.objects.count(), 2)
+
+    def test_mark_all_read_and_late_joiners(self):
+        self.broadcast()
+        reader = self.client_for(self.users[2])
+        reader.post('/api/notifications/mark_all_read/')
+        self.assertTrue(all(row['is_read'] for row in reader.get('/api/notifications/').data['results']))
+        self.assertEqual(self.client_for(self.users[2]).get('/api/gamification/').data['recent_notifications'], [])
+
+        late = User.objects.create_user(username='late', password='secret')
+        self.assertEqual(self.client_for(late).get('/api/notifications/').data['results'], [])
+
+
+class PriceStreamTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.stocks = create_stocks(3)
+
+    def publish(self, *prices):
+        for stock, price in zip(self.stocks, prices):
+            stock.current_price = Decimal(price)
+        return market_engine.publish_snapshot(self.stocks)
+
+    def parse(self, event):
+        fields = dict(line.split(': ', 1) for line in event.strip().split('\n'))
+        return fields['event'], int(fields['id']), json.loads(fields['data'])
+
+    def test_snapshot_then_coalesced_deltas(self):
+        self.publish('10.00', '20.00', '30.00')
+        stream = price_stream.PriceStream(['TST0', 'TST1'])
+        retry, snapshot = stream.opening(market_engine.get_snapshot())
+        self.assertTrue(retry.startswith('retry:'))
+        self.assertEqual(self.parse(snapshot)[2]['prices'].keys(), {'TST0', 'TST1'})
+
+        # Deux ticks manqués: un seul delta, seulement les symboles suivis qui ont bougé
+        self.publish('11.00', '20.00', '31.00')
+        latest = self.publish('12.00', '20.00', '32.00')
+        event, sequence, data = self.parse(stream.advance(latest))
+        self.assertEqual((event, sequence, data['prices']), ('prices', 3, {'TST0': '12.00'}))
+        self.assertIsNone(stream.advance(self.publish('12.00', '20.00', '33.00')))
+
+    def test_resume_from_last_event_id(self):
+        self.publish('10.00', '20.00', '30.00')
+        self.publish('10.00', '21.00', '30.00')
+        self.publish('10.00', '21.00', '31.00')
+
+        retry, delta = price_stream.PriceStream(last_event_id=1).opening(market_engine.get_snapshot())
+        self.assertEqual(self.parse(delta)[2]['prices'], {'TST1': '21.00', 'TST2': '31.00'})
+
+        with override_settings(MARKET_STREAM_BUFFER=2):
+            self.publish('11.00', '21.00', '31.00')
+        # Séquence sortie du tampon: snapshot complet
+        retry, snapshot = price_stream.PriceStream(last_event_id=1).opening(market_engine.get_snapshot())
+        self.assertEqual(self.parse(snapshot)[0], 'snapshot')
+
+    def test_event_generator_heartbeat_and_deadline(self):
+        self.publish('10.00', '20.00', '30.00')
+        broadcaster = mock.Mock()
+        broadcaster.wait.side_effect = lambda sequence, timeout: time.sleep(timeout)
+        events = list(price_stream.events(
+            price_stream.PriceStream(), broadcaster, heartbeat=0.01, max_duration=0.05
+        ))
+        self.assertEqual(events[1].split('\n')[1], 'event: snapshot')
+        self.assertIn(price_stream.HEARTBEAT, events[2:])
+
+    def test_stream_endpoint(self):
+        self.publish('10.00', '20.00', '30.00')
+        with override_settings(MARKET_STREAM_MAX_DURATION=0.01):
+            response = self.client.get('/api/stream/prices/', {'symbols': 'tst2'})
+            body = b''.join(response.streaming_content).decode()
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertIn('"prices":{"TST2":', body)
+        self.assertNotIn('TST0', body)
+
+
+class UserEventTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user(username='listener', password='secret')
+        UserProfile.objects.create(user=self.user, balance=Decimal('10000.00'))
+        self.stock = create_stocks(1)[0]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def poll(self, last_event_id=None):
+        params = {'timeout': 0}
+        if last_event_id:
+            params['last_event_id'] = last_event_id
+        return self.client.get('/api/events/', params).data
+
+    def test_trade_badges_and_read_state_are_delivered_in_order(self):
+        from gamification_engine import GamificationEngine
+
+        Badge.objects.create(name='Premier Pas', description='x', badge_type='TRADING', xp_bonus=10)
+        start = self.poll()
+        self.assertEqual((start['unread_count'], start['events']), (0, []))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            execute_trade(self.user, self.stock, 'BUY', Decimal('2.5'))
+        with self.captureOnCommitCallbacks(execute=True):
+            GamificationEngine().process_user_gamification(self.user)
+        update = self.poll(start['last_event_id'])
+        self.assertEqual([event['type'] for event in update['events']][:2], ['trade', 'badge'])
+        self.assertEqual(update['events'][0]['data']['symbol'], 'TST0')
+        # Même séquence sur le flux SSE
+        self.client.force_login(self.user)
+        with override_settings(USER_EVENTS_MAX_DURATION=0.01):
+            response = self.client.get('/api/stream/events/', HTTP_LAST_EVENT_ID=start['last_event_id'])
+            body = b''.join(response.streaming_content).decode()
+        self.assertIn('event: trade\n', body)
+        self.assertIn('"quantity":"2.5"', body)
+        self.assertIn('event: badge\n', body)
+        unread = sum(event['unread_delta'] for event in update['events'])
+        self.assertEqual(unread, Notification.objects.filter(user=self.user).count())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/notifications/mark_all_read/')
+        read = self.poll(update['last_event_id'])
+        self.assertEqual([(event['type'], event['unread_delta']) for event in read['events']], [('unread', -unread)])
+
+    def test_broadcast_reaches_every_user_channel(self):
+        start = self.poll()
+        admin = APIClient()
+        admin.force_authenticate(User.objects.create_user(username='boss', password='secret', is_staff=True))
+        admin.post('/api/admin/notifications/broadcast/', {'title': 'Maintenance', 'message': 'Ce soir'}, format='json')
+
+        events = self.poll(start['last_event_id'])['events']
+        self.assertEqual([(event['type'], event['data']['title']) for event in events], [('notification', 'Maintenance')])
+
+    def test_expired_events_request_resync(self):
+        start = self.poll()
+        for i in range(2):
+            user_events.publish(user_events.user_channel(self.user.id), 'trade', {'n': i})
+        cache.delete(user_events.EVENT_KEY.format(user_events.user_channel(self.user.id), 1))
+        self.assertTrue(self.poll(start['last_event_id'])['resync'])
+
+    def test_stream_endpoint(self):
+        self.assertEqual(self.client_class().get('/api/stream/events/').status_code, 401)
+        self.client.force_login(self.user)
+        user_events.publish(user_events.user_channel(self.user.id), 'trade', {'n': 1})
+        with override_settings(USER_EVENTS_MAX_DURATION=0.01):
+            response = self.client.get('/api/stream/events/', HTTP_LAST_EVENT_ID='0-0')
+            body = b''.join(response.streaming_content).decode()
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertIn('event: hello\ndata: {"unread_count":0}', body)
+        self.assertIn('event: trade\ndata: {"data":{"n":1},"unread_delta":0}', body)
+
+
+class ConcurrentPublishTests(TransactionTestCase):
+    THREADS = 4
+    EVENTS_PER_THREAD = 10
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def publish_many(self, published, errors):
+        try:
+            for i in range(self.EVENTS_PER_THREAD):
+                published.append(user_events.publish(user_events.BROADCAST, 'notification', {'n': i}))
+        except Exception as e:
+            errors.append(e)
+        finally:
+            connection.close()
+
+    def test_concurrent_publishes_get_distinct_sequences(self):
+        published, errors = [], []
+        threads = [threading.Thread(target=self.publish_many, args=(published, errors)) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        total = self.THREADS * self.EVENTS_PER_THREAD
+        self.assertEqual(sorted(published), list(range(1, total + 1)))
+        events = user_events.read_events(user_events.BROADCAST, 0, total)
+        self.assertEqual([event['sequence'] for event in events], list(range(1, total + 1)))
+        self.assertEqual(cache.get(user_events.SEQUENCE_KEY.format(user_events.BROADCAST)), total)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user, self.other = (User.objects.create_user(username=name, password='secret') for name in ('etag', 'other'))
+        for user in (self.user, self.other):
+            UserProfile.objects.create(user=user, balance=Decimal('10000.00'))
+        self.stocks = create_stocks(2)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def revalidate(self, url, response):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_stock_list_not_modified_until_prices_change(self):
+        first = self.client.get('/api/stocks/')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.revalidate('/api/stocks/', first).status_code, 304)
+        self.assertNotEqual(self.client.get('/api/stocks/?include=history')['ETag'], first['ETag'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            market_engine.persist_prices(self.stocks, [101.0, 99.0])
+        changed = self.revalidate('/api/stocks/', first)
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.data[0]['current_price'], '101.00')
+
+    def test_django_admin_stock_edits_change_market_version(self):
+        site = Client()
+        site.force_login(User.objects.create_superuser(username='root', password='secret'))
+        stock = self.stocks[0]
+        form = {
+            'symbol': stock.symbol, 'name': stock.name, 'current_price': '120.00', 'previous_price': '',
+            'volume': 0, 'drift': '0.0500', 'volatility': '0.2500', '_save': 'Save',
+        }
+        first = self.client.get('/api/stocks/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(site.post(f'/admin/core/stock/{stock.id}/change/', form).status_code, 302)
+        changed = self.revalidate('/api/stocks/', first)
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual((changed.data[0]['current_price'], changed.data[0]['change']), ('120.00', '20.00'))
+        self.assertEqual(stock.price_history.get().price, Decimal('120.00'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            site.post(f'/admin/core/stock/{stock.id}/change/', {**form, 'name': 'Renamed'})
+        renamed = self.revalidate('/api/stocks/', changed)
+        self.assertEqual(renamed.data[0]['name'], 'Renamed')
+        self.assertEqual(stock.price_history.count(), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            site.post(f'/admin/core/stock/{stock.id}/delete/', {'post': 'yes'})
+        self.assertEqual(len(self.revalidate('/api/stocks/', renamed).data), 1)
+
+    def test_dashboard_and_me_follow_user_version(self):
+        for url in ('/api/dashboard/', '/api/me/'):
+            first = self.client.get(url)
+            self.assertEqual(self.revalidate(url, first).status_code, 304)
+            self.assertEqual(
+                self.client.get(url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified']).status_code, 304
+            )
+
+            with self.captureOnCommitCallbacks(execute=True):
+                execute_trade(self.other, self.stocks[0], 'BUY', 1)
+            self.assertEqual(self.revalidate(url, first).status_code, 304)
+            with self.captureOnCommitCallbacks(execute=True):
+                execute_trade(self.user, self.stocks[0], 'BUY', 1)
+            self.assertEqual(self.revalidate(url, first).status_code, 200)
+
+    def test_versions_survive_cache_reset(self):
+        before = data_versions.current_versions(self.user)
+        cache.clear()
+        after = data_versions.current_versions(self.user)
+        self.assertTrue(all(new > old for new, old in zip(after, before)))
+
+
+class StockCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.stocks = create_stocks(3)
+
+    def test_tick_populates_list_and_quotes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            market_engine.persist_prices(self.stocks, [101.0, 102.0, 103.0])
+        with self.assertNumQueries(0):
+            listed = self.client.get('/api/stocks/').json()
+            quote = self.client.get(f'/api/stocks/{self.stocks[1].id}/').json()
+        self.assertEqual([row['current_price'] for row in listed], ['101.00', '102.00', '103.00'])
+        self.assertEqual((quote['symbol'], quote['change']), ('TST1', '2.00'))
+
+        # Variante avec historique: calculée une fois par version
+        self.assertEqual(len(self.client.get('/api/stocks/?include=history&history_limit=1').json()[0]['price_history']), 1)
+        with self.assertNumQueries(0):
+            self.client.get('/api/stocks/?include=history&history_limit=1')
+
+    def test_admin_price_edit_is_served_on_next_read(self):
+        self.client.get('/api/stocks/')
+        admin = APIClient()
+        admin.force_authenticate(User.objects.create_user(username='admin', password='secret', is_staff=True))
+        with self.captureOnCommitCallbacks(execute=True):
+            admin.patch(f'/api/admin/stocks/{self.stocks[0].id}/', {'current_price': '150.00'}, format='json')
+        self.assertEqual(self.client.get('/api/stocks/').json()[0]['current_price'], '150.00')
+        self.assertEqual(self.client.get(f'/api/stocks/{self.stocks[0].id}/').json()['current_price'], '150.00')
+
+
+class CursorPaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='pager', password='secret')
+        self.stock = create_stocks(1)[0]
+        Transaction.objects.bulk_create([
+            Transaction(user=self.user, stock=self.stock, transaction_type='BUY', quantity=1,
+                        price=Decimal('1.00'), total_amount=Decimal('1.00'))
+            for _ in range(7)
+        ])
+        # Plusieurs transactions à la même date: l'id départage
+        tied = timezone.now()
+        Transaction.objects.filter(id__in=Transaction.objects.order_by('id').values('id')[:4]).update(timestamp=tied)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def walk(self, url):
+        ids, pages = [], 0
+        while url:
+            response = self.client.get(url)
+            ids += [row['id'] for row in response.data['results']]
+            url, pages = response.data['next'], pages + 1
+        return ids, pages
+
+    def test_transactions_pages_are_stable_and_complete(self):
+        ids, pages = self.walk('/api/transactions/?page_size=2')
+        expected = list(Transaction.objects.order_by('-timestamp', '-id').values_list('id', flat=True))
+        self.assertEqual((ids, pages), (expected, 4))
+
+    def test_admin_lists_are_paginated(self):
+        admin = User.objects.create_user(username='admin', password='secret', is_staff=True)
+        self.client.force_authenticate(admin)
+        self.assertEqual(len(self.walk('/api/admin/transactions/?page_size=3')[0]), 7)
+        self.assertEqual(self.walk('/api/admin/users/?page_size=1')[0], [admin.id, self.user.id])
+
+
+class AdminMetricsTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', password='secret', is_staff=True)
+        UserProfile.objects.create(user=self.admin, balance=Decimal('10000.00'))
+        self.stock = create_stocks(1)[0]
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def trade(self, trade_type, amount, record=True):
+        trade = Transaction.objects.create(
+            user=self.admin, stock=self.stock, transaction_type=trade_type, quantity=1,
+            price=Decimal(amount), total_amount=Decimal(amount),
+        )
+        if record:
+            trading_stats.record_trade(trade)
+        return trade
+
+    def test_refresh_reads_the_rollup(self):
+        self.trade('BUY', '10.00')
+        self.trade('SELL', '5.00')
+        snapshot = admin_metrics.refresh()
+        self.assertEqual((snapshot.total_transactions, snapshot.buy_transactions), (2, 1))
+
+        self.trade('BUY', '1.50')
+        snapshot = admin_metrics.refresh()
+        self.assertEqual((snapshot.total_transactions, snapshot.total_volume), (3, Decimal('16.50')))
+        # Transaction supprimée: seul --full (reconstruction du cumul) la retire des totaux
+        Transaction.objects.filter(transaction_type='SELL').delete()
+        self.assertEqual(admin_metrics.refresh().total_transactions, 3)
+        self.assertEqual(admin_metrics.refresh(full=True).total_transactions, 2)
+
+    def test_trade_committed_out_of_id_order_is_counted(self):
+        late = self.trade('BUY', '10.00', record=False)
+        self.trade('BUY', '2.00')
+        self.assertEqual(admin_metrics.refresh().total_transactions, 1)
+        # Le trade d'id inférieur est validé après le rafraîchissement
+        trading_stats.record_trade(late)
+        snapshot = admin_metrics.refresh()
+        self.assertEqual((snapshot.total_transactions, snapshot.total_volume), (2, Decimal('12.00')))
+
+    def test_dashboard_reads_one_row(self):
+        self.trade('BUY', '10.00')
+        call_command('refresh_dashboard_stats', stdout=StringIO())
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/admin/dashboard-stats/')
+        self.assertEqual(response.data['users']['total'], 1)
+        self.assertEqual(response.data['trading_stats']['total_transactions'], 1)
+        self.assertEqual(response.data['gamification_stats']['recent_badges'], 0)
+
+        for url in ('users', 'stocks', 'transactions', 'missions', 'badges'):
+            self.assertEqual(self.client.get(f'/api/admin/{url}/stats/').status_code, 200, url)
+        self.assertEqual(self.client.get('/api/admin/transactions/stats/').data['buy_transactions'], 1)
+
+
+class TradingStatsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='trader', password='secret')
+        UserProfile.objects.create(user=self.user, balance=Decimal('10000.00'))
+        self.stocks = create_stocks(2)
+
+    def rollup(self):
+        return list(
+            DailyTradingStats.objects.order_by('stock_id')
+            .values_list('stock__symbol', 'buy_count', 'sell_count', 'volume', 'notional', 'realized_pl')
+        )
+
+    def test_trades_update_daily_row(self):
+        execute_trade(self.user, self.stocks[0], 'BUY', Decimal('10'))
+        execute_trade(self.user, self.stocks[1], 'BUY', Decimal('1'))
+        Stock.objects.filter(pk=self.stocks[0].pk).update(current_price=Decimal('120.00'))
+        execute_trade(self.user, self.stocks[0], 'SELL', Decimal('4'))
+
+        self.assertEqual(self.rollup(), [
+            ('TST0', 1, 1, Decimal('14'), Decimal('1480.00'), Decimal('80.00')),
+            ('TST1', 1, 0, Decimal('1'), Decimal('100.00'), Decimal('0.00')),
+        ])
+        incremental = self.rollup()
+        # Reconstruction depuis les transactions: mêmes lignes, coût moyen rejoué
+        DailyTradingStats.objects.update(realized_pl=0, buy_count=0)
+        call_command('rebuild_trading_stats', stdout=StringIO())
+        self.assertEqual(self.rollup(), incremental)
+
+    def test_rebuild_reads_under_profile_locks(self):
+        execute_trade(self.user, self.stocks[0], 'BUY', Decimal('1'))
+        with CaptureQueriesContext(connection) as queries:
+            trading_stats.rebuild()
+        sql = [query['sql'] for query in queries.captured_queries]
+
+        def position(fragment):
+            return next(i for i, statement in enumerate(sql) if fragment in statement)
+
+        # Profils verrouillés, puis lecture, suppression et réécriture dans la même transaction
+        self.assertTrue(sql[0].startswith('SAVEPOINT'))
+        self.assertLess(position('FROM "core_userprofile"'), position('FROM "core_transaction"'))
+        self.assertLess(position('FROM "core_transaction"'), position('DELETE FROM "core_dailytradingstats"'))
+        self.assertTrue(sql[-1].startswith('RELEASE SAVEPOINT'))
+        self.assertEqual(self.rollup(), [('TST0', 1, 0, Decimal('1'), Decimal('100.00'), Decimal('0.00'))])
+
+    def test_readers_use_rollup(self):
+        execute_trade(self.user, self.stocks[0], 'BUY', Decimal('2'))
+        Stock.objects.filter(pk=self.stocks[0].pk).update(current_price=Decimal('150.00'))
+        execute_trade(self.user, self.stocks[0], 'SELL', Decimal('1'))
+
+        weekly = summary_cache.build_summary(self.user)['weekly_stats']
+        self.assertEqual((weekly['trades_count'], weekly['weekly_profit']), (2, Decimal('350.00')))
+        self.assertEqual(weekly['weekly_realized_pl'], Decimal('50.00'))
+
+        build_all_leaderboards()
+        self.assertEqual(
+            Leaderboard.objects.get(leaderboard_type='VOLUME', user=self.user).score, Decimal('350.00')
+        )
+        daily = admin_metrics.transaction_stats(admin_metrics.refresh())['daily']
+        self.assertEqual(len(daily), 1)
+        self.assertEqual(
+            (daily[0]['buy_transactions'], daily[0]['sell_transactions'], daily[0]['volume']), (1, 1, 350.0)
+        )
+
+
+class MissionAssignmentTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', password='secret', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.missions = [
+            Mission.objects.create(title=f'Daily {i}', description='', mission_type='DAILY', reward_xp=10)
+            for i in range(3)
+        ]
+        Mission.objects.create(title='Weekly', description='', mission_type='WEEKLY', reward_xp=10)
+
+    def create_users(self, count):
+        return User.objects.bulk_create([User(username=f'member{i}') for i in range(count)])
+
+    def test_daily_missions_in_batched_statements(self):
+        self.create_users(9)
+        UserMission.objects.create(user=self.admin, mission=self.missions[0])
+        # Missions, ids des utilisateurs, puis sous savepoint: verrou, attributions existantes,
+        # INSERT; lot vide final
+        with self.assertNumQueries(8):
+            response = self.client.post('/api/admin/missions/create_daily_missions/')
+        self.assertEqual(response.data['created_count'], 10 * 3 - 1)
+        self.assertEqual(UserMission.objects.count(), 30)
+        # Relancée: rien de nouveau
+        self.assertEqual(self.client.post('/api/admin/missions/create_daily_missions/').data['created_count'], 0)
+
+        mission = Mission.objects.create(title='Daily 3', description='', mission_type='DAILY', reward_xp=10)
+        # Lots de 4 utilisateurs: six requêtes par lot (savepoint compris)
+        with self.assertNumQueries(3 * 6 + 1):
+            created = mission_assignment.assign(User.objects.all(), [mission.id], batch_size=4)
+        self.assertEqual(created, 10)
+
+    def test_sampled_daily_missions(self):
+        self.create_users(5)
+        response = self.client.post('/api/admin/missions/create_daily_missions/', {'missions_per_user': 2})
+        self.assertEqual(response.data['created_count'], 6 * 2)
+        self.assertEqual(UserMission.objects.values('user').distinct().count(), 6)
+        response = self.client.post('/api/admin/missions/create_daily_missions/', {'missions_per_user': 0})
+        self.assertEqual(response.status_code, 400)
+
+    def test_sampling_skips_missions_already_held(self):
+        user = self.create_users(1)[0]
+        held = self.missions[0]
+        UserMission.objects.create(user=user, mission=held, progress=0)
+        mission_ids = [mission.id for mission in self.missions]
+        for _ in range(10):
+            UserMission.objects.filter(user=user).exclude(mission=held).delete()
+            created = mission_assignment.assign(User.objects.filter(id=user.id), mission_ids, missions_per_user=2)
+            self.assertEqual(created, 2)
+            self.assertEqual(UserMission.objects.filter(user=user).count(), 3)
+        self.assertEqual(mission_assignment.assign(User.objects.filter(id=user.id), mission_ids), len(mission_ids) - 3)
+        self.assertEqual(mission_assignment.assign(User.objects.filter(id=user.id), mission_ids), 0)
+
+    def test_assign_to_users_skips_unknown_and_existing(self):
+        users = self.create_users(3)
+        mission = self.missions[1]
+        UserMission.objects.create(user=users[0], mission=mission)
+        url = f'/api/admin/missions/{mission.id}/assign_to_users/'
+        with mock.patch.object(data_versions, 'bump_users') as bump_users:
+            response = self.client.post(url, {'user_ids': [user.id for user in users] + [999999]}, format='json')
+        self.assertEqual(response.data['created_count'], 2)
+        self.assertEqual(UserMission.objects.filter(mission=mission).count(), 3)
+        # Versions changées pour les seuls utilisateurs existants
+        self.assertEqual(sorted(bump_users.call_args.args), [user.id for user in users])
+        for user_ids in (['abc'], 'abc', 5):
+            response = self.client.post(url, {'user_ids': user_ids}, format='json')
+            self.assertEqual(response.status_code, 400)
+
+
+class ConcurrentMissionAssignmentTests(TransactionTestCase):
+    def setUp(self):
+        self.mission = Mission.objects.create(title='Daily', description='', mission_type='DAILY', reward_xp=10)
+        User.objects.bulk_create([User(username=f'member{i}') for i in range(20)])
+
+    def assign(self, created, errors):
+        try:
+            created.append(mission_assignment.assign(User.objects.all(), [self.mission.id], batch_size=5))
+        except Exception as e:
+            errors.append(e)
+        finally:
+            connection.close()
+
+    def test_concurrent_assignments_count_each_row_once(self):
+        created, errors = [], []
+        threads = [threading.Thread(target=self.assign, args=(created, errors)) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(sum(created), 20)
+        self.assertEqual(UserMission.objects.count(), 20)
@@ -0,0 +1,128 @@
+"""
+Exécution des trades: verrouille le profil et la position, applique les changements
+de solde et de quantité via des expressions F() et écrit chaque ligne une seule fois.
+"""
+
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from . import gamification_queue, live_leaderboard, summary_cache, trading_stats, user_events
+from .candles import record_ticks
+from .models import Portfolio, Stock, Transaction, UserProfile
+
+XP_PER_TRADE = 10
+CENT = Decimal('0.01')
+
+
+class TradeError(Exception):
+    """Trade refusé (solde ou quantité insuffisants)"""
+
+
+def execute_trade(user, stock, trade_type, quantity):
+    """Exécute un achat ou une vente et retourne un dict décrivant le résultat.
+
+    Les trades concurrents d'un même utilisateur sont sérialisés par le verrou sur le profil.
+    """
+    UserProfile.objects.get_or_create(user=user)
+
+    with transaction.atomic():
+        profile = UserProfile.objects.select_for_update().get(user=user)
+        # Dernier prix validé, lu sans verrouiller le titre: les trades d'un même titre et les
+        # ticks ne s'attendent pas (un tick en cours de validation n'est pas pris en compte)
+        price = Stock.objects.values_list('current_price', flat=True).get(pk=stock.pk)
+        amount = (quantity * price).quantize(CENT)
+        holding = Portfolio.objects.select_for_update().filter(user=user, stock=stock).first()
+
+        profile_updates = {
+            'total_trades': F('total_trades') + 1,
+            'xp': F('xp') + XP_PER_TRADE,
+            'level': Greatest(F('level'), (F('xp') + XP_PER_TRADE) / 100 + 1),
+        }
+        profit_loss = None
+
+        if trade_type == 'BUY':
+            if profile.balance < amount:
+                raise TradeError('Insufficient balance')
+            profile_updates['balance'] = F('balance') - amount
+            new_balance = profile.balance - amount
+
+            if holding is None:
+                Portfolio.objects.create(user=user, stock=stock, quantity=quantity, average_price=price)
+            else:
+                total_quantity = holding.quantity + quantity
+                average_price = (holding.quantity * holding.average_price + amount) / total_quantity
+                Portfolio.objects.filter(pk=holding.pk).update(
+                    quantity=F('quantity') + quantity,
+                    average_price=average_price.quantize(CENT),
+                )
+
+        elif trade_type == 'SELL':
+            if holding is None or holding.quantity < quantity:
+                raise TradeError('Insufficient stock quantity')
+            profit_loss = ((price - holding.average_price) * quantity).quantize(CENT)
+            profile_updates['balance'] = F('balance') + amount
+            profile_updates['total_profit_loss'] = F('total_profit_loss') + profit_loss
+            if profit_loss > 0:
+                profile_updates['successful_trades'] = F('successful_trades') + 1
+            new_balance = profile.balance + amount
+
+            if holding.quantity == quantity:
+                holding.delete()
+            else:
+                Portfolio.objects.filter(pk=holding.pk).update(quantity=F('quantity') - quantity)
+
+        else:
+            raise TradeError(f'Invalid trade type: {trade_type}')
+
+        UserProfile.objects.filter(pk=profile.pk).update(**profile_updates)
+
+        trade = Transaction.objects.create(
+            user=user,
+            stock=stock,
+            transaction_type=trade_type,
+            quantity=quantity,
+            price=price,
+            total_amount=amount,
+        )
+        trading_stats.record_trade(trade, profit_loss)
+
+        # Volume échangé dans les bougies du titre
+        record_ticks([(stock.id, timezone.now(), price, quantity)])
+
+        # Gamification traitée hors du chemin critique par le worker
+        event = gamification_queue.enqueue(user, 'TRADE', {'transaction_id': trade.id})
+
+        new_xp = profile.xp + XP_PER_TRADE
+        transaction.on_commit(lambda: live_leaderboard.get_service().record_trade(
+            user.id,
+            xp=new_xp,
+            total_profit_loss=profile.total_profit_loss + (profit_loss or 0),
+            total_trades=profile.total_trades + 1,
+            successful_trades=profile.successful_trades + (1 if profit_loss and profit_loss > 0 else 0),
+        ))
+        transaction.on_commit(lambda: summary_cache.invalidate(user.id))
+        user_events.publish_on_commit(user.id, 'trade', {
+            'transaction_id': trade.id,
+            'transaction_type': trade_type,
+            'symbol': stock.symbol,
+            'quantity': str(quantity),
+            'price': str(price),
+            'total_amount': str(amount),
+            'new_balance': str(new_balance),
+            'profit_loss': str(profit_loss) if profit_loss is not None else None,
+        })
+
+    return {
+        'transaction': trade,
+        'gamification_event': event,
+        'price': price,
+        'new_balance': new_balance,
+        'profit_loss': profit_loss,
+        'total_profit_loss': profile.total_profit_loss + (profit_loss or 0),
+        'xp': new_xp,
+        'level': max(profile.level, new_xp // 100 + 1),
+    }
@@ -0,0 +1,115 @@
+"""
+Cumul quotidien des trades (DailyTradingStats): une ligne par jour, utilisateur et titre.
+
+record_trade incrémente la ligne du jour dans la transaction du trade; rebuild la
+reconstruit depuis le journal des transactions en rejouant le coût moyen des positions
+pour retrouver le P/L réalisé. Les statistiques par période lisent quelques dizaines de
+lignes au lieu de parcourir les transactions.
+"""
+
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import DailyTradingStats, Transaction, UserProfile
+
+CENT = Decimal('0.01')
+BATCH_SIZE = 1000
+FIELDS = ('buy_count', 'sell_count', 'volume', 'notional', 'realized_pl')
+
+
+def _increments(trade_type, quantity, amount, realized_pl):
+    return {
+        'buy_count': 1 if trade_type == 'BUY' else 0,
+        'sell_count': 1 if trade_type == 'SELL' else 0,
+        'volume': quantity,
+        'notional': amount,
+        'realized_pl': realized_pl or Decimal('0'),
+    }
+
+
+def record_trade(trade, realized_pl=None):
+    """Ajoute un trade au cumul de son jour (à appeler dans la transaction du trade)"""
+    day = timezone.localdate(trade.timestamp)
+    increments = _increments(trade.transaction_type, trade.quantity, trade.total_amount, realized_pl)
+    rows = DailyTradingStats.objects.filter(day=day, user_id=trade.user_id, stock_id=trade.stock_id)
+    updates = {field: F(field) + value for field, value in increments.items()}
+    if rows.update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            DailyTradingStats.objects.create(day=day, user_id=trade.user_id, stock_id=trade.stock_id, **increments)
+    except IntegrityError:
+        # Ligne du jour créée entre-temps par un autre trade
+        rows.update(**updates)
+
+
+def rebuild(batch_size=BATCH_SIZE):
+    """Reconstruit tout le cumul depuis les transactions; retourne le nombre de lignes.
+
+    Lecture et réécriture se font dans une transaction qui verrouille les profils: un trade
+    (execute_trade verrouille le profil) attend la fin de la reconstruction au lieu d'être
+    compté puis effacé par la suppression.
+    """
+    with transaction.atomic():
+        list(UserProfile.objects.select_for_update().order_by('pk').values_list('pk', flat=True))
+        rows = _replay(batch_size)
+        DailyTradingStats.objects.all().delete()
+        DailyTradingStats.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
+
+
+def _replay(batch_size):
+    """Lignes du cumul recalculées à partir du journal des transactions"""
+    rows = {}
+    positions = {}
+    trades = Transaction.objects.order_by('timestamp', 'id').values_list(
+        'user_id', 'stock_id', 'transaction_type', 'quantity', 'price', 'total_amount', 'timestamp'
+    )
+    for user_id, stock_id, trade_type, quantity, price, amount, timestamp in trades.iterator(chunk_size=batch_size):
+        # Même règle de coût moyen que trade_engine.execute_trade
+        held, average_price = positions.get((user_id, stock_id), (Decimal('0'), Decimal('0')))
+        realized_pl = None
+        if trade_type == 'BUY':
+            average_price = price if not held else ((held * average_price + amount) / (held + quantity)).quantize(CENT)
+            held += quantity
+        else:
+            realized_pl = ((price - average_price) * quantity).quantize(CENT)
+            held -= quantity
+        positions[(user_id, stock_id)] = (held, average_price if held > 0 else Decimal('0'))
+
+        day = timezone.localdate(timestamp)
+        row = rows.get((day, user_id, stock_id))
+        if row is None:
+            row = rows[(day, user_id, stock_id)] = DailyTradingStats(day=day, user_id=user_id, stock_id=stock_id)
+            for field in FIELDS:
+                setattr(row, field, 0)
+        for field, value in _increments(trade_type, quantity, amount, realized_pl).items():
+            setattr(row, field, getattr(row, field) + value)
+    return list(rows.values())
+
+
+def user_totals(user, start_day, end_day):
+    """Totaux d'un utilisateur du jour `start_day` au jour `end_day` inclus"""
+    row = DailyTradingStats.objects.filter(user=user, day__range=(start_day, end_day)).aggregate(
+        buys=Sum('buy_count'), sells=Sum('sell_count'), notional=Sum('notional'), realized_pl=Sum('realized_pl'),
+    )
+    return {
+        'trades_count': (row['buys'] or 0) + (row['sells'] or 0),
+        'notional': row['notional'] or Decimal('0'),
+        'realized_pl': row['realized_pl'] or Decimal('0'),
+    }
+
+
+def daily_totals(start_day, end_day):
+    """Totaux de tous les utilisateurs par jour, dans l'ordre chronologique"""
+    return (
+        DailyTradingStats.objects.filter(day__range=(start_day, end_day))
+        .values('day')
+        .annotate(
+            buys=Sum('buy_count'), sells=Sum('sell_count'), notional=Sum('notional'), realized_pl=Sum('realized_pl'),
+        )
+        .order_by('day')
+    )
@@ -34,11 +34,15 @@ urlpatterns = [
     path('admin/market-simulation/', admin_views.admin_market_simulation, name='admin-market-simulation'),
     path('admin/assign-badge/', admin_views.admin_assign_badge, name='admin-assign-badge'),
     path('trade/', views.execute_trade, name='execute-trade'),
+    path('stream/prices/', views.stream_prices, name='stream-prices'),
+    path('stream/events/', views.stream_user_events, name='stream-user-events'),
+    path('events/', views.poll_user_events, name='poll-user-events'),
     path('me/', views.me, name='me'),
     path('current-user/', views.current_user, name='current-user'),
     path('dashboard/', views.dashboard_data, name='dashboard-data'),
     path('gamification/', views.gamification_summary, name='gamification-summary'),
     path('gamification/update/', views.update_gamification, name='update-gamification'),
+    path('gamification/events/<int:pk>/', views.gamification_event, name='gamification-event'),
     path('user-badges/', views.user_badges, name='user-badges'),
     path('user-achievements/', views.user_achievements, name='user-achievements'),
     path('daily-streak/', views.daily_streak, name='daily-streak'),
@@ -0,0 +1,274 @@
+"""
+Événements en direct par utilisateur (notifications, badges, achievements, niveaux, trades).
+
+Chaque canal ('user:<id>' ou 'broadcast' pour les diffusions) a un compteur de séquence
+en base (sequences), recopié dans le cache partagé avec un événement par clé, ce qui
+permet la publication depuis n'importe quel processus (API, worker de gamification). Dans chaque processus, un hub
+unique relit en un seul get_many les compteurs des canaux suivis et réveille les
+connexions SSE / long-poll; une publication locale les réveille immédiatement.
+"""
+
+import asyncio
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from . import sequences
+from .price_stream import HEARTBEAT, RETRY_MS, format_event
+
+BROADCAST = 'broadcast'
+SEQUENCE_KEY = 'events:{}:seq'
+EVENT_KEY = 'events:{}:{}'
+
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+
+def publish(channel, event_type, data, unread_delta=0):
+    """Enregistre un événement et réveille les connexions locales; retourne sa séquence"""
+    with transaction.atomic():
+        # Séquence tirée en base; la ligne verrouillée jusqu'au commit ordonne les écritures
+        # du cache: l'événement est stocké avant que le compteur lu par les hubs n'avance
+        sequence = sequences.next_value(channel)
+        event = {
+            'channel': channel,
+            'sequence': sequence,
+            'type': event_type,
+            'data': data,
+            'unread_delta': unread_delta,
+            'timestamp': time.time(),
+        }
+        cache.set(EVENT_KEY.format(channel, sequence), event, settings.USER_EVENTS_TTL)
+        cache.set(SEQUENCE_KEY.format(channel), sequence, None)
+    get_hub().notify(channel, sequence)
+    return sequence
+
+
+def publish_on_commit(user_id, event_type, data, unread_delta=0):
+    """Publie après le commit de la transaction en cours (rien si elle est annulée)"""
+    transaction.on_commit(lambda: publish(user_channel(user_id), event_type, data, unread_delta))
+
+
+def notification_data(notification):
+    return {
+        'id': notification.pk,
+        'notification_type': notification.notification_type,
+        'title': notification.title,
+        'message': notification.message,
+        'data': notification.data,
+    }
+
+
+def read_events(channel, after, upto):
+    """Événements (after, upto] du canal; None si certains ont expiré (le client doit resynchroniser)"""
+    if upto <= after:
+        return []
+    keys = [EVENT_KEY.format(channel, sequence) for sequence in range(after + 1, upto + 1)]
+    found = cache.get_many(keys)
+    if len(found) != len(keys):
+        return None
+    return [found[key] for key in keys]
+
+
+class EventHub:
+    """Séquences connues des canaux suivis dans ce processus, avec réveil des connexions"""
+
+    def __init__(self, poll_interval):
+        self.poll_interval = poll_interval
+        self.condition = threading.Condition()
+        self.watchers = Counter()
+        self.sequences = {}
+        self.thread = None
+
+    def notify(self, channel, sequence):
+        with self.condition:
+            if channel in self.watchers and sequence > self.sequences.get(channel, 0):
+                self.sequences[channel] = sequence
+                self.condition.notify_all()
+
+    def watch(self, channels):
+        """Suivre des canaux; retourne leurs séquences actuelles"""
+        current = cache.get_many([SEQUENCE_KEY.format(channel) for channel in channels])
+        with self.condition:
+            for channel in channels:
+                self.watchers[channel] += 1
+                sequence = current.get(SEQUENCE_KEY.format(channel), 0)
+                self.sequences[channel] = max(self.sequences.get(channel, 0), sequence)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._poll, daemon=True)
+                self.thread.start()
+            return {channel: self.sequences[channel] for channel in channels}
+
+    def unwatch(self, channels):
+        with self.condition:
+            for channel in channels:
+                self.watchers[channel] -= 1
+                if self.watchers[channel] <= 0:
+                    del self.watchers[channel]
+                    self.sequences.pop(channel, None)
+
+    def _poll(self):
+        """Événements publiés par d'autres processus: une lecture groupée par intervalle"""
+        while True:
+            time.sleep(self.poll_interval)
+            with self.condition:
+                channels = list(self.watchers)
+            if not channels:
+                continue
+            current = cache.get_many([SEQUENCE_KEY.format(channel) for channel in channels])
+            for channel in channels:
+                sequence = current.get(SEQUENCE_KEY.format(channel))
+                if sequence:
+                    self.notify(channel, sequence)
+
+    def latest(self, positions):
+        with self.condition:
+            return {channel: self.sequences.get(channel, 0) for channel in positions}
+
+    def has_new(self, positions):
+        return any(self.sequences.get(channel, 0) > after for channel, after in positions.items())
+
+    def wait(self, positions, timeout):
+        """Attend un événement au-delà des positions {canal: séquence}; True s'il y en a"""
+        with self.condition:
+            return self.condition.wait_for(lambda: self.has_new(positions), timeout)
+
+    async def async_wait(self, positions, timeout):
+        """Variante ASGI: vérifie les séquences en mémoire sans bloquer de thread"""
+        deadline = time.monotonic() + timeout
+        while not self.has_new(positions):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            await asyncio.sleep(min(self.poll_interval, remaining))
+        return True
+
+
+_hub = None
+_hub_lock = threading.Lock()
+
+
+def get_hub():
+    global _hub
+    if _hub is None:
+        with _hub_lock:
+            if _hub is None:
+                _hub = EventHub(settings.USER_EVENTS_POLL_INTERVAL)
+    return _hub
+
+
+class UserEventStream:
+    """Position d'un client sur son canal et celui des diffusions.
+
+    L'identifiant d'événement est '<séquence utilisateur>-<séquence diffusion>'.
+    """
+
+    def __init__(self, user, last_event_id=None):
+        self.user = user
+        self.channels = [user_channel(user.id), BROADCAST]
+        self.positions = self.parse_event_id(last_event_id)
+
+    def parse_event_id(self, event_id):
+        try:
+            user_sequence, broadcast_sequence = (int(part) for part in str(event_id).split('-'))
+        except (TypeError, ValueError):
+            return None
+        return {self.channels[0]: user_sequence, BROADCAST: broadcast_sequence}
+
+    @property
+    def event_id(self):
+        return '-'.join(str(self.positions[channel]) for channel in self.channels)
+
+    def open(self, hub):
+        """Commence le suivi; retourne les événements manqués (ou None: resynchroniser)"""
+        current = hub.watch(self.channels)
+        if self.positions is None:
+            self.positions = current
+            return []
+        if any(self.positions[channel] > current[channel] for channel in self.channels):
+            # Compteurs réinitialisés (cache vidé): repartir de l'état actuel
+            self.positions = current
+            return None
+        return self.collect(current)
+
+    def collect(self, latest):
+        """Événements entre les positions et `latest`, dans l'ordre; avance les positions"""
+        events = []
+        for channel in self.channels:
+            found = read_events(channel, self.positions[channel], latest[channel])
+            if found is None:
+                self.positions = dict(latest)
+                return None
+            events.extend(found)
+        self.positions = dict(latest)
+        return sorted(events, key=lambda event: event['timestamp'])
+
+
+def _opening(stream, unread_count):
+    """Premier événement: compteur de non-lues, les suivants n'en transmettent que les variations"""
+    return [f'retry: {RETRY_MS}\n\n', format_event('hello', {'unread_count': unread_count}, stream.event_id)]
+
+
+def _chunks(stream, found):
+    if found is None:
+        return [format_event('resync', {}, stream.event_id)]
+    return [
+        format_event(event['type'], {'data': event['data'], 'unread_delta': event['unread_delta']}, stream.event_id)
+        for event in found
+    ]
+
+
+def events(stream, unread_count, heartbeat=None, max_duration=None):
+    """Générateur SSE (WSGI) pour un utilisateur"""
+    hub = get_hub()
+    heartbeat = heartbeat or settings.USER_EVENTS_HEARTBEAT
+    deadline = time.monotonic() + (max_duration or settings.USER_EVENTS_MAX_DURATION)
+    try:
+        found = stream.open(hub)
+        yield from _opening(stream, unread_count)
+        yield from _chunks(stream, found)
+        while (remaining := deadline - time.monotonic()) > 0:
+            if hub.wait(stream.positions, min(heartbeat, remaining)):
+                yield from _chunks(stream, stream.collect(hub.latest(stream.positions)))
+            else:
+                yield HEARTBEAT
+    finally:
+        hub.unwatch(stream.channels)
+
+
+async def async_events(stream, unread_count, heartbeat=None, max_duration=None):
+    """Générateur SSE asynchrone (ASGI), même protocole que events()"""
+    hub = get_hub()
+    heartbeat = heartbeat or settings.USER_EVENTS_HEARTBEAT
+    deadline = time.monotonic() + (max_duration or settings.USER_EVENTS_MAX_DURATION)
+    try:
+        found = stream.open(hub)
+        for chunk in _opening(stream, unread_count) + _chunks(stream, found):
+            yield chunk
+        while (remaining := deadline - time.monotonic()) > 0:
+            if await hub.async_wait(stream.positions, min(heartbeat, remaining)):
+                for chunk in _chunks(stream, stream.collect(hub.latest(stream.positions))):
+                    yield chunk
+            else:
+                yield HEARTBEAT
+    finally:
+        hub.unwatch(stream.channels)
+
+
+def long_poll(stream, timeout):
+    """Attend jusqu'à `timeout` secondes; retourne les événements (None: resynchroniser)"""
+    hub = get_hub()
+    try:
+        found = stream.open(hub)
+        if found is None or found:
+            return found
+        if hub.wait(stream.positions, timeout):
+            return stream.collect(hub.latest(stream.positions))
+        return []
+    finally:
+        hub.unwatch(stream.channels)
@@ -1,47 +1,63 @@
 from rest_framework import status, viewsets
 from rest_framework.decorators import action, api_view
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
-from django.db import transaction
-from django.db.models import Sum, Count, Avg, Q
-from datetime import datetime, timedelta
-import random
+from django.utils.dateparse import parse_datetime
+from django.db.models import Count, Avg, Q
+from datetime import timedelta
 from decimal import Decimal
 
 # Import du moteur de gamification
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from gamification_engine import GamificationEngine, process_post_transaction_gamification
+from gamification_engine import GamificationEngine
 
 from .models import (
-    UserProfile, Stock, StockPriceHistory, Portfolio, 
+    UserProfile, Stock, PriceCandle, Portfolio, 
     Transaction, Mission, UserMission, Watchlist,
     Badge, UserBadge, Leaderboard, Achievement,
-    UserAchievement, DailyStreak, Notification
+    UserAchievement, DailyStreak, Notification, GamificationEvent
 )
+from . import (
+    data_versions, gamification_queue, leaderboards, live_leaderboard, market_engine, notification_feed, price_stream,
+    stock_cache, summary_cache, trade_engine, user_events,
+)
+from .candles import INTERVAL_SECONDS as CANDLE_INTERVALS
+from .pagination import CreatedAtCursorPagination, TimestampCursorPagination
+from .portfolio_valuation import valued_holdings, value_portfolio
 from .serializers import (
-    UserProfileSerializer, StockSerializer, StockPriceHistorySerializer,
+    UserProfileSerializer, StockSerializer, StockSummarySerializer,
+    StockPriceHistorySerializer, PriceCandleSerializer,
     PortfolioSerializer, TransactionSerializer, MissionSerializer, 
     UserMissionSerializer, WatchlistSerializer, TradeSerializer,
     BadgeSerializer, UserBadgeSerializer, LeaderboardSerializer,
     AchievementSerializer, UserAchievementSerializer, DailyStreakSerializer,
-    NotificationSerializer, GamificationSummarySerializer, LeaderboardSummarySerializer
+    NotificationSerializer, GamificationSummarySerializer, LeaderboardSummarySerializer,
+    GamificationEventSerializer
 )
 @api_view(['GET'])
+@data_versions.conditional_get(per_user=True)
 def me(request):
     """Return current user's profile, portfolio and transactions."""
     if not request.user.is_authenticated:
         return Response({'error': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
     profile, _ = UserProfile.objects.get_or_create(user=request.user)
-    portfolio = Portfolio.objects.filter(user=request.user)
-    txs = Transaction.objects.filter(user=request.user).order_by('-timestamp')[:50]
+    holdings, totals = value_portfolio(request.user)
+    txs = Transaction.objects.filter(user=request.user).select_related('stock').order_by('-timestamp')[:50]
     return Response({
         'profile': UserProfileSerializer(profile).data,
-        'portfolio': PortfolioSerializer(portfolio, many=True).data,
+        'portfolio': PortfolioSerializer(holdings, many=True).data,
+        'portfolio_totals': {key: float(value) for key, value in totals.items()},
         'transactions': TransactionSerializer(txs, many=True).data,
     })
 
@@ -69,11 +85,52 @@ class UserProfileViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         return UserProfile.objects.filter(user=self.request.user)
+    
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        summary_cache.invalidate(self.request.user.id)
 
-class StockViewSet(viewsets.ModelViewSet):
+class StockViewSet(data_versions.MarketWriteMixin, viewsets.ModelViewSet):
+    """Stocks; ?include=history&history_limit=N embeds the N latest prices per stock"""
     queryset = Stock.objects.all()
     serializer_class = StockSerializer
     
+    @data_versions.conditional_get()
+    def list(self, request, *args, **kwargs):
+        # Servie depuis le cache de la version courante du marché (remplie à chaque tick)
+        market_version = request.data_versions[0]
+        history_limit = self.history_limit() if self.include_history() else None
+        return Response(stock_cache.get_list(market_version, history_limit))
+    
+    @data_versions.conditional_get()
+    def retrieve(self, request, *args, **kwargs):
+        market_version = request.data_versions[0]
+        if self.include_history():
+            return super().retrieve(request, *args, **kwargs)
+        quote = stock_cache.get_quote(market_version, kwargs['pk'])
+        if quote is not None:
+            return Response(quote)
+        response = super().retrieve(request, *args, **kwargs)
+        stock_cache.store_quote(market_version, response.data)
+        return response
+    
+    def include_history(self):
+        return 'history' in self.request.query_params.get('include', '').split(',')
+    
+    def history_limit(self):
+        try:
+            return max(1, min(int(self.request.query_params.get('history_limit', 30)), 500))
+        except ValueError:
+            return 30
+    
+    def get_queryset(self):
+        return stock_cache.stock_queryset(self.history_limit() if self.include_history() else None)
+    
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['include_history'] = self.include_history()
+        return context
+    
     @action(detail=True, methods=['get'])
     def history(self, request, pk=None):
         stock = self.get_object()
@@ -81,21 +138,40 @@ class StockViewSet(viewsets.ModelViewSet):
         serializer = StockPriceHistorySerializer(history, many=True)
         return Response(serializer.data)
     
+    @action(detail=True, methods=['get'])
+    def candles(self, request, pk=None):
+        """Pre-aggregated OHLCV candles: ?interval=1m|5m|1h|1d&from=&to=&limit="""
+        stock = self.get_object()
+        interval = request.query_params.get('interval', '1h')
+        if interval not in CANDLE_INTERVALS:
+            return Response(
+                {'error': f'interval must be one of {", ".join(CANDLE_INTERVALS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        queryset = PriceCandle.objects.filter(stock=stock, interval=interval)
+        for param, lookup in (('from', 'bucket_start__gte'), ('to', 'bucket_start__lte')):
+            value = request.query_params.get(param)
+            if value:
+                parsed = parse_datetime(value)
+                if parsed is None:
+                    return Response({'error': f'Invalid {param} datetime'}, status=status.HTTP_400_BAD_REQUEST)
+                if timezone.is_naive(parsed):
+                    parsed = timezone.make_aware(parsed)
+                queryset = queryset.filter(**{lookup: parsed})
+        
+        try:
+            limit = min(max(int(request.query_params.get('limit', 500)), 1), 1000)
+        except ValueError:
+            return Response({'error': 'Invalid limit'}, status=status.HTTP_400_BAD_REQUEST)
+        # Most recent buckets first for the LIMIT, returned in chronological order
+        rows = reversed(queryset.order_by('-bucket_start')[:limit])
+        return Response(PriceCandleSerializer(rows, many=True).data)
+    
     @action(detail=False, methods=['post'])
     def update_prices(self, request):
         """Simulate real-time price updates"""
-        stocks = Stock.objects.all()
-        for stock in stocks:
-            change = random.uniform(-0.05, 0.05)
-            new_price = float(stock.current_price) * (1 + change)
-            stock.current_price = max(Decimal('0.01'), Decimal(str(new_price)))
-            stock.save()
-            
-            StockPriceHistory.objects.create(
-                stock=stock,
-                price=stock.current_price
-            )
-        
+        stocks = market_engine.apply_tick('uniform', low=-0.05, high=0.05)
         serializer = self.get_serializer(stocks, many=True)
         return Response(serializer.data)
 
@@ -104,14 +180,24 @@ class PortfolioViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        return Portfolio.objects.filter(user=self.request.user)
+        return valued_holdings(self.request.user)
+    
+    @action(detail=False, methods=['get'])
+    def valuation(self, request):
+        """Holdings plus total market value, cost basis and unrealized P/L"""
+        holdings, totals = value_portfolio(request.user)
+        return Response({
+            'totals': {key: float(value) for key, value in totals.items()},
+            'holdings': self.get_serializer(holdings, many=True).data,
+        })
 
 class TransactionViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = TransactionSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = TimestampCursorPagination
     
     def get_queryset(self):
-        return Transaction.objects.filter(user=self.request.user).order_by('-timestamp')
+        return Transaction.objects.filter(user=self.request.user).select_related('stock').order_by('-timestamp', '-id')
 
 @api_view(['POST'])
 def execute_trade(request):
@@ -134,108 +220,29 @@ def execute_trade(request):
     quantity = data['quantity']
     trade_type = data['trade_type']
     
-    user_profile, created = UserProfile.objects.get_or_create(user=request.user)
+    try:
+        result = trade_engine.execute_trade(request.user, stock, trade_type, quantity)
+    except trade_engine.TradeError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     
-    with transaction.atomic():
-        if trade_type == 'BUY':
-            total_cost = quantity * stock.current_price
-            if user_profile.balance < total_cost:
-                return Response({'error': 'Insufficient balance'}, status=status.HTTP_400_BAD_REQUEST)
-            
-            user_profile.balance -= total_cost
-            user_profile.save()
-            
-            portfolio_item, created = Portfolio.objects.get_or_create(
-                user=request.user,
-                stock=stock,
-                defaults={'quantity': Decimal('0'), 'average_price': stock.current_price}
-            )
-            
-            if not created:
-                total_quantity = portfolio_item.quantity + quantity
-                total_cost_all = (portfolio_item.quantity * portfolio_item.average_price) + total_cost
-                portfolio_item.average_price = total_cost_all / total_quantity
-                portfolio_item.quantity = total_quantity
-            else:
-                portfolio_item.quantity = quantity
-                portfolio_item.average_price = stock.current_price
-            
-            portfolio_item.save()
-            
-        elif trade_type == 'SELL':
-            portfolio_item = Portfolio.objects.filter(user=request.user, stock=stock).first()
-            if not portfolio_item or portfolio_item.quantity < quantity:
-                return Response({'error': 'Insufficient stock quantity'}, status=status.HTTP_400_BAD_REQUEST)
-            
-            total_revenue = quantity * stock.current_price
-            user_profile.balance += total_revenue
-            user_profile.save()
-            
-            portfolio_item.quantity -= quantity
-            if portfolio_item.quantity == 0:
-                portfolio_item.delete()
-            else:
-                portfolio_item.save()
-        
-        # Créer la transaction
-        trade_transaction = Transaction.objects.create(
-            user=request.user,
-            stock=stock,
-            transaction_type=trade_type,
-            quantity=quantity,
-            price=stock.current_price,
-            total_amount=quantity * stock.current_price
-        )
-        
-        # Mettre à jour les statistiques du profil
-        user_profile.total_trades += 1
-        
-        # Calculer profit/perte pour les ventes
-        if trade_type == 'SELL':
-            profit_loss = (stock.current_price - portfolio_item.average_price) * quantity
-            user_profile.total_profit_loss += profit_loss
-            if profit_loss > 0:
-                user_profile.successful_trades += 1
-        
-        user_profile.xp += 10
-        
-        # Calculer le nouveau niveau
-        new_level = (user_profile.xp // 100) + 1
-        if new_level > user_profile.level:
-            user_profile.level = new_level
-        
-        user_profile.save()
-        
-        # 🎮 TRAITEMENT DE LA GAMIFICATION
-        try:
-            gamification_result = process_post_transaction_gamification(request.user)
-            gamification_info = {
-                'badges_awarded': gamification_result.get('badges_awarded', 0),
-                'achievements_awarded': gamification_result.get('achievements_awarded', 0),
-                'level_up': gamification_result.get('level_up', False),
-                'new_level': gamification_result.get('new_level', user_profile.level)
-            }
-        except Exception as e:
-            # En cas d'erreur de gamification, on continue sans faire échouer le trade
-            print(f"Erreur gamification: {e}")
-            gamification_info = {
-                'badges_awarded': 0,
-                'achievements_awarded': 0,
-                'level_up': False,
-                'new_level': user_profile.level
-            }
+    # 🎮 GAMIFICATION: traitée par le worker (run_gamification_worker)
+    event = result['gamification_event']
+    if not settings.GAMIFICATION_ASYNC:
+        gamification_queue.process_events([event])
+        event.refresh_from_db()
+    gamification_info = GamificationEventSerializer(event).data
     
     response_data = {
         'message': f'Successfully {trade_type.lower()}ed {quantity} shares of {stock.symbol}',
-        'new_balance': user_profile.balance,
-        'xp_gained': 10,
+        'new_balance': result['new_balance'],
+        'xp_gained': trade_engine.XP_PER_TRADE,
         'gamification': gamification_info
     }
     
     # Ajouter des informations de profit pour les ventes
     if trade_type == 'SELL':
-        response_data['profit_loss'] = profit_loss
-        response_data['total_profit'] = user_profile.total_profit_loss
+        response_data['profit_loss'] = result['profit_loss']
+        response_data['total_profit'] = result['total_profit_loss']
     
     return Response(response_data)
 
@@ -255,33 +262,31 @@ class WatchlistViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        return Watchlist.objects.filter(user=self.request.user)
+        return Watchlist.objects.filter(user=self.request.user).select_related('stock')
     
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
 @api_view(['GET'])
+@data_versions.conditional_get(per_user=True)
 def dashboard_data(request):
     """Get dashboard summary data"""
     if not request.user.is_authenticated:
         return Response({'error': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
     
     user_profile, created = UserProfile.objects.get_or_create(user=request.user)
-    portfolio_items = Portfolio.objects.filter(user=request.user)
-    try:
-        total_portfolio_value = float(sum(float(item.quantity) * float(item.stock.current_price) for item in portfolio_items))
-    except Exception:
-        total_portfolio_value = 0.0
+    _, totals = value_portfolio(request.user)
+    total_portfolio_value = float(totals['market_value'])
     
-    recent_transactions = Transaction.objects.filter(user=request.user).order_by('-timestamp')[:5]
-    user_missions = UserMission.objects.filter(user=request.user, is_completed=False)[:3]
+    recent_transactions = Transaction.objects.filter(user=request.user).select_related('stock').order_by('-timestamp')[:5]
+    user_missions = UserMission.objects.filter(user=request.user, is_completed=False).select_related('mission')[:3]
     
     return Response({
         'user_profile': UserProfileSerializer(user_profile).data,
         'portfolio_value': total_portfolio_value,
         'recent_transactions': TransactionSerializer(recent_transactions, many=True).data,
         'active_missions': UserMissionSerializer(user_missions, many=True).data,
-        'top_stocks': StockSerializer(Stock.objects.all()[:5], many=True).data
+        'top_stocks': StockSummarySerializer(Stock.objects.all()[:5], many=True).data
     })
 
 # Nouvelles vues pour la gamification avancée
@@ -318,109 +323,92 @@ class LeaderboardViewSet(viewsets.ReadOnlyModelViewSet):
     
     def get_queryset(self):
         leaderboard_type = self.request.query_params.get('type', 'XP')
-        return Leaderboard.objects.filter(leaderboard_type=leaderboard_type).order_by('rank')[:50]
+        return leaderboards.with_profiles(
+            Leaderboard.objects.filter(leaderboard_type=leaderboard_type)
+        ).order_by('rank')[:50]
     
     @action(detail=False, methods=['get'])
     def all_leaderboards(self, request):
         """Tous les classements avec résumé"""
         today = timezone.now().date()
         week_start = today - timedelta(days=today.weekday())
+        summary_types = ['XP', 'PROFIT', 'TRADES', 'PORTFOLIO_VALUE']
         
-        # Classement XP
-        xp_leaderboard = Leaderboard.objects.filter(
-            leaderboard_type='XP',
-            period_start__date=week_start
-        ).order_by('rank')[:10]
-        
-        # Classement Profit
-        profit_leaderboard = Leaderboard.objects.filter(
-            leaderboard_type='PROFIT',
-            period_start__date=week_start
-        ).order_by('rank')[:10]
-        
-        # Classement Trades
-        trades_leaderboard = Leaderboard.objects.filter(
-            leaderboard_type='TRADES',
-            period_start__date=week_start
-        ).order_by('rank')[:10]
-        
-        # Classement Portfolio
-        portfolio_leaderboard = Leaderboard.objects.filter(
-            leaderboard_type='PORTFOLIO_VALUE',
-            period_start__date=week_start
-        ).order_by('rank')[:10]
+        # Top 10 de chaque classement en une requête (les ex aequo peuvent dépasser le rang 10)
+        rows = leaderboards.with_profiles(
+            Leaderboard.objects.filter(
+                leaderboard_type__in=summary_types,
+                period_start__date=week_start,
+                rank__lte=10
+            )
+        ).order_by('leaderboard_type', 'rank', 'user_id')
+        boards = {lb_type: [] for lb_type in summary_types}
+        for row in rows:
+            board = boards[row.leaderboard_type]
+            if len(board) < 10:
+                board.append(row)
         
         # Rang de l'utilisateur
-        user_ranks = {}
-        for lb_type in ['XP', 'PROFIT', 'TRADES', 'PORTFOLIO_VALUE']:
-            user_entry = Leaderboard.objects.filter(
+        user_ranks = {lb_type.lower(): None for lb_type in summary_types}
+        user_ranks.update(
+            (lb_type.lower(), rank)
+            for lb_type, rank in Leaderboard.objects.filter(
                 user=request.user,
-                leaderboard_type=lb_type,
+                leaderboard_type__in=summary_types,
                 period_start__date=week_start
-            ).first()
-            user_ranks[lb_type.lower()] = user_entry.rank if user_entry else None
+            ).values_list('leaderboard_type', 'rank')
+        )
         
         return Response({
-            'xp_leaderboard': LeaderboardSerializer(xp_leaderboard, many=True).data,
-            'profit_leaderboard': LeaderboardSerializer(profit_leaderboard, many=True).data,
-            'trades_leaderboard': LeaderboardSerializer(trades_leaderboard, many=True).data,
-            'portfolio_leaderboard': LeaderboardSerializer(portfolio_leaderboard, many=True).data,
+            'xp_leaderboard': LeaderboardSerializer(boards['XP'], many=True).data,
+            'profit_leaderboard': LeaderboardSerializer(boards['PROFIT'], many=True).data,
+            'trades_leaderboard': LeaderboardSerializer(boards['TRADES'], many=True).data,
+            'portfolio_leaderboard': LeaderboardSerializer(boards['PORTFOLIO_VALUE'], many=True).data,
             'user_rank_summary': user_ranks
         })
     
+    @action(detail=False, methods=['get'])
+    def live(self, request):
+        """Classement en direct de la semaine: top K et rang de l'utilisateur"""
+        leaderboard_type = request.query_params.get('type', 'XP')
+        if leaderboard_type not in live_leaderboard.LIVE_TYPES:
+            return Response({'error': f'Invalid type: {leaderboard_type}'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 100)
+        except ValueError:
+            return Response({'error': 'Invalid limit'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        service = live_leaderboard.get_service()
+        top = service.top(leaderboard_type, limit)
+        my_rank, my_score = service.rank_of(leaderboard_type, request.user.id)
+        usernames = dict(
+            User.objects.filter(id__in=[user_id for _, user_id, _ in top]).values_list('id', 'username')
+        )
+        return Response({
+            'type': leaderboard_type,
+            'period_start': service.period[0],
+            'entries': [
+                {'rank': rank, 'user_id': user_id, 'username': usernames.get(user_id), 'score': str(score)}
+                for rank, user_id, score in top
+            ],
+            'my_rank': my_rank,
+            'my_score': str(my_score) if my_score is not None else None,
+        })
+    
     @action(detail=False, methods=['post'])
     def update_leaderboards(self, request):
         """Mettre à jour tous les classements"""
-        self.update_all_leaderboards()
-        return Response({'message': 'Leaderboards updated successfully'})
+        entries = self.update_all_leaderboards()
+        return Response({'message': 'Leaderboards updated successfully', 'entries': entries})
     
     def update_all_leaderboards(self):
         """Fonction pour mettre à jour tous les classements"""
-        today = timezone.now().date()
-        week_start = today - timedelta(days=today.weekday())
-        week_end = week_start + timedelta(days=6)
-        
-        # Supprimer les anciens classements de la semaine
-        Leaderboard.objects.filter(
-            period_start__date=week_start,
-            period_end__date=week_end
-        ).delete()
-        
-        # Classement XP
-        xp_rankings = UserProfile.objects.filter(user__is_active=True).order_by('-xp')
-        for rank, profile in enumerate(xp_rankings, 1):
-            Leaderboard.objects.create(
-                user=profile.user,
-                leaderboard_type='XP',
-                score=profile.xp,
-                rank=rank,
-                period_start=timezone.make_aware(datetime.combine(week_start, datetime.min.time())),
-                period_end=timezone.make_aware(datetime.combine(week_end, datetime.max.time()))
-            )
-        
-        # Classement Profit
-        profit_rankings = UserProfile.objects.filter(user__is_active=True).order_by('-total_profit')
-        for rank, profile in enumerate(profit_rankings, 1):
-            Leaderboard.objects.create(
-                user=profile.user,
-                leaderboard_type='PROFIT',
-                score=profile.total_profit,
-                rank=rank,
-                period_start=timezone.make_aware(datetime.combine(week_start, datetime.min.time())),
-                period_end=timezone.make_aware(datetime.combine(week_end, datetime.max.time()))
-            )
-        
-        # Classement Trades
-        trade_rankings = UserProfile.objects.filter(user__is_active=True).order_by('-total_trades')
-        for rank, profile in enumerate(trade_rankings, 1):
-            Leaderboard.objects.create(
-                user=profile.user,
-                leaderboard_type='TRADES',
-                score=profile.total_trades,
-                rank=rank,
-                period_start=timezone.make_aware(datetime.combine(week_start, datetime.min.time())),
-                period_end=timezone.make_aware(datetime.combine(week_end, datetime.max.time()))
-            )
+        entries = leaderboards.build_all_leaderboards()
+        service = live_leaderboard.get_service()
+        if service.is_loaded():
+            service.load()
+        summary_cache.invalidate_all()
+        return entries
 
 class AchievementViewSet(viewsets.ReadOnlyModelViewSet):
     """Gestion des achievements"""
@@ -504,99 +492,162 @@ class AchievementViewSet(viewsets.ReadOnlyModelViewSet):
             if created:
                 completed.append("Millionnaire")
         
+        if completed:
+            summary_cache.invalidate(user.id)
         return completed
 
 class NotificationViewSet(viewsets.ModelViewSet):
-    """Gestion des notifications"""
+    """Gestion des notifications (personnelles et diffusions)"""
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = CreatedAtCursorPagination
     
     def get_queryset(self):
-        return Notification.objects.filter(user=self.request.user)
+        return notification_feed.feed_for(self.request.user)
+    
+    def _publish_unread_delta(self, delta):
+        """Tient à jour le compteur de non-lues des autres sessions de l'utilisateur"""
+        if delta:
+            user_events.publish_on_commit(self.request.user.id, 'unread', {}, unread_delta=delta)
+    
+    def perform_create(self, serializer):
+        # Toujours personnelle: une ligne sans utilisateur serait une diffusion (admin uniquement)
+        notification = serializer.save(user=self.request.user)
+        user_events.publish_on_commit(
+            self.request.user.id,
+            notification.notification_type.lower(),
+            user_events.notification_data(notification),
+            unread_delta=0 if notification.is_read else 1,
+        )
+        summary_cache.invalidate(self.request.user.id)
+    
+    def perform_update(self, serializer):
+        was_read = serializer.instance.feed_is_read
+        if serializer.instance.user_id is None:
+            # Diffusion partagée: seul l'état lu de l'utilisateur change
+            if 'is_read' in serializer.validated_data:
+                notification_feed.mark_read(self.request.user, serializer.instance, serializer.validated_data['is_read'])
+        else:
+            super().perform_update(serializer)
+        is_read = serializer.validated_data.get('is_read', was_read)
+        self._publish_unread_delta(int(was_read) - int(is_read))
+        summary_cache.invalidate(self.request.user.id)
+    
+    def perform_destroy(self, instance):
+        notification_feed.dismiss(self.request.user, instance)
+        self._publish_unread_delta(0 if instance.feed_is_read else -1)
+        summary_cache.invalidate(self.request.user.id)
     
     @action(detail=False, methods=['post'])
     def mark_all_read(self, request):
         """Marquer toutes les notifications comme lues"""
-        count = Notification.objects.filter(user=request.user, is_read=False).update(is_read=True)
+        count = notification_feed.mark_all_read(request.user)
+        self._publish_unread_delta(-count)
+        summary_cache.invalidate(request.user.id)
         return Response({'message': f'{count} notifications marquées comme lues'})
     
     @action(detail=True, methods=['post'])
     def mark_read(self, request, pk=None):
         """Marquer une notification comme lue"""
         notification = self.get_object()
-        notification.is_read = True
-        notification.save()
+        notification_feed.mark_read(request.user, notification)
+        self._publish_unread_delta(0 if notification.feed_is_read else -1)
+        summary_cache.invalidate(request.user.id)
         return Response({'message': 'Notification marquée comme lue'})
 
+def stream_prices(request):
+    """Flux SSE des prix: ?symbols=AAPL,MSFT, reprise via l'en-tête Last-Event-ID"""
+    symbols = [symbol.strip().upper() for symbol in request.GET.get('symbols', '').split(',') if symbol.strip()]
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+    
+    stream = price_stream.PriceStream(symbols, last_event_id)
+    if isinstance(request, ASGIRequest):
+        events = price_stream.async_events(stream)
+    else:
+        events = price_stream.events(stream)
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+def _authenticate_stream(request):
+    """Utilisateur d'une requête hors DRF (JWT dans Authorization, sinon session), ou None"""
+    try:
+        result = JWTAuthentication().authenticate(request)
+    except (AuthenticationFailed, InvalidToken):
+        return None
+    if result is not None:
+        return result[0]
+    return request.user if request.user.is_authenticated else None
+
+def stream_user_events(request):
+    """Flux SSE des événements de l'utilisateur (notifications, badges, niveaux, trades, non-lues)"""
+    user = _authenticate_stream(request)
+    if user is None:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+    
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    stream = user_events.UserEventStream(user, last_event_id)
+    unread_count = notification_feed.unread_for(user).count()
+    if isinstance(request, ASGIRequest):
+        events = user_events.async_events(stream, unread_count)
+    else:
+        events = user_events.events(stream, unread_count)
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+@api_view(['GET'])
+def poll_user_events(request):
+    """Long-poll des mêmes événements: ?last_event_id=...&timeout=25 (repli quand SSE est indisponible)"""
+    if not request.user.is_authenticated:
+        return Response({'error': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
+    
+    try:
+        timeout = float(request.GET.get('timeout', settings.USER_EVENTS_LONG_POLL_TIMEOUT))
+    except ValueError:
+        return Response({'error': 'Invalid timeout'}, status=status.HTTP_400_BAD_REQUEST)
+    timeout = min(max(timeout, 0), settings.USER_EVENTS_LONG_POLL_TIMEOUT)
+    
+    stream = user_events.UserEventStream(request.user, request.GET.get('last_event_id'))
+    data = {}
+    if stream.positions is None:
+        # Première requête: état initial, les événements suivants sont des deltas
+        data['unread_count'] = notification_feed.unread_for(request.user).count()
+        timeout = 0
+    found = user_events.long_poll(stream, timeout)
+    data.update({
+        'last_event_id': stream.event_id,
+        'resync': found is None,
+        'events': [
+            {'type': event['type'], 'data': event['data'], 'unread_delta': event['unread_delta']}
+            for event in found or []
+        ],
+    })
+    return Response(data)
+
 @api_view(['GET'])
 def gamification_summary(request):
     """Résumé complet de gamification pour un utilisateur"""
     if not request.user.is_authenticated:
         return Response({'error': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
     
-    user_profile, created = UserProfile.objects.get_or_create(user=request.user)
-    
-    # Badges de l'utilisateur
-    user_badges = UserBadge.objects.filter(user=request.user).select_related('badge')
-    
-    # Achievements de l'utilisateur
-    user_achievements = UserAchievement.objects.filter(user=request.user).select_related('achievement')
-    
-    # Streak quotidien
-    daily_streak, created = DailyStreak.objects.get_or_create(user=request.user)
-    
-    # Notifications récentes
-    recent_notifications = Notification.objects.filter(user=request.user, is_read=False)[:5]
-    
-    # Rangs dans les leaderboards
-    today = timezone.now().date()
-    week_start = today - timedelta(days=today.weekday())
-    
-    leaderboard_ranks = {}
-    for lb_type in ['XP', 'PROFIT', 'TRADES']:
-        try:
-            user_entry = Leaderboard.objects.filter(
-                user=request.user,
-                leaderboard_type=lb_type,
-                period_start__date=week_start
-            ).first()
-            leaderboard_ranks[lb_type.lower()] = user_entry.rank if user_entry else None
-        except Exception:
-            leaderboard_ranks[lb_type.lower()] = None
-    
-    # Statistiques de la semaine
-    try:
-        week_transactions = Transaction.objects.filter(
-            user=request.user,
-            timestamp__date__gte=week_start
-        )
-        
-        weekly_stats = {
-            'trades_count': week_transactions.count(),
-            'weekly_profit': week_transactions.aggregate(
-                total=Sum('total_amount')
-            )['total'] or 0,
-            'xp_gained': user_achievements.filter(
-                earned_at__date__gte=week_start
-            ).aggregate(total=Sum('achievement__reward_xp'))['total'] or 0
-        }
-    except Exception:
-        weekly_stats = {
-            'trades_count': 0,
-            'weekly_profit': 0,
-            'xp_gained': 0
-        }
+    # Matérialisé dans le cache, invalidé par les trades, badges, achievements et notifications
+    return Response(summary_cache.get_summary(request.user))
+
+@api_view(['GET'])
+def gamification_event(request, pk):
+    """Statut et résultat d'un événement de gamification (ex: après un trade)"""
+    if not request.user.is_authenticated:
+        return Response({'error': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
     
-    return Response({
-        'user_profile': UserProfileSerializer(user_profile).data,
-        'badges': UserBadgeSerializer(user_badges, many=True).data,
-        'achievements': UserAchievementSerializer(user_achievements, many=True).data,
-        'daily_streak': DailyStreakSerializer(daily_streak).data,
-        'leaderboard_ranks': leaderboard_ranks,
-        'recent_notifications': NotificationSerializer(recent_notifications, many=True).data,
-        'progress_to_next_level': user_profile.xp_progress,
-        'weekly_stats': weekly_stats
-    })
+    event = get_object_or_404(GamificationEvent, pk=pk, user=request.user)
+    return Response(GamificationEventSerializer(event).data)
 
 @api_view(['POST'])
 def update_gamification(request):
@@ -666,5 +717,6 @@ def daily_streak(request):
             if streak.current_streak > streak.longest_streak:
                 streak.longest_streak = streak.current_streak
             streak.save()
+            summary_cache.invalidate(request.user.id)
     
     return Response(DailyStreakSerializer(streak).data)
@@ -6,6 +6,8 @@ import os
 import django
 from decimal import Decimal
 from datetime import datetime, timedelta
+from django.db import transaction
+from django.db.models import F
 from django.utils import timezone
 
 # Configuration Django
@@ -17,6 +19,44 @@ from core.models import (
     UserProfile, Badge, UserBadge, Achievement, UserAchievement,
     Transaction, Portfolio, DailyStreak, Notification
 )
+from core import live_leaderboard, summary_cache, user_events
+
+class UserStats:
+    """Instantané des statistiques d'un utilisateur, chargé en un nombre fixe de requêtes.
+
+    Toutes les règles sont évaluées sur cet instantané en mémoire.
+    """
+    
+    def __init__(self, profile, has_traded, holdings_count, current_streak,
+                 earned_badge_ids, earned_achievement_ids):
+        self.profile = profile
+        self.has_traded = has_traded
+        self.holdings_count = holdings_count
+        self.current_streak = current_streak
+        self.earned_badge_ids = set(earned_badge_ids)
+        self.earned_achievement_ids = set(earned_achievement_ids)
+    
+    @classmethod
+    def load(cls, user, streak=None):
+        profile, created = UserProfile.objects.get_or_create(user=user)
+        if streak is None:
+            streak = DailyStreak.objects.filter(user=user).first()
+        return cls(
+            profile=profile,
+            has_traded=Transaction.objects.filter(user=user).exists(),
+            holdings_count=Portfolio.objects.filter(user=user, quantity__gt=0).count(),
+            current_streak=streak.current_streak if streak else 0,
+            earned_badge_ids=UserBadge.objects.filter(user=user).values_list('badge_id', flat=True),
+            earned_achievement_ids=UserAchievement.objects.filter(user=user).values_list('achievement_id', flat=True),
+        )
+    
+    @property
+    def total_trades(self):
+        return self.profile.total_trades
+    
+    @property
+    def total_profit_loss(self):
+        return self.profile.total_profit_loss
 
 class GamificationEngine:
     """Moteur de gamification pour attribution automatique"""
@@ -26,38 +66,38 @@ class GamificationEngine:
         self._initialize_rules()
     
     def _initialize_rules(self):
-        """Initialise toutes les règles d'attribution"""
+        """Initialise toutes les règles d'attribution (conditions évaluées sur un UserStats)"""
         
         # Règles pour les badges de trading
         self.rules.extend([
             {
                 'type': 'badge',
                 'name': 'Premier Pas',
-                'condition': lambda user: self._check_first_trade(user),
+                'condition': lambda stats: stats.has_traded,
                 'description': 'Premier trade effectué'
             },
             {
                 'type': 'badge', 
                 'name': 'Trader Novice',
-                'condition': lambda user: self._check_trade_count(user, 10),
+                'condition': lambda stats: stats.total_trades >= 10,
                 'description': '10 trades effectués'
             },
             {
                 'type': 'badge',
                 'name': 'Trader Expérimenté', 
-                'condition': lambda user: self._check_trade_count(user, 50),
+                'condition': lambda stats: stats.total_trades >= 50,
                 'description': '50 trades effectués'
             },
             {
                 'type': 'badge',
                 'name': 'Maître Trader',
-                'condition': lambda user: self._check_trade_count(user, 200),
+                'condition': lambda stats: stats.total_trades >= 200,
                 'description': '200 trades effectués'
             },
             {
                 'type': 'badge',
                 'name': 'Légende du Trading',
-                'condition': lambda user: self._check_trade_count(user, 1000),
+                'condition': lambda stats: stats.total_trades >= 1000,
                 'description': '1000 trades effectués'
             },
         ])
@@ -67,19 +107,19 @@ class GamificationEngine:
             {
                 'type': 'badge',
                 'name': 'Premier Profit',
-                'condition': lambda user: self._check_first_profit(user),
+                'condition': lambda stats: stats.total_profit_loss > 0,
                 'description': 'Premier profit réalisé'
             },
             {
                 'type': 'badge',
                 'name': 'Profitable',
-                'condition': lambda user: self._check_total_profit(user, 1000),
+                'condition': lambda stats: stats.total_profit_loss >= 1000,
                 'description': '1000$ de profit total'
             },
             {
                 'type': 'badge',
                 'name': 'Millionnaire',
-                'condition': lambda user: self._check_total_profit(user, 1000000),
+                'condition': lambda stats: stats.total_profit_loss >= 1000000,
                 'description': '1 million de profit total'
             },
         ])
@@ -89,19 +129,19 @@ class GamificationEngine:
             {
                 'type': 'badge',
                 'name': 'Habitué',
-                'condition': lambda user: self._check_daily_streak(user, 7),
+                'condition': lambda stats: stats.current_streak >= 7,
                 'description': '7 jours consécutifs'
             },
             {
                 'type': 'badge',
                 'name': 'Fidèle',
-                'condition': lambda user: self._check_daily_streak(user, 30),
+                'condition': lambda stats: stats.current_streak >= 30,
                 'description': '30 jours consécutifs'
             },
             {
                 'type': 'badge',
                 'name': 'Dévoué',
-                'condition': lambda user: self._check_daily_streak(user, 100),
+                'condition': lambda stats: stats.current_streak >= 100,
                 'description': '100 jours consécutifs'
             },
         ])
@@ -111,166 +151,154 @@ class GamificationEngine:
             {
                 'type': 'achievement',
                 'name': 'Premier Trade',
-                'condition': lambda user: self._check_first_trade(user),
+                'condition': lambda stats: stats.has_traded,
                 'description': 'Premier trade effectué'
             },
             {
                 'type': 'achievement',
                 'name': 'Trader Actif',
-                'condition': lambda user: self._check_trade_count(user, 25),
+                'condition': lambda stats: stats.total_trades >= 25,
                 'description': '25 trades effectués'
             },
             {
                 'type': 'achievement',
                 'name': 'Machine à Trader',
-                'condition': lambda user: self._check_trade_count(user, 100),
+                'condition': lambda stats: stats.total_trades >= 100,
                 'description': '100 trades effectués'
             },
             {
                 'type': 'achievement',
                 'name': 'Premier Investissement',
-                'condition': lambda user: self._check_first_portfolio(user),
+                'condition': lambda stats: stats.holdings_count > 0,
                 'description': 'Premier stock en portefeuille'
             },
             {
                 'type': 'achievement',
                 'name': 'Portfolio Équilibré',
-                'condition': lambda user: self._check_portfolio_diversity(user, 5),
+                'condition': lambda stats: stats.holdings_count >= 5,
                 'description': '5 stocks différents en portefeuille'
             },
         ])
     
-    # Méthodes de vérification des conditions
-    
-    def _check_first_trade(self, user):
-        """Vérifie si l'utilisateur a effectué son premier trade"""
-        return Transaction.objects.filter(user=user).exists()
-    
-    def _check_trade_count(self, user, target_count):
-        """Vérifie si l'utilisateur a effectué X trades"""
-        profile = self._get_profile(user)
-        return profile.total_trades >= target_count
-    
-    def _check_first_profit(self, user):
-        """Vérifie si l'utilisateur a réalisé son premier profit"""
-        profile = self._get_profile(user)
-        return profile.total_profit_loss > 0
-    
-    def _check_total_profit(self, user, target_profit):
-        """Vérifie si l'utilisateur a atteint X profit total"""
-        profile = self._get_profile(user)
-        return profile.total_profit_loss >= target_profit
-    
-    def _check_daily_streak(self, user, target_streak):
-        """Vérifie si l'utilisateur a un streak de X jours"""
-        try:
-            streak = DailyStreak.objects.get(user=user)
-            return streak.current_streak >= target_streak
-        except DailyStreak.DoesNotExist:
-            return False
-    
-    def _check_first_portfolio(self, user):
-        """Vérifie si l'utilisateur a des stocks en portefeuille"""
-        return Portfolio.objects.filter(user=user, quantity__gt=0).exists()
-    
-    def _check_portfolio_diversity(self, user, target_count):
-        """Vérifie si l'utilisateur a X stocks différents"""
-        return Portfolio.objects.filter(user=user, quantity__gt=0).count() >= target_count
-    
-    def _get_profile(self, user):
-        """Récupère ou crée le profil utilisateur"""
-        profile, created = UserProfile.objects.get_or_create(user=user)
-        return profile
+    def _matching_rules(self, rule_type, stats):
+        """Noms des règles du type donné satisfaites par l'instantané"""
+        return [rule['name'] for rule in self.rules if rule['type'] == rule_type and rule['condition'](stats)]
     
     # Méthodes d'attribution
     
-    def check_and_award_badges(self, user):
+    def check_and_award_badges(self, user, stats=None):
         """Vérifie et attribue les badges pour un utilisateur"""
-        awarded_badges = []
-        
-        for rule in self.rules:
-            if rule['type'] == 'badge':
-                if rule['condition'](user):
-                    badge = self._award_badge(user, rule['name'])
-                    if badge:
-                        awarded_badges.append(badge)
-        
-        return awarded_badges
+        stats = stats or UserStats.load(user)
+        names = self._matching_rules('badge', stats)
+        if not names:
+            return []
+        badges = [
+            badge for badge in Badge.objects.filter(name__in=names)
+            if badge.id not in stats.earned_badge_ids
+        ]
+        return self._award_badges(user, stats, badges)
     
-    def check_and_award_achievements(self, user):
+    def check_and_award_achievements(self, user, stats=None):
         """Vérifie et attribue les achievements pour un utilisateur"""
-        awarded_achievements = []
-        
-        for rule in self.rules:
-            if rule['type'] == 'achievement':
-                if rule['condition'](user):
-                    achievement = self._award_achievement(user, rule['name'])
-                    if achievement:
-                        awarded_achievements.append(achievement)
-        
-        return awarded_achievements
+        stats = stats or UserStats.load(user)
+        names = self._matching_rules('achievement', stats)
+        if not names:
+            return []
+        achievements = [
+            achievement for achievement in Achievement.objects.filter(name__in=names)
+            if achievement.id not in stats.earned_achievement_ids
+        ]
+        return self._award_achievements(user, stats, achievements)
     
-    def _award_badge(self, user, badge_name):
-        """Attribue un badge à un utilisateur"""
-        try:
-            badge = Badge.objects.get(name=badge_name)
-            user_badge, created = UserBadge.objects.get_or_create(
-                user=user,
-                badge=badge
+    def _award_badges(self, user, stats, badges):
+        """Attribue les badges en lot: insertions groupées et une mise à jour du profil"""
+        if not badges:
+            return []
+        with transaction.atomic():
+            self._lock_profile(stats)
+            # Badges attribués entre-temps par une évaluation concurrente (worker, pool, endpoint)
+            earned = set(UserBadge.objects.filter(user=user, badge__in=badges).values_list('badge_id', flat=True))
+            stats.earned_badge_ids.update(earned)
+            badges = [badge for badge in badges if badge.id not in earned]
+            if not badges:
+                return []
+            user_badges = UserBadge.objects.bulk_create(
+                [UserBadge(user=user, badge=badge) for badge in badges]
             )
-            if created:
-                # Créer une notification
-                self._create_notification(
-                    user, 
-                    'BADGE', 
+            notifications = Notification.objects.bulk_create([
+                self._build_notification(
+                    user,
+                    'BADGE',
                     f'Badge Obtenu!',
                     f'Félicitations! Vous avez obtenu le badge "{badge.name}"',
                     {'badge_id': badge.id, 'xp_bonus': badge.xp_bonus}
                 )
-                
-                # Ajouter l'XP bonus
-                profile = self._get_profile(user)
-                profile.xp += badge.xp_bonus
-                profile.save()
-                
-                return user_badge
-        except Badge.DoesNotExist:
-            pass
-        return None
+                for badge in badges
+            ])
+            xp_bonus = sum(badge.xp_bonus for badge in badges)
+            UserProfile.objects.filter(pk=stats.profile.pk).update(
+                xp=F('xp') + xp_bonus,
+                badge_count=F('badge_count') + len(user_badges),
+            )
+            self._publish_notifications(user, notifications)
+        
+        stats.profile.xp += xp_bonus
+        stats.profile.badge_count += len(user_badges)
+        stats.earned_badge_ids.update(badge.id for badge in badges)
+        return user_badges
     
-    def _award_achievement(self, user, achievement_name):
-        """Attribue un achievement à un utilisateur"""
-        try:
-            achievement = Achievement.objects.get(name=achievement_name)
-            user_achievement, created = UserAchievement.objects.get_or_create(
-                user=user,
-                achievement=achievement,
-                defaults={'progress': 100.00, 'earned_at': timezone.now()}
+    def _award_achievements(self, user, stats, achievements):
+        """Attribue les achievements en lot: insertions groupées et une mise à jour du profil"""
+        if not achievements:
+            return []
+        now = timezone.now()
+        with transaction.atomic():
+            self._lock_profile(stats)
+            earned = set(
+                UserAchievement.objects.filter(user=user, achievement__in=achievements)
+                .values_list('achievement_id', flat=True)
             )
-            if created:
-                # Créer une notification
-                self._create_notification(
+            stats.earned_achievement_ids.update(earned)
+            achievements = [achievement for achievement in achievements if achievement.id not in earned]
+            if not achievements:
+                return []
+            user_achievements = UserAchievement.objects.bulk_create([
+                UserAchievement(user=user, achievement=achievement, progress=100.00, earned_at=now)
+                for achievement in achievements
+            ])
+            notifications = Notification.objects.bulk_create([
+                self._build_notification(
                     user,
                     'ACHIEVEMENT',
                     f'Achievement Débloqué!',
                     f'Félicitations! Vous avez débloqué "{achievement.name}"',
-                    {'achievement_id': achievement.id, 'xp_reward': achievement.reward_xp, 'money_reward': achievement.reward_money}
+                    {'achievement_id': achievement.id, 'xp_reward': achievement.reward_xp, 'money_reward': str(achievement.reward_money)}
                 )
-                
-                # Ajouter les récompenses
-                profile = self._get_profile(user)
-                profile.xp += achievement.reward_xp
-                profile.balance += achievement.reward_money
-                profile.save()
-                
-                return user_achievement
-        except Achievement.DoesNotExist:
-            pass
-        return None
+                for achievement in achievements
+            ])
+            xp_reward = sum(achievement.reward_xp for achievement in achievements)
+            money_reward = sum((achievement.reward_money for achievement in achievements), Decimal('0'))
+            UserProfile.objects.filter(pk=stats.profile.pk).update(
+                xp=F('xp') + xp_reward,
+                balance=F('balance') + money_reward,
+            )
+            self._publish_notifications(user, notifications)
+        
+        stats.profile.xp += xp_reward
+        stats.earned_achievement_ids.update(achievement.id for achievement in achievements)
+        return user_achievements
     
-    def _create_notification(self, user, notification_type, title, message, data=None):
-        """Crée une notification pour l'utilisateur"""
-        Notification.objects.create(
+    def _lock_profile(self, stats):
+        """Verrouille le profil jusqu'à la fin de l'attribution (une évaluation à la fois par
+        utilisateur) et relit les compteurs que l'instantané a pu manquer"""
+        stats.profile.xp, stats.profile.badge_count, stats.profile.level = (
+            UserProfile.objects.select_for_update().filter(pk=stats.profile.pk)
+            .values_list('xp', 'badge_count', 'level').get()
+        )
+    
+    def _build_notification(self, user, notification_type, title, message, data=None):
+        """Construit (sans l'enregistrer) une notification pour l'utilisateur"""
+        return Notification(
             user=user,
             notification_type=notification_type,
             title=title,
@@ -278,20 +306,44 @@ class GamificationEngine:
             data=data or {}
         )
     
-    def process_user_gamification(self, user):
+    def _create_notification(self, user, notification_type, title, message, data=None):
+        """Crée une notification pour l'utilisateur"""
+        notification = self._build_notification(user, notification_type, title, message, data)
+        notification.save()
+        self._publish_notifications(user, [notification])
+        return notification
+    
+    def _publish_notifications(self, user, notifications):
+        """Pousse les notifications sur le canal en direct de l'utilisateur après le commit"""
+        for notification in notifications:
+            user_events.publish_on_commit(
+                user.id,
+                notification.notification_type.lower(),
+                user_events.notification_data(notification),
+                unread_delta=1,
+            )
+    
+    def process_user_gamification(self, user, stats=None):
         """Traite la gamification complète pour un utilisateur"""
-        awarded_badges = self.check_and_award_badges(user)
-        awarded_achievements = self.check_and_award_achievements(user)
+        stats = stats or UserStats.load(user)
+        awarded_badges = self.check_and_award_badges(user, stats)
+        awarded_achievements = self.check_and_award_achievements(user, stats)
         
-        # Vérifier le level up
-        profile = self._get_profile(user)
+        # Vérifier le level up (XP à jour dans l'instantané)
+        profile = stats.profile
         old_level = profile.level
         new_level = self._calculate_level_from_xp(profile.xp)
         
-        if new_level > old_level:
+        if awarded_badges or awarded_achievements:
+            xp = profile.xp
+            transaction.on_commit(lambda: live_leaderboard.get_service().update_profile(user.id, xp=xp))
+        
+        # Condition sur le niveau en base: une évaluation concurrente ne notifie pas deux fois
+        level_up = new_level > old_level and UserProfile.objects.filter(
+            pk=profile.pk, level__lt=new_level
+        ).update(level=new_level)
+        if level_up:
             profile.level = new_level
-            profile.save()
-            
             self._create_notification(
                 user,
                 'LEVEL_UP',
@@ -300,10 +352,13 @@ class GamificationEngine:
                 {'old_level': old_level, 'new_level': new_level}
             )
         
+        # Streak, badges, achievements ou niveau ont pu changer
+        transaction.on_commit(lambda: summary_cache.invalidate(user.id))
+        
         return {
             'badges_awarded': len(awarded_badges),
             'achievements_awarded': len(awarded_achievements),
-            'level_up': new_level > old_level,
+            'level_up': bool(level_up),
             'new_level': new_level
         }
     
@@ -335,21 +390,42 @@ class GamificationEngine:
         
         return streak
 
-# Fonction utilitaire pour traitement en lot
-def process_all_users_gamification():
-    """Traite la gamification pour tous les utilisateurs"""
+# Fonctions utilitaires pour traitement en lot
+def process_users_chunk(user_ids):
+    """Traite un lot d'utilisateurs; les erreurs sont collectées par utilisateur.
+
+    Point d'entrée des workers de `manage.py run_gamification`.
+    """
     engine = GamificationEngine()
-    results = []
+    summary = {'processed': 0, 'badges_awarded': 0, 'achievements_awarded': 0, 'level_ups': 0, 'errors': []}
     
-    for user in User.objects.all():
+    for user in User.objects.filter(id__in=user_ids).order_by('id'):
         try:
             result = engine.process_user_gamification(user)
-            result['user'] = user.username
-            results.append(result)
         except Exception as e:
-            print(f"Erreur pour l'utilisateur {user.username}: {e}")
+            summary['errors'].append((user.id, str(e)))
+            continue
+        summary['processed'] += 1
+        summary['badges_awarded'] += result['badges_awarded']
+        summary['achievements_awarded'] += result['achievements_awarded']
+        summary['level_ups'] += int(result['level_up'])
+    
+    return summary
+
+def process_all_users_gamification(chunk_size=500):
+    """Traite la gamification pour tous les utilisateurs (en série, par lots d'identifiants)"""
+    totals = {'processed': 0, 'badges_awarded': 0, 'achievements_awarded': 0, 'level_ups': 0, 'errors': []}
+    last_id = 0
+    
+    while True:
+        chunk = list(User.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:chunk_size])
+        if not chunk:
+            break
+        for key, value in process_users_chunk(chunk).items():
+            totals[key] += value
+        last_id = chunk[-1]
     
-    return results
+    return totals
 
 # Fonction à appeler après chaque transaction
 def process_post_transaction_gamification(user):
@@ -357,10 +433,10 @@ def process_post_transaction_gamification(user):
     engine = GamificationEngine()
     
     # Mettre à jour le streak
-    engine.update_daily_streak(user)
+    streak = engine.update_daily_streak(user)
     
     # Traiter la gamification
-    return engine.process_user_gamification(user)
+    return engine.process_user_gamification(user, UserStats.load(user, streak=streak))
 
 if __name__ == '__main__':
     # Test du système
@@ -19,6 +19,7 @@ from core.models import (
     Badge, UserBadge, Leaderboard, Mission, UserMission, Notification
 )
 from django.contrib.auth import get_user_model
+from django.db.models import F
 
 User = get_user_model()
 
@@ -291,13 +292,15 @@ class DemoDataCreator:
             )
             
             for badge in badges_to_award:
-                UserBadge.objects.get_or_create(
+                user_badge, created = UserBadge.objects.get_or_create(
                     user=user,
                     badge=badge,
                     defaults={
                         "earned_at": datetime.now() - timedelta(days=random.randint(1, 30))
                     }
                 )
+                if created:
+                    UserProfile.objects.filter(user=user).update(badge_count=F("badge_count") + 1)
         
         # Create user missions
         all_missions = list(Mission.objects.all())
@@ -1,4 +1,4 @@
-import React, { useState, useEffect, useCallback } from 'react';
+import React, { useState, useEffect, useCallback, useRef } from 'react';
 import {
   View,
   StyleSheet,
@@ -13,7 +13,7 @@ import { LinearGradient } from 'expo-linear-gradient';
 import { Ionicons } from '@expo/vector-icons';
 import { Typography } from '../ui';
 import { useAuth } from '../../contexts/AuthContext';
-import { adminService } from '../../services/admin/adminService';
+import { adminService, nextCursor } from '../../services/admin/adminService';
 
 interface User {
   id: number;
@@ -37,8 +37,8 @@ interface User {
 interface UsersResponse {
   results: User[];
   count?: number;
-  next?: string;
-  previous?: string;
+  next?: string | null;
+  previous?: string | null;
 }
 
 const UserCard: React.FC<{
@@ -237,32 +237,42 @@ export default function AdminUsers() {
   const [selectedUser, setSelectedUser] = useState<User | null>(null);
   const [xpModalVisible, setXpModalVisible] = useState(false);
   const [balanceModalVisible, setBalanceModalVisible] = useState(false);
-  const [page, setPage] = useState(1);
+  // Cursor of the next page (null once the last page is loaded)
+  const [cursor, setCursor] = useState<string | null>(null);
+  const loadingRef = useRef(false);
+  const requestRef = useRef(0);
 
-  const loadUsers = useCallback(async (resetPage = false) => {
-    if (loading) return;
+  const loadUsers = useCallback(async (reset = false) => {
+    if (!reset && (loadingRef.current || !cursor)) return;
     
+    // A new search supersedes any page still loading
+    const request = ++requestRef.current;
+    loadingRef.current = true;
     setLoading(true);
     try {
-      const currentPage = resetPage ? 1 : page;
-      const response = await adminService.getUsers(currentPage, searchText) as UsersResponse;
+      const response = await adminService.getUsers(reset ? null : cursor, searchText) as UsersResponse;
+      if (request !== requestRef.current) return;
       
-      if (resetPage) {
+      if (reset) {
         setUsers(response.results || []);
-        setPage(1);
       } else {
         setUsers(prev => [...prev, ...(response.results || [])]);
       }
+      setCursor(nextCursor(response.next));
     } catch {
       Alert.alert('Erreur', 'Impossible de charger les utilisateurs');
     } finally {
-      setLoading(false);
+      if (request === requestRef.current) {
+        loadingRef.current = false;
+        setLoading(false);
+      }
     }
-  }, [loading, page, searchText]);
+  }, [cursor, searchText]);
 
   useEffect(() => {
     loadUsers(true);
-  }, [searchText, loadUsers]);
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [searchText]);
 
   const handleXP = async (amount: number) => {
     if (!selectedUser) return;
@@ -289,8 +299,7 @@ export default function AdminUsers() {
   };
 
   const handleLoadMore = () => {
-    if (!loading) {
-      setPage(prev => prev + 1);
+    if (!loading && cursor) {
       loadUsers();
     }
   };
@@ -26,13 +26,13 @@ class AdminService {
     return this.request('/dashboard-stats/');
   }
 
-  // User Management
-  async getUsers(page = 1, search = '', filters = {}) {
+  // User Management (cursor-paginated: pass the cursor taken from the previous page's `next`)
+  async getUsers(cursor: string | null = null, search = '', filters = {}) {
     const params = new URLSearchParams({
-      page: page.toString(),
       search,
       ...filters,
     });
+    if (cursor) params.set('cursor', cursor);
     return this.request(`/users/?${params}`);
   }
 
@@ -103,12 +103,10 @@ class AdminService {
     });
   }
 
-  // Transaction Management
-  async getTransactions(page = 1, filters = {}) {
-    const params = new URLSearchParams({
-      page: page.toString(),
-      ...filters,
-    });
+  // Transaction Management (cursor-paginated, like users)
+  async getTransactions(cursor: string | null = null, filters = {}) {
+    const params = new URLSearchParams({ ...filters });
+    if (cursor) params.set('cursor', cursor);
     return this.request(`/transactions/?${params}`);
   }
 
@@ -195,4 +193,10 @@ class AdminService {
   }
 }
 
+// Cursor of a paginated response's `next` URL, or null on the last page
+export function nextCursor(next?: string | null): string | null {
+  const match = next ? /[?&]cursor=([^&]+)/.exec(next) : null;
+  return match ? decodeURIComponent(match[1]) : null;
+}
+
 export const adminService = new AdminService();
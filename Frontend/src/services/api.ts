@@ -91,8 +91,10 @@ export const fetchPortfolio = async () => {
   return apiClient.get(ENDPOINTS.PORTFOLIO);
 };
 
+// Cursor-paginated (newest first): returns the first page's results
 export const fetchTransactions = async () => {
-  return apiClient.get(ENDPOINTS.TRANSACTIONS);
+  const page = await apiClient.get(ENDPOINTS.TRANSACTIONS) as any;
+  return page?.results ?? page;
 };
 
 export const executeTrade = async (
@@ -175,7 +175,8 @@ class GamificationService {
    */
   async getNotifications(unread_only: boolean = false): Promise<Notification[]> {
   const url = unread_only ? `${ENDPOINTS.NOTIFICATIONS}?unread=true` : ENDPOINTS.NOTIFICATIONS;
-    return await this.apiCall(url);
+    const page = await this.apiCall(url);
+    return page?.results ?? page;
   }
 
   /**